@@ -1,112 +1,905 @@
+import glob
+import hashlib
+import heapq
 import json
+import mimetypes
+import mmap
 import os
+import re
 import stat
 import time
 import posixpath
+import queue
 import threading
 import shlex
+import shutil
+import struct
 import base64
 import uuid
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 
-import io
-
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
+from werkzeug.http import http_date
+from werkzeug.local import LocalProxy
 import paramiko
+from paramiko.sftp import (
+    CMD_ATTRS, CMD_CLOSE, CMD_EXTENDED, CMD_HANDLE, CMD_NAME, CMD_OPENDIR, CMD_READDIR,
+    CMD_STAT, CMD_STATUS, int64,
+)
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config["MAX_CONTENT_LENGTH"] = 500 * 1024 * 1024  # 500MB upload limit
 socketio = SocketIO(app, async_mode="threading", cors_allowed_origins="*")
 
+# Max SFTP channels opened per connection; requests beyond this wait for one
+# to be returned to the pool.
+SFTP_POOL_SIZE = int(os.environ.get("SSH_GUI_SFTP_POOL_SIZE", "4"))
+
+
+class SFTPPool:
+    """Bounded pool of SFTP channels multiplexed over one SSH transport.
+
+    Each request checks a channel out for its duration, so a long upload or
+    preview only ties up its own channel instead of every call on the host.
+    """
+
+    def __init__(self, client, size=SFTP_POOL_SIZE, seed=None):
+        self.client = client
+        self.size = max(1, size)
+        self._idle = [seed] if seed else []
+        self._open = len(self._idle)
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def acquire(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise paramiko.SSHException("Connection closed")
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._open < self.size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise TimeoutError("Timed out waiting for an SFTP channel")
+            try:
+                return self.client.open_sftp()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                    # The server refused another session (e.g. sshd
+                    # MaxSessions). Shrink to what it allows and wait for a
+                    # channel already in use instead of failing the request.
+                    if self._open == 0:
+                        raise
+                    self.size = self._open
+
+    def release(self, sftp):
+        channel = sftp.get_channel()
+        with self._cond:
+            if self._closed or channel is None or channel.closed:
+                self._open -= 1
+                discard = True
+            else:
+                self._idle.append(sftp)
+                discard = False
+            self._cond.notify()
+        if discard:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def session(self):
+        sftp = self.acquire()
+        try:
+            yield sftp
+        finally:
+            self.release(sftp)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for sftp in idle:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+
+# Most STAT requests batch_stat keeps outstanding on one SFTP channel.
+BATCH_STAT_WINDOW = 256
+
+
+class _SFTPReplies:
+    """Collects replies routed back by SFTPClient._read_response."""
+
+    def __init__(self):
+        self.replies = {}
+
+    def _async_response(self, t, msg, num):
+        self.replies[num] = (t, msg)
+
+
+def batch_stat(sftp, paths, window=BATCH_STAT_WINDOW):
+    """Stat many paths in about one round trip instead of one each.
+
+    STAT requests are written back to back (up to `window` in flight) and
+    the replies matched up as they arrive. Returns a list parallel to
+    `paths` holding SFTPAttributes, or None where the stat failed.
+    """
+    collector = _SFTPReplies()
+    results = [None] * len(paths)
+    pending = {}
+    queued = iter(enumerate(paths))
+    while True:
+        for i, path in queued:
+            num = sftp._async_request(collector, CMD_STAT, sftp._adjust_cwd(path))
+            pending[num] = i
+            if len(pending) >= window:
+                break
+        if not pending:
+            return results
+        sftp._read_response()
+        for num, (t, msg) in collector.replies.items():
+            i = pending.pop(num)
+            if t == CMD_ATTRS:
+                results[i] = paramiko.SFTPAttributes._from_msg(msg)
+        collector.replies.clear()
+
+
+# Opt in to the remote helper for every connection (it can also be requested
+# per connection with "helper": true in /api/connect).
+REMOTE_HELPER = os.environ.get("SSH_GUI_REMOTE_HELPER", "") == "1"
+
+# Runs on the remote under python3. Reads one JSON request per line and
+# answers {"id", "results"} with one result per op, so a UI action that needs
+# several remote facts costs a single round trip.
+HELPER_SOURCE = r'''
+import fnmatch, grp, json, os, pwd, stat, subprocess, sys, threading, time
+
+out_lock = threading.Lock()
+
+
+def names(uids=(), gids=()):
+    users, groups = {}, {}
+    for u in uids:
+        try:
+            users[str(u)] = pwd.getpwuid(int(u)).pw_name
+        except (KeyError, ValueError):
+            pass
+    for g in gids:
+        try:
+            groups[str(g)] = grp.getgrgid(int(g)).gr_name
+        except (KeyError, ValueError):
+            pass
+    return {"users": users, "groups": groups}
+
+
+def op_listdir(path):
+    entries = []
+    with os.scandir(path) as it:
+        for e in it:
+            try:
+                st = e.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            target_dir = False
+            if stat.S_ISLNK(st.st_mode):
+                try:
+                    target_dir = stat.S_ISDIR(os.stat(e.path).st_mode)
+                except OSError:
+                    pass
+            entries.append([e.name, st.st_mode, st.st_size, int(st.st_mtime),
+                            st.st_uid, st.st_gid, target_dir])
+    uids = set(e[4] for e in entries)
+    return {"entries": entries, "users": names(uids)["users"]}
+
+
+def op_stat(path):
+    st = os.stat(path)
+    n = names([st.st_uid], [st.st_gid])
+    return {"mode": st.st_mode, "size": st.st_size, "mtime": int(st.st_mtime),
+            "uid": st.st_uid, "gid": st.st_gid,
+            "owner": n["users"].get(str(st.st_uid)),
+            "group": n["groups"].get(str(st.st_gid))}
+
+
+def op_find(path, pattern, maxdepth=5, limit=200):
+    pattern = pattern.lower()
+    base = path.rstrip("/").count("/")
+    results = []
+    for root, dirs, files in os.walk(path):
+        # Entries here are depth + 1 below path; like find -maxdepth, match
+        # them but don't descend past the limit
+        depth = root.rstrip("/").count("/") - base
+        names = dirs + files
+        if depth >= maxdepth - 1:
+            dirs[:] = []
+        for name in names:
+            if fnmatch.fnmatch(name.lower(), pattern):
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                    is_dir, size = stat.S_ISDIR(st.st_mode), st.st_size
+                except OSError:
+                    is_dir, size = False, 0
+                results.append([full, is_dir, size])
+                if len(results) >= limit:
+                    return results
+    return results
+
+
+def git(cwd, *args):
+    try:
+        p = subprocess.run(("git",) + args, cwd=cwd, stdout=subprocess.PIPE,
+                           stderr=subprocess.DEVNULL, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return p.stdout.decode("utf-8", "replace").strip()
+
+
+def created_by(cwd, name):
+    out = git(cwd, "log", "--diff-filter=A", "--follow", "--format=%an", "--", name)
+    return out.split("\n")[-1] if out else ""
+
+
+def op_git_info(path):
+    is_dir = os.path.isdir(path)
+    cwd = path if is_dir else os.path.dirname(path)
+    result = {}
+    base = os.path.basename(path)
+    if base and base != ".":
+        author = created_by(cwd, base)
+        if author:
+            result["created_by"] = author
+    branch = git(cwd, "rev-parse", "--abbrev-ref", "HEAD")
+    if branch:
+        result["branch"] = branch
+    return result
+
+
+def op_git_authors(path, names):
+    if not git(path, "rev-parse", "--show-toplevel"):
+        return {}
+    authors = {}
+    for n in names:
+        a = created_by(path, n)
+        if a:
+            authors[n] = a
+    return authors
+
+
+# sshd runs exec requests as `<login shell> -c cmd`; do the same so a
+# command sees the PATH and rc files it would on its own exec channel.
+try:
+    LOGIN_SHELL = pwd.getpwuid(os.getuid()).pw_shell or "/bin/sh"
+except KeyError:
+    LOGIN_SHELL = os.environ.get("SHELL") or "/bin/sh"
+
+
+def op_sh(cmd, timeout=None):
+    try:
+        p = subprocess.run([LOGIN_SHELL, "-c", cmd], stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return {"stdout": (e.stdout or b"").decode("utf-8", "replace"),
+                "stderr": "timed out", "exit_code": -1}
+    return {"stdout": p.stdout.decode("utf-8", "replace"),
+            "stderr": p.stderr.decode("utf-8", "replace"),
+            "exit_code": p.returncode}
+
+
+OPS = {
+    "listdir": op_listdir, "stat": op_stat, "names": names,
+    "find": op_find, "git_info": op_git_info, "git_authors": op_git_authors,
+    "sh": op_sh,
+}
+
+
+def run_op(spec):
+    spec = dict(spec)
+    fn = OPS.get(spec.pop("op", None))
+    if fn is None:
+        return {"error": "unknown op"}
+    try:
+        return {"ok": fn(**spec)}
+    except OSError as e:
+        return {"error": e.strerror or str(e), "errno": e.errno}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def handle(req):
+    resp = {"id": req.get("id"), "results": [run_op(s) for s in req.get("ops", [])]}
+    line = json.dumps(resp, separators=(",", ":")) + "\n"
+    with out_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+sys.stdout.write(json.dumps({"ready": 1}) + "\n")
+sys.stdout.flush()
+for raw in sys.stdin:
+    try:
+        req = json.loads(raw)
+    except ValueError:
+        continue
+    threading.Thread(target=handle, args=(req,), daemon=True).start()
+'''
+
+
+class RemoteHelperError(Exception):
+    pass
+
+
+class RemoteHelper:
+    """Client for the helper process started on the remote over one channel.
+
+    Requests are tagged with an ID and answered out of order by the helper,
+    so several threads can have calls in flight on the same channel.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.channel = None
+        self._next_id = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.alive = False
+
+    def start(self, timeout=10):
+        channel = self.client.get_transport().open_session()
+        channel.settimeout(timeout)
+        channel.exec_command("exec python3 -u -c " + shlex.quote(HELPER_SOURCE))
+        self._stdout = channel.makefile("rb")
+        ready = self._stdout.readline()
+        if not ready or not json.loads(ready).get("ready"):
+            channel.close()
+            raise RemoteHelperError("Remote helper failed to start")
+        channel.settimeout(None)
+        self.channel = channel
+        self.alive = True
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        try:
+            for line in self._stdout:
+                reply = json.loads(line)
+                with self._lock:
+                    waiter = self._pending.pop(reply.get("id"), None)
+                if waiter:
+                    waiter["results"] = reply.get("results")
+                    waiter["event"].set()
+        except Exception:
+            pass
+        self.alive = False
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter["event"].set()
+
+    def call(self, ops, timeout=60):
+        """Send a batch of ops and return their results in order."""
+        if not self.alive:
+            raise RemoteHelperError("Remote helper is not running")
+        waiter = {"event": threading.Event(), "results": None}
+        with self._lock:
+            self._next_id += 1
+            req_id = self._next_id
+            self._pending[req_id] = waiter
+        line = json.dumps({"id": req_id, "ops": ops}) + "\n"
+        with self._send_lock:
+            self.channel.sendall(line.encode())
+        if not waiter["event"].wait(timeout):
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise RemoteHelperError("Remote helper timed out")
+        if waiter["results"] is None:
+            raise RemoteHelperError("Remote helper exited")
+        return waiter["results"]
+
+    def close(self):
+        self.alive = False
+        if self.channel:
+            self.channel.close()
+
+
+# Approximate memory budget for cached directory listings, per connection.
+LISTING_CACHE_MB = int(os.environ.get("SSH_GUI_LISTING_CACHE_MB", "32"))
+
+
+class ListingCache:
+    """LRU of directory listings for one connection, validated by dir mtime.
+
+    A hit still costs one stat of the directory, but skips the listing,
+    symlink stats and owner lookups. Mutating endpoints invalidate or patch
+    entries explicitly, since changes to a file's mode or contents do not
+    bump its parent's mtime.
+    """
+
+    # Listings taken within this many seconds of the directory's mtime are
+    # not cached: a second change in the same mtime tick would go unnoticed.
+    RACY_WINDOW = 2
+
+    def __init__(self, max_bytes=LISTING_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _cost(entries):
+        return sum(300 + 2 * len(e["name"]) for e in entries)
+
+    def get(self, path, mtime):
+        with self._lock:
+            item = self._items.get(path)
+            if item and item["mtime"] == mtime:
+                self._items.move_to_end(path)
+                self.hits += 1
+                return item["entries"]
+            self.misses += 1
+            return None
+
+    def put(self, path, mtime, entries):
+        if not mtime or abs(time.time() - mtime) < self.RACY_WINDOW:
+            return
+        cost = self._cost(entries)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(path)
+            self._items[path] = {"mtime": mtime, "entries": entries, "cost": cost}
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= old["cost"]
+                self.evictions += 1
+
+    def peek(self, path):
+        """Return a cached listing without validating it."""
+        with self._lock:
+            item = self._items.get(path)
+            return item["entries"] if item else None
+
+    def _drop(self, path):
+        item = self._items.pop(path, None)
+        if item:
+            self._bytes -= item["cost"]
+        return item is not None
+
+    def invalidate(self, *paths):
+        with self._lock:
+            for path in paths:
+                if self._drop(posixpath.normpath(path)):
+                    self.invalidations += 1
+
+    def invalidate_tree(self, path):
+        """Drop a directory's listing and every cached listing below it."""
+        path = posixpath.normpath(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            for p in [p for p in self._items if p == path or p.startswith(prefix)]:
+                self._drop(p)
+                self.invalidations += 1
+
+    def patch(self, path, **fields):
+        """Update one entry in its cached parent listing in place."""
+        parent, name = posixpath.split(posixpath.normpath(path))
+        with self._lock:
+            item = self._items.get(parent)
+            if not item:
+                return
+            entries = []
+            for e in item["entries"]:
+                entries.append(dict(e, **fields) if e["name"] == name else e)
+            item["entries"] = entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+class SizeCache:
+    """Recursive directory sizes for one connection.
+
+    Keyed by path and validated by the directory's own mtime. That only
+    moves when direct children change, so entries also expire after TTL
+    seconds to pick up changes deeper in the tree.
+    """
+
+    TTL = 300
+    LIMIT = 20000
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, mtime):
+        with self._lock:
+            item = self._items.get(path)
+            if item and item[0] == mtime and time.monotonic() - item[2] < self.TTL:
+                self._items.move_to_end(path)
+                return item[1]
+            return None
+
+    def put(self, path, mtime, size):
+        with self._lock:
+            self._items[path] = (mtime, size, time.monotonic())
+            self._items.move_to_end(path)
+            while len(self._items) > self.LIMIT:
+                self._items.popitem(last=False)
+
+    def compose(self, path, mtime, own_size, entries):
+        """Total a directory from its listing when every subdirectory's size
+        is already known, caching and returning it (else None)."""
+        total = own_size
+        for e in entries:
+            if e["is_dir"] and not e["is_link"]:
+                child = self.get(posixpath.join(path, e["name"]), e["mtime"])
+                if child is None:
+                    return None
+                total += child
+            else:
+                total += e["size"]
+        self.put(path, mtime, total)
+        return total
+
+
+class ListingCursors:
+    """Sorted listings kept per connection so a large directory can be paged
+    through by offset without listing it again."""
+
+    LIMIT = 8
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, path, entries):
+        cursor = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._items[cursor] = {"path": path, "entries": entries}
+            while len(self._items) > self.LIMIT:
+                self._items.popitem(last=False)
+        return cursor
+
+    def get(self, cursor):
+        with self._lock:
+            item = self._items.get(cursor)
+            if item:
+                self._items.move_to_end(cursor)
+            return item
+
+
+class NameDirectory:
+    """Remote uid/gid -> name maps for one connection, loaded once.
+
+    The passwd and group databases are read in a single exec at connect
+    time. An id missing from them (new account, or a directory service that
+    does not enumerate) gets one targeted getent lookup; ids that still do
+    not resolve are remembered so they are not asked about again.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.users = {}
+        self.groups = {}
+        self._unresolved = {"passwd": set(), "group": set()}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _run(self, cmd):
+        _, stdout, _ = self.client.exec_command(cmd, timeout=10)
+        return stdout.read().decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _parse(text, into):
+        for line in text.splitlines():
+            fields = line.split(":")
+            if len(fields) >= 3:
+                try:
+                    into.setdefault(int(fields[2]), fields[0])
+                except ValueError:
+                    pass
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                out = self._run(
+                    "(getent passwd || cat /etc/passwd) 2>/dev/null; echo '\x1e'; "
+                    "(getent group || cat /etc/group) 2>/dev/null"
+                )
+            except Exception:
+                # Channel trouble; try again on the next lookup
+                return
+            passwd, _, group = out.partition("\x1e")
+            self._parse(passwd, self.users)
+            self._parse(group, self.groups)
+            self._loaded = True
+
+    def add(self, users=None, groups=None):
+        """Merge names learned elsewhere (e.g. from the remote helper)."""
+        with self._lock:
+            for uid, name in (users or {}).items():
+                if name:
+                    self.users[int(uid)] = name
+            for gid, name in (groups or {}).items():
+                if name:
+                    self.groups[int(gid)] = name
+
+    def resolve(self, uids=(), gids=()):
+        """Make sure the given ids are known, asking the remote only for new ones."""
+        self.load()
+        for db, ids, known in (("passwd", uids, self.users), ("group", gids, self.groups)):
+            with self._lock:
+                unknown = {i for i in ids if i >= 0} - set(known) - self._unresolved[db]
+            if not unknown:
+                continue
+            try:
+                out = self._run(f"getent {db} {' '.join(str(i) for i in sorted(unknown))} 2>/dev/null")
+            except Exception:
+                out = ""
+            with self._lock:
+                self._parse(out, known)
+                self._unresolved[db] |= unknown - set(known)
+
+    def user(self, uid):
+        return self.users.get(uid, str(uid))
+
+    def group(self, gid):
+        return self.groups.get(gid, str(gid))
+
+
 # Multi-connection state
 connections = {}
-ssh_state = {
-    "client": None,
-    "jump_client": None,
-    "sftp": None,
-    "channel": None,
-    "home_dir": None,
-    "host": None,
-}
+connections_lock = threading.Lock()
+# Socket.IO sid -> connection whose terminal that socket drives
+terminals = {}
+
+
+def empty_state():
+    return {
+        "client": None, "jump_chain": [], "sftp_pool": None,
+        "helper": None, "watcher": None, "listing_cache": None,
+        "cursors": None, "sizes": None, "disk_usage": {},
+        "search_indexes": {}, "uploads": {}, "syncs": {}, "names": None,
+        "channel": None, "home_dir": None, "host": None, "login": None,
+        "copy_data": None,
+    }
+
+
+# The connection the current request targets. Resolved per request in
+# set_active_connection so concurrent handlers never see each other's host.
+ssh_state = LocalProxy(lambda: g.get("ssh_state") or empty_state())
 
 
 def get_connection_id():
-    """Get connection ID from request header or body."""
-    conn_id = request.headers.get("X-Connection-Id")
-    if not conn_id and request.is_json and request.json:
-        conn_id = request.json.get("connection_id")
+    """Get connection ID from request header, query string or body."""
+    conn_id = request.headers.get("X-Connection-Id") or request.args.get("connection_id")
+    if not conn_id and request.content_type and "json" in request.content_type:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            conn_id = body.get("connection_id")
     return conn_id
 
 
+def resolve_connection(conn_id):
+    """Look up a connection by ID, defaulting to the most recent one.
+
+    An ID that no longer exists resolves to None rather than falling back,
+    so a stale tab gets "Not connected" instead of acting on another host.
+    """
+    with connections_lock:
+        if conn_id:
+            return connections.get(conn_id)
+        if connections:
+            return next(reversed(connections.values()))
+    return None
+
+
 @app.before_request
 def set_active_connection():
-    """Swap ssh_state to the correct connection for this request."""
-    global ssh_state
-    conn_id = None
-    # Try header first
-    conn_id = request.headers.get("X-Connection-Id")
-    # Try JSON body
-    if not conn_id and request.content_type and "json" in request.content_type:
+    """Bind the connection for this request to request-local ssh_state."""
+    g.ssh_state = resolve_connection(get_connection_id())
+
+
+def listing_cache():
+    """The active connection's listing cache, or a throwaway one."""
+    return ssh_state.get("listing_cache") or ListingCache()
+
+
+def sftp_session(conn=None):
+    """Check an SFTP channel out of a connection's pool (default: active)."""
+    return (conn or ssh_state)["sftp_pool"].session()
+
+
+@app.errorhandler(TimeoutError)
+@app.errorhandler(paramiko.SSHException)
+def sftp_unavailable(e):
+    """A request that couldn't get an SFTP channel (pool exhausted, or the
+    connection closed under it) fails as JSON rather than an HTML 500."""
+    return jsonify({"error": str(e) or "Connection unavailable"}), 503
+
+
+def helper_call(*ops, conn=None):
+    """Run ops through the remote helper in one round trip.
+
+    Returns None when the connection has no live helper (or the call fails),
+    in which case callers fall back to plain SFTP/exec commands.
+    """
+    helper = (conn or ssh_state).get("helper")
+    if not helper or not helper.alive:
+        return None
+    try:
+        return helper.call(list(ops))
+    except (RemoteHelperError, OSError, paramiko.SSHException):
+        return None
+
+
+def helper_result(result):
+    """Unwrap one helper result, raising OSError the way SFTP calls would."""
+    if "error" in result:
+        if result.get("errno"):
+            raise OSError(result["errno"], result["error"])
+        raise RemoteHelperError(result["error"])
+    return result["ok"]
+
+
+class SSHConfigCache:
+    """~/.ssh/config (plus its Include files) parsed once and kept resolved.
+
+    Every access re-stats the config files; the parsed model is rebuilt only
+    when one of them, or a directory an Include glob expands in, changes.
+    Paramiko does not follow Include itself, so includes are inlined here.
+    """
+
+    MAX_INCLUDE_DEPTH = 16
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._watched = []
+        self._config = None
+        self._hosts = []
+        self._lookups = {}
+        self.etag = None
+
+    def _expand(self, path, depth, watched):
+        watched.append(path)
         try:
-            body = request.get_json(silent=True)
-            if body:
-                conn_id = body.get("connection_id")
-        except Exception:
-            pass
-    if conn_id and conn_id in connections:
-        ssh_state = connections[conn_id]
-    elif connections:
-        # Default to most recent connection
-        ssh_state = list(connections.values())[-1]
-    else:
-        ssh_state = {
-            "client": None, "jump_client": None, "sftp": None,
-            "channel": None, "home_dir": None, "host": None,
-        }
+            text = path.read_text()
+        except OSError:
+            return ""
+        out = []
+        for line in text.splitlines():
+            parts = line.strip().split(None, 1)
+            if len(parts) == 2 and parts[0].lower() == "include" and depth < self.MAX_INCLUDE_DEPTH:
+                for pattern in shlex.split(parts[1]):
+                    pattern = os.path.expanduser(pattern)
+                    if not os.path.isabs(pattern):
+                        pattern = str(self.path.parent / pattern)
+                    watched.append(Path(pattern).parent)
+                    for match in sorted(glob.glob(pattern)):
+                        out.append(self._expand(Path(match), depth + 1, watched))
+                continue
+            out.append(line)
+        return "\n".join(out)
 
+    def _stat_signature(self, paths):
+        sig = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                sig.append((str(p), st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((str(p), None, None))
+        return tuple(sig)
+
+    def _load(self):
+        watched = []
+        text = self._expand(self.path, 0, watched) if self.path.exists() else ""
+        config = paramiko.SSHConfig.from_text(text)
+        self._config = config
+        self._lookups = {}
+        self._watched = list(dict.fromkeys([self.path] + watched))
+        self._signature = self._stat_signature(self._watched)
+        self.etag = hashlib.sha1(repr(self._signature).encode()).hexdigest()
+
+        hosts = []
+        for hostname in config.get_hostnames():
+            if "*" in hostname or "?" in hostname or hostname.startswith("!"):
+                continue
+            info = self._lookup(hostname)
+            identity = ""
+            if info.get("identityfile"):
+                identity = info["identityfile"][0]
+            hosts.append(
+                {
+                    "name": hostname,
+                    "hostname": info.get("hostname", hostname),
+                    "user": info.get("user", os.environ.get("USER", "")),
+                    "port": int(info.get("port", 22)),
+                    "identity_file": identity,
+                }
+            )
+        self._hosts = sorted(hosts, key=lambda h: h["name"])
 
-def parse_ssh_config():
-    config_path = Path.home() / ".ssh" / "config"
-    if not config_path.exists():
-        return []
+    def _lookup(self, name):
+        if name not in self._lookups:
+            self._lookups[name] = self._config.lookup(name)
+        return self._lookups[name]
 
-    config = paramiko.SSHConfig()
-    with open(config_path) as f:
-        config.parse(f)
+    def refresh(self):
+        with self._lock:
+            if self._config is None or self._stat_signature(self._watched) != self._signature:
+                self._load()
+        return self
 
-    hosts = []
-    for hostname in config.get_hostnames():
-        if "*" in hostname or "?" in hostname:
-            continue
-        info = config.lookup(hostname)
-        identity = ""
-        if info.get("identityfile"):
-            identity = info["identityfile"][0]
-        hosts.append(
-            {
-                "name": hostname,
-                "hostname": info.get("hostname", hostname),
-                "user": info.get("user", os.environ.get("USER", "")),
-                "port": int(info.get("port", 22)),
-                "identity_file": identity,
-            }
-        )
+    def hosts(self):
+        return self.refresh()._hosts
 
-    return sorted(hosts, key=lambda h: h["name"])
+    def lookup(self, name):
+        self.refresh()
+        with self._lock:
+            return self._lookup(name)
 
+    def has_host(self, name):
+        self.refresh()
+        return name in self._config.get_hostnames()
 
-def cleanup_connection():
-    for key in ("channel", "sftp", "client", "jump_client"):
-        if ssh_state.get(key):
+
+ssh_config = SSHConfigCache(Path.home() / ".ssh" / "config")
+
+
+def parse_ssh_config():
+    return ssh_config.hosts()
+
+
+def close_connection(conn):
+    cancel_jobs(conn=conn)
+    for key in ("channel", "watcher", "helper", "sftp_pool", "client"):
+        if conn.get(key):
             try:
-                ssh_state[key].close()
+                conn[key].close()
             except Exception:
                 pass
-            ssh_state[key] = None
-    ssh_state["home_dir"] = None
-    ssh_state["host"] = None
+            conn[key] = None
+    release_jump_chain(conn.get("jump_chain"))
+    conn["jump_chain"] = []
 
 
 @app.route("/")
@@ -117,12 +910,17 @@ def index():
 @app.route("/api/ssh-configs")
 def get_ssh_configs():
     configs = parse_ssh_config()
-    return jsonify(
+    resp = jsonify(
         {
             "hosts": configs,
             "default_user": os.environ.get("USER", ""),
         }
     )
+    # Let the browser revalidate with If-None-Match and get a 304 back
+    # until ~/.ssh/config or one of its includes changes.
+    resp.set_etag(ssh_config.etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
 
 @app.route("/api/save-host", methods=["POST"])
@@ -137,16 +935,12 @@ def save_host():
     if not alias or not hostname:
         return jsonify({"error": "Name and hostname are required"}), 400
 
-    config_path = Path.home() / ".ssh" / "config"
+    config_path = ssh_config.path
     config_path.parent.mkdir(mode=0o700, exist_ok=True)
 
     # Check if alias already exists
-    if config_path.exists():
-        config = paramiko.SSHConfig()
-        with open(config_path) as f:
-            config.parse(f)
-        if alias in config.get_hostnames():
-            return jsonify({"error": f"Host '{alias}' already exists"}), 400
+    if ssh_config.has_host(alias):
+        return jsonify({"error": f"Host '{alias}' already exists"}), 400
 
     # Append new host entry
     lines = ["\n", f"Host {alias}\n", f"    HostName {hostname}\n"]
@@ -163,6 +957,130 @@ def save_host():
     return jsonify({"status": "ok"})
 
 
+# ── Jump Hosts ─────────────────────────────────────────────────────
+
+# Bastion clients shared by every connection routed through them. Keyed by
+# the chain of hops that reaches the bastion, so "a" and "a,b" are separate
+# entries and each hop is only handshaked once however many targets use it.
+bastions = {}
+bastions_lock = threading.Lock()
+bastion_key_locks = {}
+
+
+def parse_jump_spec(spec, config):
+    """Resolve one ProxyJump hop ([user@]host[:port]) against ssh config."""
+    user = port = None
+    if "@" in spec:
+        user, spec = spec.rsplit("@", 1)
+    if spec.startswith("[") and "]" in spec:
+        host, _, rest = spec[1:].partition("]")
+        port = rest.lstrip(":") or None
+        spec = host
+    elif spec.count(":") == 1:
+        spec, port = spec.split(":")
+    info = config.lookup(spec) if config else {}
+    return {
+        "hostname": info.get("hostname", spec),
+        "port": int(port or info.get("port", 22)),
+        "user": user or info.get("user", os.environ.get("USER", "")),
+        "identityfile": info.get("identityfile", []),
+    }
+
+
+def parse_proxy_jump(value, config):
+    """Split a ProxyJump value into resolved hops, nearest first."""
+    if not value or value.strip().lower() == "none":
+        return []
+    return [parse_jump_spec(h.strip(), config) for h in value.split(",") if h.strip()]
+
+
+def connect_bastion(hop, sock=None):
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.load_system_host_keys()
+
+    kwargs = {
+        "hostname": hop["hostname"],
+        "port": hop["port"],
+        "username": hop["user"],
+        "timeout": 30,
+        "allow_agent": True,
+        "look_for_keys": True,
+    }
+    if sock:
+        kwargs["sock"] = sock
+    if hop["identityfile"]:
+        expanded = os.path.expanduser(hop["identityfile"][0])
+        if os.path.exists(expanded):
+            kwargs["key_filename"] = expanded
+
+    client.connect(**kwargs)
+    return client
+
+
+def acquire_jump_chain(hops):
+    """Connect (or reuse) every hop in order and take a reference on each.
+
+    Returns the list of bastion keys held, deepest last. The caller opens its
+    tunnel on the transport of the last key and must hand the keys back to
+    release_jump_chain when the connection closes.
+    """
+    keys = []
+    try:
+        for i, hop in enumerate(hops):
+            key = tuple((h["user"], h["hostname"], h["port"]) for h in hops[: i + 1])
+            with bastions_lock:
+                key_lock = bastion_key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                with bastions_lock:
+                    entry = bastions.get(key)
+                transport = entry["client"].get_transport() if entry else None
+                if not transport or not transport.is_active():
+                    sock = None
+                    if keys:
+                        sock = bastions[keys[-1]]["client"].get_transport().open_channel(
+                            "direct-tcpip", (hop["hostname"], hop["port"]), ("127.0.0.1", 0)
+                        )
+                    print(f"  Connecting to jump host {hop['user']}@{hop['hostname']}:{hop['port']}...")
+                    client = connect_bastion(hop, sock)
+                    if entry:
+                        entry["client"].close()
+                    with bastions_lock:
+                        refs = entry["refs"] if entry else 0
+                        entry = bastions[key] = {"client": client, "refs": refs}
+                else:
+                    print(f"  Reusing jump host {hop['hostname']}:{hop['port']}")
+                with bastions_lock:
+                    entry["refs"] += 1
+                keys.append(key)
+    except Exception:
+        release_jump_chain(keys)
+        raise
+    return keys
+
+
+def release_jump_chain(keys):
+    """Drop one reference on each hop, closing bastions nobody uses."""
+    for key in reversed(keys or []):
+        with bastions_lock:
+            entry = bastions.get(key)
+            if not entry:
+                continue
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                continue
+            del bastions[key]
+        try:
+            entry["client"].close()
+        except Exception:
+            pass
+
+
+def open_jump_tunnel(keys, hostname, port):
+    transport = bastions[keys[-1]]["client"].get_transport()
+    return transport.open_channel("direct-tcpip", (hostname, port), ("127.0.0.1", 0))
+
+
 @app.route("/api/connect", methods=["POST"])
 def connect():
     data = request.json
@@ -172,64 +1090,37 @@ def connect():
     port = int(data.get("port", 22))
     key_file = data.get("key_file", "")
     config_host = data.get("config_host", "")
+    use_helper = data.get("helper", REMOTE_HELPER)
+    listing_limit = int(data.get("listing_limit", 0))
 
     # If using SSH config, look up the host
-    jump_config = None
+    hops = []
     if config_host:
-        config_path = Path.home() / ".ssh" / "config"
-        if config_path.exists():
-            config = paramiko.SSHConfig()
-            with open(config_path) as f:
-                config.parse(f)
-            info = config.lookup(config_host)
-            hostname = info.get("hostname", config_host)
-            username = username or info.get("user", os.environ.get("USER", ""))
-            port = int(info.get("port", port))
-            if not key_file and info.get("identityfile"):
-                key_file = info["identityfile"][0]
-            if info.get("proxyjump"):
-                jump_host = info["proxyjump"]
-                jump_info = config.lookup(jump_host)
-                jump_config = {
-                    "hostname": jump_info.get("hostname", jump_host),
-                    "port": int(jump_info.get("port", 22)),
-                    "user": jump_info.get("user", os.environ.get("USER", "")),
-                    "identityfile": jump_info.get("identityfile", []),
-                }
-
-    cleanup_connection()
+        info = ssh_config.lookup(config_host)
+        hostname = info.get("hostname", config_host)
+        username = username or info.get("user", os.environ.get("USER", ""))
+        port = int(info.get("port", port))
+        if not key_file and info.get("identityfile"):
+            key_file = info["identityfile"][0]
+        hops = parse_proxy_jump(info.get("proxyjump"), ssh_config)
+
+    jump_chain = []
+    client = None
+    started = time.monotonic()
+    timings = {}
+
+    def elapsed_ms(since):
+        return round((time.monotonic() - since) * 1000, 1)
 
     try:
         sock = None
 
-        # Handle ProxyJump: connect to jump host first, tunnel through it
-        if jump_config:
-            print(f"  Connecting to jump host {jump_config['user']}@{jump_config['hostname']}:{jump_config['port']}...")
-            jump_client = paramiko.SSHClient()
-            jump_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            jump_client.load_system_host_keys()
-
-            jump_kwargs = {
-                "hostname": jump_config["hostname"],
-                "port": jump_config["port"],
-                "username": jump_config["user"],
-                "timeout": 30,
-                "allow_agent": True,
-                "look_for_keys": True,
-            }
-            if jump_config["identityfile"]:
-                expanded = os.path.expanduser(jump_config["identityfile"][0])
-                if os.path.exists(expanded):
-                    jump_kwargs["key_filename"] = expanded
-
-            jump_client.connect(**jump_kwargs)
-            ssh_state["jump_client"] = jump_client
-            print(f"  Jump host connected. Tunneling to {hostname}:{port}...")
-
-            jump_transport = jump_client.get_transport()
-            sock = jump_transport.open_channel(
-                "direct-tcpip", (hostname, port), ("127.0.0.1", 0)
-            )
+        # Handle ProxyJump: reach the target through the (shared) hop chain
+        if hops:
+            jump_chain = acquire_jump_chain(hops)
+            print(f"  Jump hosts ready. Tunneling to {hostname}:{port}...")
+            sock = open_jump_tunnel(jump_chain, hostname, port)
+            timings["jump_ms"] = elapsed_ms(started)
 
         client = paramiko.SSHClient()
         client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -259,117 +1150,287 @@ def connect():
             connect_kwargs["look_for_keys"] = True
 
         print(f"  Connecting to {username}@{hostname}:{port}...")
+        phase = time.monotonic()
         client.connect(**connect_kwargs)
+        timings["handshake_ms"] = elapsed_ms(phase)
         print(f"  Connected!")
 
-        sftp = client.open_sftp()
-
-        _, stdout, _ = client.exec_command("echo $HOME")
-        home_dir = stdout.read().decode().strip()
-
-        conn_id = str(uuid.uuid4())
         conn = {
             "client": client,
-            "jump_client": ssh_state.get("jump_client"),
-            "sftp": sftp,
+            "jump_chain": jump_chain,
+            "sftp_pool": SFTPPool(client),
+            "helper": None,
+            "watcher": None,
+            "listing_cache": ListingCache(),
+            "cursors": ListingCursors(),
+            "sizes": SizeCache(),
+            "disk_usage": {},
+            "search_indexes": {},
+            "uploads": {},
+            "syncs": {},
+            "names": NameDirectory(client),
             "channel": None,
-            "home_dir": home_dir,
+            "home_dir": None,
             "host": config_host or hostname,
+            "login": (username, hostname, port),
+            "copy_data": None,
         }
-        connections[conn_id] = conn
 
-        return jsonify(
-            {
-                "status": "connected",
-                "connection_id": conn_id,
-                "home_dir": home_dir,
-                "host": conn["host"],
-                "username": username,
-            }
-        )
+        # Post-auth setup runs concurrently on separate channels of the one
+        # transport: the SFTP channel finds $HOME and lists it while the
+        # uid/gid names load and the helper (if any) starts up.
+        def open_browser():
+            phase = time.monotonic()
+            with conn["sftp_pool"].session() as sftp:
+                timings["sftp_ms"] = elapsed_ms(phase)
+                phase = time.monotonic()
+                try:
+                    conn["home_dir"] = sftp.normalize(".")
+                except IOError:
+                    _, stdout, _ = client.exec_command("echo $HOME")
+                    conn["home_dir"] = stdout.read().decode().strip()
+                timings["home_ms"] = elapsed_ms(phase)
+            phase = time.monotonic()
+            try:
+                entries = list_entries(conn, conn["home_dir"])
+            except Exception:
+                return None
+            timings["listing_ms"] = elapsed_ms(phase)
+            if listing_limit:
+                return listing_window(conn, conn["home_dir"], entries, 0, listing_limit)
+            return {"path": conn["home_dir"], "entries": entries}
+
+        def start_helper():
+            phase = time.monotonic()
+            helper = RemoteHelper(client)
+            try:
+                helper.start()
+                print(f"  Remote helper running.")
+            except Exception as e:
+                print(f"  Remote helper unavailable ({e}), using plain commands.")
+                return None
+            timings["helper_ms"] = elapsed_ms(phase)
+            return helper
+
+        def load_names():
+            phase = time.monotonic()
+            conn["names"].load()
+            timings["names_ms"] = elapsed_ms(phase)
+
+        with ThreadPoolExecutor(max_workers=3) as setup:
+            setup.submit(load_names)
+            browser_future = setup.submit(open_browser)
+            helper_future = setup.submit(start_helper) if use_helper else None
+            listing = browser_future.result()
+            if helper_future:
+                conn["helper"] = helper_future.result()
+        timings["total_ms"] = elapsed_ms(started)
+
+        conn_id = str(uuid.uuid4())
+        with connections_lock:
+            connections[conn_id] = conn
+
+        result = {
+            "status": "connected",
+            "connection_id": conn_id,
+            "home_dir": conn["home_dir"],
+            "host": conn["host"],
+            "username": username,
+            "helper": conn["helper"] is not None,
+            "timings": timings,
+        }
+        if listing:
+            result["listing"] = listing
+        return jsonify(result)
     except Exception as e:
         import traceback
 
         traceback.print_exc()
+        if client:
+            client.close()
+        release_jump_chain(jump_chain)
         return jsonify({"status": "error", "message": str(e)}), 400
 
 
 @app.route("/api/disconnect", methods=["POST"])
 def disconnect():
     conn_id = get_connection_id()
-    if conn_id and conn_id in connections:
-        conn = connections.pop(conn_id)
-        for key in ("channel", "sftp", "client", "jump_client"):
-            if conn.get(key):
-                try:
-                    conn[key].close()
-                except Exception:
-                    pass
-    else:
-        cleanup_connection()
+    with connections_lock:
+        if not conn_id:
+            conn_id = next(reversed(connections), None)
+        conn = connections.pop(conn_id, None) if conn_id else None
+    if conn:
+        close_connection(conn)
     return jsonify({"status": "disconnected"})
 
 
-@app.route("/api/ls", methods=["POST"])
-def list_directory():
-    if not ssh_state["sftp"]:
-        return jsonify({"error": "Not connected"}), 400
+def make_entry(name, mode, size, mtime, uid, gid, target_is_dir=False):
+    """Build a column browser entry from raw stat fields."""
+    is_link = stat.S_ISLNK(mode) if mode else False
+    return {
+        "name": name,
+        "is_dir": (stat.S_ISDIR(mode) if mode else False) or (is_link and target_is_dir),
+        "is_link": is_link,
+        "size": size if size else 0,
+        "mode": stat.filemode(mode) if mode else "?---------",
+        "mtime": mtime if mtime else 0,
+        "uid": uid if uid is not None else -1,
+        "gid": gid if gid is not None else -1,
+    }
+
+
+def list_entries(conn, path):
+    """List a remote directory as sorted column entries with owner names.
+
+    Served from the connection's listing cache while the directory's mtime
+    is unchanged.
+    """
+    cache = conn.get("listing_cache")
+    if not cache:
+        return read_entries(conn, path)
+    found = helper_call({"op": "stat", "path": path}, conn=conn)
+    if found:
+        mtime = helper_result(found[0])["mtime"]
+    else:
+        with sftp_session(conn) as sftp:
+            mtime = sftp.stat(path).st_mtime
+    entries = cache.get(path, mtime)
+    if entries is None:
+        entries = read_entries(conn, path)
+        cache.put(path, mtime, entries)
+    return entries
+
+
+def entry_sort_key(e):
+    return (not e["is_dir"], e["name"].lower())
+
+
+def iter_sftp_entries(sftp, path, chunk=1000, read_aheads=50):
+    """Yield a directory's entries over SFTP in chunks, in arrival order.
+
+    READDIR requests are pipelined `read_aheads` at a time, and every reply
+    is in before a chunk is yielded: the channel is then idle, so symlink
+    targets can be batch-stat'd on it and the caller can stop early.
+    """
+    t, msg = sftp._request(CMD_OPENDIR, sftp._adjust_cwd(path))
+    if t != CMD_HANDLE:
+        raise paramiko.SFTPError("Expected handle")
+    handle = msg.get_binary()
+    collector = _SFTPReplies()
+    try:
+        attrs = []
+        done = False
+        while not done:
+            nums = [
+                sftp._async_request(collector, CMD_READDIR, handle)
+                for _ in range(read_aheads)
+            ]
+            while len(collector.replies) < len(nums):
+                sftp._read_response()
+            for num in nums:
+                t, msg = collector.replies.pop(num)
+                if t == CMD_STATUS:
+                    try:
+                        sftp._convert_status(msg)
+                    except EOFError:
+                        done = True
+                    continue
+                if t != CMD_NAME:
+                    raise paramiko.SFTPError("Expected name response")
+                for _ in range(msg.get_int()):
+                    filename = msg.get_text()
+                    longname = msg.get_text()
+                    attr = paramiko.SFTPAttributes._from_msg(msg, filename, longname)
+                    if filename not in (".", ".."):
+                        attrs.append(attr)
+            if attrs and (done or len(attrs) >= chunk):
+                yield sftp_entries(sftp, path, attrs)
+                attrs = []
+    finally:
+        try:
+            sftp._request(CMD_CLOSE, handle)
+        except Exception:
+            pass
 
-    path = request.json.get("path", ssh_state["home_dir"])
-    path = posixpath.normpath(path)
 
-    try:
+def sftp_entries(sftp, path, attrs):
+    # For symlinks, check if the target is a directory (all at once)
+    links = [a for a in attrs if a.st_mode and stat.S_ISLNK(a.st_mode)]
+    targets = batch_stat(sftp, [posixpath.join(path, a.filename) for a in links])
+    target_dirs = {
+        a.filename for a, t in zip(links, targets)
+        if t and t.st_mode and stat.S_ISDIR(t.st_mode)
+    }
+    return [
+        make_entry(
+            a.filename, a.st_mode, a.st_size, a.st_mtime,
+            a.st_uid, a.st_gid, a.filename in target_dirs,
+        )
+        for a in attrs
+    ]
+
+
+def set_owners(conn, entries, uid_map=None):
+    # Owner names come from the connection's name directory, which only
+    # goes to the remote for uids it has not seen before
+    names = conn.get("names")
+    if names:
+        names.add(users=uid_map)
+        names.resolve(uids=set(e["uid"] for e in entries))
+    for e in entries:
+        e["owner"] = names.user(e["uid"]) if names else str(e["uid"])
+
+
+def read_entries(conn, path):
+    uid_map = {}
+    listing = helper_call({"op": "listdir", "path": path}, conn=conn)
+    if listing:
+        result = helper_result(listing[0])
+        entries = [make_entry(*fields) for fields in result["entries"]]
+        uid_map = {int(u): name for u, name in result["users"].items()}
+    else:
         entries = []
-        for attr in ssh_state["sftp"].listdir_attr(path):
-            entry_mode = attr.st_mode
-            is_dir = stat.S_ISDIR(entry_mode) if entry_mode else False
-            is_link = stat.S_ISLNK(entry_mode) if entry_mode else False
+        with sftp_session(conn) as sftp:
+            for part in iter_sftp_entries(sftp, path):
+                entries.extend(part)
 
-            # For symlinks, check if target is a directory
-            if is_link:
-                try:
-                    target_path = posixpath.join(path, attr.filename)
-                    target_stat = ssh_state["sftp"].stat(target_path)
-                    is_dir = stat.S_ISDIR(target_stat.st_mode)
-                except Exception:
-                    pass
+    entries.sort(key=entry_sort_key)
+    set_owners(conn, entries, uid_map)
+    return entries
 
-            entries.append(
-                {
-                    "name": attr.filename,
-                    "is_dir": is_dir,
-                    "is_link": is_link,
-                    "size": attr.st_size if attr.st_size else 0,
-                    "mode": stat.filemode(entry_mode) if entry_mode else "?---------",
-                    "mtime": attr.st_mtime if attr.st_mtime else 0,
-                    "uid": attr.st_uid if attr.st_uid is not None else -1,
-                    "gid": attr.st_gid if attr.st_gid is not None else -1,
-                }
-            )
 
-        entries.sort(key=lambda e: (not e["is_dir"], e["name"].lower()))
+def listing_window(conn, path, entries, offset, limit, cursor=None):
+    """Slice a sorted listing, opening a cursor over it if there is none."""
+    if cursor is None:
+        cursor = conn["cursors"].open(path, entries)
+    offset = max(0, min(offset, len(entries)))
+    return {
+        "path": path,
+        "entries": entries[offset:offset + limit],
+        "offset": offset,
+        "total": len(entries),
+        "cursor": cursor,
+    }
 
-        # Resolve uid -> username in bulk
-        uids = set(e["uid"] for e in entries if e["uid"] >= 0)
-        uid_map = {}
-        if uids and ssh_state["client"]:
-            try:
-                parts = " ".join(f"id -nu {u} 2>/dev/null || echo {u}" for u in uids)
-                cmd = f"for u in {' '.join(str(u) for u in uids)}; do echo \"$u $(id -nu $u 2>/dev/null || echo $u)\"; done"
-                _, stdout, _ = ssh_state["client"].exec_command(cmd, timeout=5)
-                for line in stdout.read().decode().strip().split("\n"):
-                    parts = line.split(None, 1)
-                    if len(parts) == 2:
-                        try:
-                            uid_map[int(parts[0])] = parts[1]
-                        except ValueError:
-                            pass
-            except Exception:
-                pass
 
-        for e in entries:
-            e["owner"] = uid_map.get(e["uid"], str(e["uid"]))
+@app.route("/api/ls", methods=["POST"])
+def list_directory():
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", ssh_state["home_dir"])
+    path = posixpath.normpath(path)
 
+    try:
+        entries = list_entries(ssh_state, path)
+        # With a limit, return one window of the sorted listing plus a
+        # cursor for fetching the rest (see /api/ls-window)
+        if data.get("limit"):
+            return jsonify(listing_window(
+                ssh_state, path, entries,
+                int(data.get("offset", 0)), int(data["limit"]),
+            ))
         return jsonify({"path": path, "entries": entries})
     except PermissionError:
         return jsonify({"error": f"Permission denied: {path}"}), 403
@@ -379,81 +1440,258 @@ def list_directory():
         return jsonify({"error": str(e)}), 400
 
 
-@app.route("/api/dir-sizes", methods=["POST"])
-def get_dir_sizes():
-    if not ssh_state["client"]:
+@app.route("/api/ls-window", methods=["POST"])
+def listing_window_page():
+    """Fetch a window of a listing opened by /api/ls or /api/ls-stream.
+
+    Pass "offset", or "name" to centre the window on that entry.
+    """
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     data = request.json
-    path = data.get("path", "")
-    names = data.get("names", [])
-
-    if not path or not names:
-        return jsonify({"sizes": {}})
-
-    try:
-        # Run du -sb on each directory individually so permission errors
-        # or slow dirs don't block the rest. Use -s (summarize) and a
-        # per-directory timeout so one slow tree doesn't kill everything.
-        script_parts = []
-        for n in names:
-            quoted = shlex.quote(posixpath.join(path, n))
-            # Try du -sb first (GNU), fall back to du -sk (BSD/macOS)
-            script_parts.append(
-                f"timeout 5 du -sb {quoted} 2>/dev/null || "
-                f"timeout 5 du -sk {quoted} 2>/dev/null || "
-                f"echo '0\t'{quoted}"
-            )
-        cmd = "; ".join(script_parts) + "; exit 0"
-
-        _, stdout, _ = ssh_state["client"].exec_command(cmd)
-        output = stdout.read().decode()
-
-        sizes = {}
-        for line in output.strip().split("\n"):
-            if "\t" in line:
-                size_str, dir_path = line.split("\t", 1)
-                try:
-                    name = posixpath.basename(dir_path.rstrip("/"))
-                    val = int(size_str)
-                    # Skip 0 values -- they come from the fallback when du fails
-                    if val > 0 and name not in sizes:
-                        sizes[name] = val
-                except ValueError:
-                    pass
+    cursor = data.get("cursor", "")
+    limit = int(data.get("limit", 1000))
+    item = ssh_state["cursors"].get(cursor)
+    if not item:
+        return jsonify({"error": "Listing expired"}), 404
+
+    entries = item["entries"]
+    offset = int(data.get("offset", 0))
+    if data.get("name"):
+        for i, e in enumerate(entries):
+            if e["name"] == data["name"]:
+                offset = i - limit // 2
+                break
+    return jsonify(listing_window(ssh_state, item["path"], entries, offset, limit, cursor))
 
-        return jsonify({"sizes": sizes})
-    except Exception:
-        return jsonify({"sizes": {}})
 
+@app.route("/api/ls-stream", methods=["POST"])
+def stream_directory():
+    """List a directory as NDJSON, one line per chunk of entries.
 
-@app.route("/api/chmod", methods=["POST"])
-def chmod_entry():
-    if not ssh_state["sftp"]:
+    Chunks arrive unsorted as the server reads them; the last line carries
+    the total and a cursor over the sorted listing for /api/ls-window.
+    """
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
+    conn = ssh_state._get_current_object()
     data = request.json
-    path = data.get("path", "")
-    mode = data.get("mode", 0)
-
-    if not path:
-        return jsonify({"error": "path is required"}), 400
+    path = posixpath.normpath(data.get("path", conn["home_dir"]))
+    chunk = max(1, int(data.get("chunk", 1000)))
 
+    pool = conn["sftp_pool"]
+    sftp = pool.acquire()
     try:
-        ssh_state["sftp"].chmod(path, mode)
-        # Return updated stat
-        new_stat = ssh_state["sftp"].stat(path)
-        new_mode = stat.filemode(new_stat.st_mode) if new_stat.st_mode else "?---------"
-        return jsonify({"status": "ok", "mode": new_mode})
-    except PermissionError:
-        return jsonify({"error": "Permission denied"}), 403
+        mtime = sftp.stat(path).st_mtime
+        cached = conn["listing_cache"].get(path, mtime)
+        if cached is not None:
+            pool.release(sftp)
+            sftp = None
+            chunks = iter([cached[i:i + chunk] for i in range(0, len(cached), chunk)])
+        else:
+            chunks = iter_sftp_entries(sftp, path, chunk)
+        first = next(chunks, [])
     except Exception as e:
+        if sftp:
+            pool.release(sftp)
+        if isinstance(e, PermissionError):
+            return jsonify({"error": f"Permission denied: {path}"}), 403
+        if isinstance(e, FileNotFoundError):
+            return jsonify({"error": f"Not found: {path}"}), 404
         return jsonify({"error": str(e)}), 400
 
+    held = [sftp]
 
-@app.route("/api/delete", methods=["POST"])
+    def release():
+        """Close the listing and return the channel, once, whether the
+        stream finished or the client went away before reading it."""
+        if held[0]:
+            sftp, held[0] = held[0], None
+            close = getattr(chunks, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+            pool.release(sftp)
+
+    def generate():
+        entries = []
+        try:
+            part = first
+            while part:
+                if cached is None:
+                    set_owners(conn, part)
+                entries.extend(part)
+                yield json.dumps({"entries": part}) + "\n"
+                part = next(chunks, None)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        finally:
+            release()
+        if cached is None:
+            entries.sort(key=entry_sort_key)
+            conn["listing_cache"].put(path, mtime, entries)
+        yield json.dumps({
+            "done": True,
+            "path": path,
+            "total": len(entries),
+            "cursor": conn["cursors"].open(path, entries),
+        }) + "\n"
+
+    response = Response(generate(), mimetype="application/x-ndjson")
+    response.call_on_close(release)
+    return response
+
+
+# du runs this many directories at once on the remote, each with its own
+# time limit, so one huge tree does not hold up its siblings.
+DU_PARALLEL = 4
+DU_TIMEOUT = 60
+
+
+def stream_du(conn, paths, job=None):
+    """Yield (path, bytes) as each directory's du finishes on the remote.
+
+    All paths go through one exec channel: xargs runs DU_PARALLEL du
+    processes and their lines stream back as they complete. Directories
+    that time out or cannot be read are left out.
+    """
+    # GNU du -sb, else (unless it timed out) BSD du -sk scaled to bytes
+    script = (
+        f's=$(timeout {DU_TIMEOUT} du -sb -- "$1" 2>/dev/null); rc=$?; '
+        f'[ -n "$s" ] || [ $rc = 124 ] || s=$(timeout {DU_TIMEOUT} du -sk -- "$1" 2>/dev/null '
+        "| awk -F '\\t' '{print $1 * 1024 \"\\t\" $2}'); "
+        '[ -z "$s" ] || printf \'%s\\n\' "$s"'
+    )
+    cmd = "printf '%s\\0' {} | xargs -0 -n 1 -P {} sh -c {} _".format(
+        " ".join(shlex.quote(p) for p in paths), DU_PARALLEL, shlex.quote(script)
+    )
+    channel = conn["client"].get_transport().open_session()
+    if job:
+        # The pty lets sshd hang up the du processes when a job is cancelled
+        channel.get_pty(width=1000)
+        job.attach(channel)
+    channel.exec_command(cmd)
+    wanted = set(paths)
+    buf = b""
+    while True:
+        data = channel.recv(65536)
+        if not data:
+            break
+        buf += data
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            size, _, path = line.decode("utf-8", errors="replace").rstrip("\r").partition("\t")
+            if path in wanted and size.isdigit():
+                yield path, int(size)
+    channel.close()
+
+
+def known_dir_sizes(conn, path, names):
+    """Split subdirectories of `path` into cached sizes and ones to compute.
+
+    Returns ({name: size}, {name: mtime}). A child whose own listing is
+    cached and whose subdirectories are all sized is totalled without du.
+    """
+    sizes, missing = {}, {}
+    listings = conn["listing_cache"]
+    entries = {e["name"]: e for e in listings.peek(path) or []}
+    unlisted = [n for n in names if n not in entries]
+    if unlisted:
+        with sftp_session(conn) as sftp:
+            for n, st in zip(unlisted, batch_stat(sftp, [posixpath.join(path, n) for n in unlisted])):
+                if st:
+                    entries[n] = {"mtime": st.st_mtime, "size": st.st_size or 0}
+    for n in names:
+        if n not in entries:
+            continue
+        child = posixpath.join(path, n)
+        mtime = entries[n]["mtime"]
+        size = conn["sizes"].get(child, mtime)
+        if size is None:
+            listing = listings.get(child, mtime)
+            if listing is not None:
+                size = conn["sizes"].compose(child, mtime, entries[n]["size"], listing)
+        if size is None:
+            missing[n] = mtime
+        else:
+            sizes[n] = size
+    return sizes, missing
+
+
+def compute_dir_sizes(conn, path, missing, job=None):
+    """du the given children of `path`, caching and yielding (name, size)."""
+    full = {posixpath.join(path, n): n for n in missing}
+    for child, size in stream_du(conn, list(full), job):
+        name = full[child]
+        conn["sizes"].put(child, missing[name], size)
+        yield name, size
+
+
+def compose_parent(conn, path):
+    """Total `path` itself from its cached listing and child sizes, if known."""
+    with sftp_session(conn) as sftp:
+        st = sftp.stat(path)
+    listing = conn["listing_cache"].get(path, st.st_mtime)
+    if listing is None:
+        return None
+    return conn["sizes"].compose(path, st.st_mtime, st.st_size or 0, listing)
+
+
+@app.route("/api/dir-sizes", methods=["POST"])
+def get_dir_sizes():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", "")
+    names = data.get("names", [])
+
+    if not path or not names:
+        return jsonify({"sizes": {}})
+
+    try:
+        sizes, missing = known_dir_sizes(ssh_state, path, names)
+        if missing:
+            sizes.update(compute_dir_sizes(ssh_state, path, missing))
+        return jsonify({"sizes": sizes})
+    except Exception:
+        return jsonify({"sizes": {}})
+
+
+@app.route("/api/chmod", methods=["POST"])
+def chmod_entry():
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", "")
+    mode = data.get("mode", 0)
+
+    if not path:
+        return jsonify({"error": "path is required"}), 400
+
+    try:
+        with sftp_session() as sftp:
+            sftp.chmod(path, mode)
+            # Return updated stat
+            new_stat = sftp.stat(path)
+        new_mode = stat.filemode(new_stat.st_mode) if new_stat.st_mode else "?---------"
+        listing_cache().patch(path, mode=new_mode)
+        return jsonify({"status": "ok", "mode": new_mode})
+    except PermissionError:
+        return jsonify({"error": "Permission denied"}), 403
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/delete", methods=["POST"])
 def delete_entry():
-    if not ssh_state["sftp"] or not ssh_state["client"]:
+    if not ssh_state["sftp_pool"] or not ssh_state["client"]:
         return jsonify({"error": "Not connected"}), 400
 
     data = request.json
@@ -474,7 +1712,11 @@ def delete_entry():
             if err:
                 return jsonify({"error": err}), 400
         else:
-            ssh_state["sftp"].remove(path)
+            with sftp_session() as sftp:
+                sftp.remove(path)
+        cache = listing_cache()
+        cache.invalidate(posixpath.dirname(path))
+        cache.invalidate_tree(path)
         return jsonify({"status": "ok"})
     except PermissionError:
         return jsonify({"error": "Permission denied"}), 403
@@ -486,7 +1728,7 @@ def delete_entry():
 
 @app.route("/api/move", methods=["POST"])
 def move_entry():
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     data = request.json
@@ -497,7 +1739,11 @@ def move_entry():
         return jsonify({"error": "src and dest are required"}), 400
 
     try:
-        ssh_state["sftp"].rename(src, dest)
+        with sftp_session() as sftp:
+            sftp.rename(src, dest)
+        cache = listing_cache()
+        cache.invalidate(posixpath.dirname(src), posixpath.dirname(dest))
+        cache.invalidate_tree(src)
         return jsonify({"status": "ok"})
     except PermissionError:
         return jsonify({"error": "Permission denied"}), 403
@@ -509,53 +1755,31 @@ def move_entry():
 
 @app.route("/api/duplicate", methods=["POST"])
 def duplicate_entry():
-    if not ssh_state["sftp"] or not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
+    """Duplicate a file or folder beside itself as a background copy job.
 
-    data = request.json
-    path = data.get("path", "")
-    is_dir = data.get("is_dir", False)
+    For clients without a socket: returns the job id and new path at once
+    instead of waiting for the copy. Socket clients use copy_start, which
+    also reports progress.
+    """
+    if not ssh_state["sftp_pool"] or not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
 
+    path = request.json.get("path", "")
     if not path:
         return jsonify({"error": "path is required"}), 400
 
+    conn = ssh_state._get_current_object()
     try:
-        parent = posixpath.dirname(path)
-        basename = posixpath.basename(path)
-
-        # Generate a unique copy name
-        name, ext = posixpath.splitext(basename) if not is_dir else (basename, "")
-        copy_name = f"{name} copy{ext}"
-        counter = 2
-        while True:
-            copy_path = posixpath.join(parent, copy_name)
-            try:
-                ssh_state["sftp"].stat(copy_path)
-                copy_name = f"{name} copy {counter}{ext}"
-                counter += 1
-            except FileNotFoundError:
-                break
-
-        escaped_src = shlex.quote(path)
-        escaped_dest = shlex.quote(copy_path)
-        if is_dir:
-            cmd = f"cp -r {escaped_src} {escaped_dest}"
-        else:
-            cmd = f"cp {escaped_src} {escaped_dest}"
-        _, stdout, stderr = ssh_state["client"].exec_command(cmd)
-        exit_code = stdout.channel.recv_exit_status()
-        if exit_code != 0:
-            err = stderr.read().decode().strip()
-            return jsonify({"error": err or "Copy failed"}), 400
-
-        return jsonify({"status": "ok", "new_path": copy_path})
-    except Exception as e:
+        path, dest, st = plan_copy(conn, path)
+    except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    job = start_job("copy", conn, None, run_copy, path, dest, st)
+    return jsonify({"status": "started", "job_id": job.id, "new_path": dest})
 
 
 @app.route("/api/mkdir", methods=["POST"])
 def mkdir_entry():
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     path = request.json.get("path", "")
@@ -563,7 +1787,9 @@ def mkdir_entry():
         return jsonify({"error": "path is required"}), 400
 
     try:
-        ssh_state["sftp"].mkdir(path)
+        with sftp_session() as sftp:
+            sftp.mkdir(path)
+        listing_cache().invalidate(posixpath.dirname(path))
         return jsonify({"status": "ok"})
     except PermissionError:
         return jsonify({"error": "Permission denied"}), 403
@@ -586,7 +1812,7 @@ IMAGE_MIME = {
 
 @app.route("/api/stat", methods=["POST"])
 def stat_entry():
-    if not ssh_state["sftp"] or not ssh_state["client"]:
+    if not ssh_state["sftp_pool"] or not ssh_state["client"]:
         return jsonify({"error": "Not connected"}), 400
 
     path = request.json.get("path", "")
@@ -594,25 +1820,30 @@ def stat_entry():
         return jsonify({"error": "path is required"}), 400
 
     try:
-        s = ssh_state["sftp"].stat(path)
+        names = ssh_state["names"]
+        found = helper_call({"op": "stat", "path": path})
+        if found:
+            info = helper_result(found[0])
+            s = paramiko.SFTPAttributes()
+            s.st_mode, s.st_size, s.st_mtime = info["mode"], info["size"], info["mtime"]
+            s.st_uid, s.st_gid = info["uid"], info["gid"]
+            if names:
+                names.add(users={s.st_uid: info["owner"]}, groups={s.st_gid: info["group"]})
+        else:
+            with sftp_session() as sftp:
+                s = sftp.stat(path)
         is_dir = stat.S_ISDIR(s.st_mode) if s.st_mode else False
         mode_str = stat.filemode(s.st_mode) if s.st_mode else "?---------"
         uid = s.st_uid if s.st_uid is not None else -1
         gid = s.st_gid if s.st_gid is not None else -1
 
-        # Resolve owner/group names via SSH
+        # Owner/group names come from the connection's name directory
         owner = str(uid)
         group = str(gid)
-        try:
-            cmd = f"id -nu {uid} 2>/dev/null; id -ng {gid} 2>/dev/null"
-            _, stdout, _ = ssh_state["client"].exec_command(cmd, timeout=5)
-            lines = stdout.read().decode().strip().split("\n")
-            if len(lines) >= 1 and lines[0]:
-                owner = lines[0]
-            if len(lines) >= 2 and lines[1]:
-                group = lines[1]
-        except Exception:
-            pass
+        if names:
+            names.resolve(uids=[uid], gids=[gid])
+            owner = names.user(uid)
+            group = names.group(gid)
 
         result = {
             "path": path,
@@ -637,7 +1868,7 @@ def stat_entry():
 
 @app.route("/api/preview", methods=["POST"])
 def preview_file():
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     path = request.json.get("path", "")
@@ -645,36 +1876,37 @@ def preview_file():
         return jsonify({"error": "path is required"}), 400
 
     try:
-        file_stat = ssh_state["sftp"].stat(path)
-        file_size = file_stat.st_size if file_stat.st_size else 0
-
-        ext = posixpath.splitext(path)[1].lower()
-
-        # Image preview
-        if ext in IMAGE_EXTENSIONS:
-            max_image = 5 * 1024 * 1024  # 5MB
-            if file_size > max_image:
-                return jsonify({"error": "Image too large to preview"})
-            with ssh_state["sftp"].open(path, "rb") as f:
-                raw = f.read(max_image)
-            data = base64.b64encode(raw).decode("ascii")
-            mime = IMAGE_MIME.get(ext, "application/octet-stream")
-            return jsonify({"image": True, "data": data, "mime": mime, "size": file_size})
-
-        # PDF preview
-        if ext == ".pdf":
-            max_pdf = 10 * 1024 * 1024  # 10MB
-            if file_size > max_pdf:
-                return jsonify({"error": "PDF too large to preview"})
-            with ssh_state["sftp"].open(path, "rb") as f:
-                raw = f.read(max_pdf)
-            data = base64.b64encode(raw).decode("ascii")
-            return jsonify({"pdf": True, "data": data, "size": file_size})
-
-        # Text preview
-        max_bytes = 64 * 1024  # 64KB
-        with ssh_state["sftp"].open(path, "r") as f:
-            raw = f.read(max_bytes)
+        with sftp_session() as sftp:
+            file_stat = sftp.stat(path)
+            file_size = file_stat.st_size if file_stat.st_size else 0
+
+            ext = posixpath.splitext(path)[1].lower()
+
+            # Image preview
+            if ext in IMAGE_EXTENSIONS:
+                max_image = 5 * 1024 * 1024  # 5MB
+                if file_size > max_image:
+                    return jsonify({"error": "Image too large to preview"})
+                with sftp.open(path, "rb") as f:
+                    raw = f.read(max_image)
+                data = base64.b64encode(raw).decode("ascii")
+                mime = IMAGE_MIME.get(ext, "application/octet-stream")
+                return jsonify({"image": True, "data": data, "mime": mime, "size": file_size})
+
+            # PDF preview
+            if ext == ".pdf":
+                max_pdf = 10 * 1024 * 1024  # 10MB
+                if file_size > max_pdf:
+                    return jsonify({"error": "PDF too large to preview"})
+                with sftp.open(path, "rb") as f:
+                    raw = f.read(max_pdf)
+                data = base64.b64encode(raw).decode("ascii")
+                return jsonify({"pdf": True, "data": data, "size": file_size})
+
+            # Text preview
+            max_bytes = 64 * 1024  # 64KB
+            with sftp.open(path, "r") as f:
+                raw = f.read(max_bytes)
 
         truncated = file_size > max_bytes
 
@@ -697,49 +1929,753 @@ def preview_file():
         return jsonify({"error": str(e)}), 400
 
 
+# Read size per write while uploading; SFTP splits it into 32 KB requests
+# that are pipelined, so only the channel window limits bytes in flight.
+UPLOAD_CHUNK = 1024 * 1024
+# Progress events per file are throttled to one per this many seconds
+UPLOAD_PROGRESS_INTERVAL = 0.25
+
+
+def put_stream(sftp, src, remote_path, on_progress=None):
+    """Copy a readable stream to remote_path with pipelined SFTP writes."""
+    sent = 0
+    with sftp.open(remote_path, "wb") as f:
+        f.set_pipelined(True)
+        while True:
+            chunk = src.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            f.write(chunk)
+            sent += len(chunk)
+            if on_progress:
+                on_progress(sent)
+    # Pipelined writes don't wait for replies; confirm they all landed
+    if sftp.stat(remote_path).st_size != sent:
+        raise IOError(f"size mismatch writing {remote_path}")
+    return sent
+
+
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
-    if not ssh_state["sftp"]:
+    """Copy uploaded files to dest_dir, several at once over pooled channels.
+
+    A file that already exists remotely is updated with delta_update, so
+    only its changed blocks cross the wire. With socket_id and upload_id
+    form fields, upload_progress events report each file's bytes sent to
+    the server.
+    """
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     dest_dir = request.form.get("dest_dir", "")
     if not dest_dir:
         return jsonify({"error": "dest_dir is required"}), 400
 
-    files = request.files.getlist("files")
+    files = [f for f in request.files.getlist("files") if f.filename]
     if not files:
         return jsonify({"error": "No files provided"}), 400
 
-    uploaded = []
-    errors = []
-    for f in files:
-        filename = f.filename
-        if not filename:
-            continue
-        remote_path = posixpath.join(dest_dir, filename)
+    conn = ssh_state._get_current_object()
+    sid = request.form.get("socket_id")
+    upload_id = request.form.get("upload_id")
+
+    def progress(name, sent, size, **extra):
+        if sid:
+            socketio.emit(
+                "upload_progress",
+                dict(upload_id=upload_id, name=name, sent=sent, size=size, **extra),
+                to=sid,
+            )
+
+    def send(f):
+        f.stream.seek(0, os.SEEK_END)
+        size = f.stream.tell()
+        f.stream.seek(0)
+        last = [0]
+
+        def on_progress(sent):
+            now = time.monotonic()
+            if now - last[0] >= UPLOAD_PROGRESS_INTERVAL:
+                last[0] = now
+                progress(f.filename, sent, size)
+
+        target = posixpath.join(dest_dir, f.filename)
+        sent = None
         try:
-            with ssh_state["sftp"].open(remote_path, "wb") as remote_f:
-                while True:
-                    chunk = f.read(65536)
-                    if not chunk:
-                        break
-                    remote_f.write(chunk)
-            uploaded.append(filename)
+            with sftp_session(conn) as sftp:
+                if size >= DELTA_MIN_SIZE:
+                    with stream_buffer(f.stream) as data:
+                        sent = try_delta_update(conn, sftp, target, data)
+                if sent is None:
+                    f.stream.seek(0)
+                    put_stream(sftp, f.stream, target, on_progress)
         except Exception as e:
-            errors.append(f"{filename}: {str(e)}")
+            progress(f.filename, 0, size, error=str(e))
+            return f"{f.filename}: {str(e)}", None
+        progress(f.filename, size, size, done=True)
+        return None, sent
+
+    uploaded = []
+    errors = []
+    delta = {}
+    with ThreadPoolExecutor(max_workers=min(len(files), conn["sftp_pool"].size)) as pool:
+        for f, (error, sent) in zip(files, pool.map(send, files)):
+            if error:
+                errors.append(error)
+            else:
+                uploaded.append(f.filename)
+                if sent is not None:
+                    delta[f.filename] = sent
+
+    if uploaded:
+        listing_cache().invalidate(dest_dir)
 
     if errors and not uploaded:
         return jsonify({"error": "; ".join(errors)}), 400
 
     result = {"status": "ok", "uploaded": uploaded}
+    if delta:
+        result["delta"] = delta
     if errors:
         result["errors"] = errors
     return jsonify(result)
 
 
+@app.route("/api/upload-tar/modes", methods=["POST"])
+def upload_tar_modes():
+    """Permission bits of the entries a folder upload would overwrite.
+
+    The browser can't read local modes, so it packs these into the tar to
+    keep existing files' modes; paths are relative to dest_dir.
+    """
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    dest_dir = data.get("dest_dir", "")
+    if not dest_dir:
+        return jsonify({"error": "dest_dir is required"}), 400
+    paths = [p for p in data.get("paths", []) if p]
+    try:
+        with sftp_session() as sftp:
+            stats = batch_stat(sftp, [posixpath.join(dest_dir, p) for p in paths])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    modes = {p: stat.S_IMODE(s.st_mode) for p, s in zip(paths, stats) if s and s.st_mode}
+    return jsonify({"modes": modes})
+
+
+@app.route("/api/upload-tar", methods=["POST"])
+def upload_tar():
+    """Unpack a tar stream (the request body) into dest_dir on the remote.
+
+    One exec channel replaces an open/write/close cycle per file, so a
+    folder of many small files costs no per-file round trips. With
+    socket_id and upload_id, tar_progress events count extracted entries.
+    """
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    dest_dir = request.args.get("dest_dir", "")
+    if not dest_dir:
+        return jsonify({"error": "dest_dir is required"}), 400
+    sid = request.args.get("socket_id")
+    upload_id = request.args.get("upload_id")
+    # The body is streamed through, so a folder may exceed the form limit
+    request.max_content_length = None
+
+    channel = ssh_state["client"].get_transport().open_session()
+    # -p applies the modes in the headers as they are: kept ones for files
+    # that existed (see upload_tar_modes), 644/755 for new ones
+    channel.exec_command(
+        f"cd {shlex.quote(dest_dir)} && exec tar -xpvf - --no-same-owner"
+    )
+    extracted = []
+
+    def progress(done=False):
+        if sid:
+            socketio.emit(
+                "tar_progress",
+                {
+                    "upload_id": upload_id,
+                    "count": len(extracted),
+                    "name": extracted[-1] if extracted else None,
+                    "done": done,
+                },
+                to=sid,
+            )
+
+    def read_listing():
+        # tar -v names each entry as it starts extracting it
+        buf, last = b"", 0
+        while True:
+            data = channel.recv(1 << 16)
+            if not data:
+                break
+            buf += data
+            *lines, buf = buf.split(b"\n")
+            extracted.extend(line.decode("utf-8", errors="replace") for line in lines if line)
+            if time.monotonic() - last >= UPLOAD_PROGRESS_INTERVAL:
+                last = time.monotonic()
+                progress()
+
+    errors = bytearray()
+
+    def read_errors():
+        # stderr shares the channel's window with stdout: left unread, a tar
+        # reporting many errors would stall the upload. Keep the start.
+        while True:
+            data = channel.recv_stderr(1 << 16)
+            if not data:
+                break
+            errors.extend(data[:max(0, 65536 - len(errors))])
+
+    reader = threading.Thread(target=read_listing, daemon=True)
+    reader.start()
+    error_reader = threading.Thread(target=read_errors, daemon=True)
+    error_reader.start()
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            channel.sendall(chunk)
+        channel.shutdown_write()
+        status = channel.recv_exit_status()
+        reader.join(10)
+        error_reader.join(10)
+    except Exception as e:
+        return jsonify({"error": str(e), "extracted": len(extracted)}), 400
+    finally:
+        channel.close()
+        # Files overwritten in existing subfolders don't bump their mtimes
+        listing_cache().invalidate_tree(dest_dir)
+
+    progress(done=True)
+    if status != 0:
+        message = errors.decode("utf-8", errors="replace").strip()
+        return jsonify({
+            "error": message.splitlines()[0] if message else f"tar exited with status {status}",
+            "extracted": len(extracted),
+        }), 400
+    return jsonify({"status": "ok", "extracted": len(extracted)})
+
+
+# ── Delta Transfer ─────────────────────────────────────────────────
+
+# Existing remote files at least this big are updated by sending only the
+# blocks that changed; smaller ones are cheaper to copy whole.
+DELTA_MIN_SIZE = 256 * 1024
+# Unmatched blocks between byte-by-byte searches for shifted data, after
+# the two that follow every match. Rolling runs in Python, so this bounds
+# the cost on content that shares nothing.
+DELTA_SEARCH_EVERY = 16
+# Largest literal run sent in one delta op
+DELTA_LITERAL_MAX = 1024 * 1024
+
+# Runs on the remote under python3. "sums" writes an adler32 and md5 per
+# block of the file, "hashes" a sha256 per block (for block-aligned
+# comparison in the browser). "apply" rebuilds the file from copy/data ops on stdin
+# into a temporary file, which replaces the original only when its sha256
+# matches the one the ops end with.
+DELTA_SOURCE = r'''
+import hashlib, os, shutil, struct, sys, zlib
+mode, path, block = sys.argv[1], os.path.realpath(sys.argv[2]), int(sys.argv[3])
+out = sys.stdout.buffer
+if mode == "sums":
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(block), b""):
+            out.write(struct.pack(">I", zlib.adler32(b)) + hashlib.md5(b).digest())
+    sys.exit(0)
+if mode == "hashes":
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(block), b""):
+            out.write(hashlib.sha256(b).digest())
+    sys.exit(0)
+inp = sys.stdin.buffer
+tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".sshgui-delta")
+h = hashlib.sha256()
+ok = False
+try:
+    with open(path, "rb") as old, open(tmp, "wb") as new:
+        while True:
+            op = inp.read(1)
+            if op == b"C":
+                first, count = struct.unpack(">QI", inp.read(12))
+                old.seek(first * block)
+                left = count * block
+                while left > 0:
+                    d = old.read(min(left, 1 << 20))
+                    if not d:
+                        break
+                    new.write(d)
+                    h.update(d)
+                    left -= len(d)
+            elif op == b"D":
+                d = inp.read(struct.unpack(">I", inp.read(4))[0])
+                new.write(d)
+                h.update(d)
+            else:
+                ok = op == b"E" and inp.read(32) == h.digest()
+                break
+    if ok:
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+finally:
+    if not ok and os.path.exists(tmp):
+        os.remove(tmp)
+out.write(b"OK\n" if ok else b"MISMATCH\n")
+'''
+
+
+def delta_block_size(size):
+    """Block size for delta transfer of a file of `size`: about its square
+    root, as rsync picks, which balances checksum volume against the literal
+    bytes resent around each change."""
+    return min(128 * 1024, max(2048, int(size ** 0.5) & ~7))
+
+
+def remote_block_sums(conn, path, block):
+    """Per-block (adler32, md5) of a remote file, or None without python3."""
+    _, stdout, _ = conn["client"].exec_command(
+        "exec python3 -c " + shlex.quote(DELTA_SOURCE) + f" sums {shlex.quote(path)} {block}"
+    )
+    data = stdout.read()
+    if stdout.channel.recv_exit_status() != 0 or len(data) % 20:
+        return None
+    return [(int.from_bytes(data[i:i + 4], "big"), data[i + 4:i + 20]) for i in range(0, len(data), 20)]
+
+
+def remote_block_hashes(conn, path, block):
+    """Hex sha256 of each block of a remote file, or None without python3."""
+    _, stdout, _ = conn["client"].exec_command(
+        "exec python3 -c " + shlex.quote(DELTA_SOURCE) + f" hashes {shlex.quote(path)} {block}"
+    )
+    data = stdout.read()
+    if stdout.channel.recv_exit_status() != 0 or len(data) % 32:
+        return None
+    return [data[i:i + 32].hex() for i in range(0, len(data), 32)]
+
+
+def delta_ops(data, block, sums, remote_size):
+    """Yield the ops that rebuild `data` from a remote file's blocks.
+
+    ("copy", first, count) reuses a run of remote blocks and ("data", bytes)
+    sends literal bytes. As in rsync, an adler32 rolled over `data` finds
+    remote blocks at any offset, so an insertion only costs its own bytes.
+    """
+    table = {}
+    for i, (weak, strong) in enumerate(sums):
+        table.setdefault(weak, {}).setdefault(strong, i)
+    n = len(data)
+    short = remote_size % block
+
+    def lookup(weak, pos):
+        strong = table.get(weak)
+        if not strong:
+            return None
+        return strong.get(hashlib.md5(data[pos:pos + block]).digest())
+
+    def search(pos):
+        """First remote block match in the block-length span after pos."""
+        v = zlib.adler32(data[pos:pos + block])
+        a, b = v & 0xFFFF, v >> 16
+        for q in range(pos, min(pos + block, n - block)):
+            old, new = data[q], data[q + block]
+            a = (a - old + new) % 65521
+            b = (b - block * old + a - 1) % 65521
+            i = lookup(b << 16 | a, q + 1)
+            if i is not None:
+                return q + 1, i
+        return pos, None
+
+    def matches():
+        pos = misses = 0
+        while pos + block <= n:
+            at, i = pos, lookup(zlib.adler32(data[pos:pos + block]), pos)
+            if i is None and (misses < 2 or misses % DELTA_SEARCH_EVERY == 0):
+                at, i = search(pos)
+            if i is None:
+                misses += 1
+                pos += block
+                continue
+            misses = 0
+            yield at, i, block
+            pos = at + block
+        # A short final remote block can only match the tail
+        if short and n - pos == short and hashlib.md5(data[pos:]).digest() == sums[-1][1]:
+            yield pos, len(sums) - 1, short
+
+    def literal(start, end):
+        for s in range(start, end, DELTA_LITERAL_MAX):
+            yield "data", data[s:min(end, s + DELTA_LITERAL_MAX)]
+
+    run, done = None, 0
+    for at, i, length in matches():
+        if done < at:
+            if run:
+                yield "copy", *run
+                run = None
+            yield from literal(done, at)
+        if run and run[0] + run[1] == i:
+            run[1] += 1
+        else:
+            if run:
+                yield "copy", *run
+            run = [i, 1]
+        done = at + length
+    if run:
+        yield "copy", *run
+    yield from literal(done, n)
+
+
+def delta_update(conn, path, data, remote_size):
+    """Rewrite remote `path` to hold `data`, sending only what changed.
+
+    The remote checksums its current blocks, the diff is computed here and
+    the remote rebuilds the file beside the original before renaming it
+    into place. Returns the bytes sent, or None when the remote has no
+    python3. Raises when the rebuild fails, leaving the file untouched.
+    """
+    block = delta_block_size(remote_size)
+    sums = remote_block_sums(conn, path, block)
+    if sums is None:
+        return None
+    digest = hashlib.sha256(data).digest()
+    channel = conn["client"].get_transport().open_session()
+    try:
+        channel.exec_command(
+            "exec python3 -c " + shlex.quote(DELTA_SOURCE) + f" apply {shlex.quote(path)} {block}"
+        )
+        sent = 0
+        for op in delta_ops(data, block, sums, remote_size):
+            if op[0] == "copy":
+                msg = b"C" + struct.pack(">QI", op[1], op[2])
+            else:
+                msg = b"D" + struct.pack(">I", len(op[1])) + op[1]
+            channel.sendall(msg)
+            sent += len(msg)
+        channel.sendall(b"E" + digest)
+        channel.shutdown_write()
+        reply = channel.makefile("rb").read()
+        error = channel.makefile_stderr("rb").read().decode("utf-8", errors="replace").strip()
+        channel.recv_exit_status()
+    finally:
+        channel.close()
+    if reply.strip() != b"OK":
+        detail = error.splitlines()[-1] if error else reply.decode(errors="replace").strip()
+        raise IOError(f"delta update of {path} failed: {detail or 'no reply'}")
+    return sent + 33
+
+
+def try_delta_update(conn, sftp, path, data):
+    """delta_update an existing regular file when that is worth it.
+
+    Returns the bytes sent, or None when the caller should copy in full:
+    the file is new or small, the remote lacks python3, or the rebuild
+    failed. The file is replaced by a rename, so hard links are split.
+    """
+    if len(data) < DELTA_MIN_SIZE:
+        return None
+    try:
+        st = sftp.stat(path)
+    except IOError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_size < DELTA_MIN_SIZE:
+        return None
+    try:
+        return delta_update(conn, path, data, st.st_size)
+    except Exception:
+        return None
+
+
+@contextmanager
+def stream_buffer(src):
+    """A read-only buffer over a seekable stream, mapped when it is on disk."""
+    try:
+        buf = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        src.seek(0)
+        yield src.read()
+        return
+    try:
+        yield buf
+    finally:
+        buf.close()
+
+
+# ── Chunked Uploads ────────────────────────────────────────────────
+
+# Suggested chunk size for /api/upload/chunk; each chunk is one request, so
+# it must stay under MAX_CONTENT_LENGTH.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def upload_part_path(path):
+    """Where a chunked upload collects its bytes until commit.
+
+    The name only depends on the target, so a retry after a crash or a
+    reconnect finds the data already sent and resumes from its size.
+    """
+    return posixpath.join(posixpath.dirname(path), f".{posixpath.basename(path)}.sshgui-part")
+
+
+def remote_sha256(conn, path):
+    """sha256 of a remote file computed on the remote, or None without a tool."""
+    q = shlex.quote(path)
+    _, stdout, _ = conn["client"].exec_command(
+        f"sha256sum -- {q} 2>/dev/null || shasum -a 256 -- {q} 2>/dev/null"
+    )
+    out = stdout.read().decode("utf-8", errors="replace").split()
+    return out[0].lower() if out and len(out[0]) == 64 else None
+
+
+def sftp_sha256(sftp, path):
+    """sha256 of a remote file read back over SFTP, for servers without a tool."""
+    h = hashlib.sha256()
+    with sftp.open(path, "rb") as f:
+        f.prefetch()
+        while True:
+            chunk = f.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def seed_delta_upload(conn, sftp, path, part, size):
+    """Set up a chunked upload to send only the blocks that changed.
+
+    The part file starts as a copy of the current remote file (or keeps
+    what an earlier attempt wrote), and the sha256 of each of its blocks is
+    returned for the client to compare against, as {"block", "hashes"}.
+    None when there is nothing worth comparing or the remote has no python3.
+    """
+    if size < DELTA_MIN_SIZE:
+        return None
+    try:
+        base, seeded = sftp.stat(part), True
+    except FileNotFoundError:
+        try:
+            base, seeded = sftp.stat(path), False
+        except IOError:
+            return None
+        if not stat.S_ISREG(base.st_mode):
+            return None
+    if base.st_size < DELTA_MIN_SIZE:
+        return None
+    block = delta_block_size(base.st_size)
+    hashes = remote_block_hashes(conn, part if seeded else path, block)
+    if hashes is None:
+        return None
+    if not seeded:
+        src, dest = shlex.quote(path), shlex.quote(part)
+        _, stdout, _ = conn["client"].exec_command(
+            f"cp --reflink=auto -- {src} {dest} 2>/dev/null || cp -- {src} {dest}"
+        )
+        if stdout.channel.recv_exit_status() != 0:
+            try:
+                sftp.remove(part)
+            except IOError:
+                pass
+            return None
+    return {"block": block, "hashes": hashes}
+
+
+@app.route("/api/upload/init", methods=["POST"])
+def upload_init():
+    """Start or resume a chunked upload of `size` bytes to `path`.
+
+    Returns the upload id and the offset to send from: 0 for a new upload,
+    or the bytes already on the remote when resuming. With "delta" set and
+    a large file already at `path`, it also returns "delta": the block
+    size and per-block sha256 of the data already in place. The client
+    then sends only the blocks that differ, at their offsets.
+    """
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", "")
+    size = data.get("size")
+    if not path or size is None:
+        return jsonify({"error": "path and size are required"}), 400
+    size = int(size)
+
+    conn = ssh_state._get_current_object()
+    part = upload_part_path(path)
+    try:
+        with sftp_session() as sftp:
+            delta = seed_delta_upload(conn, sftp, path, part, size) if data.get("delta") else None
+            try:
+                offset = sftp.stat(part).st_size
+            except FileNotFoundError:
+                offset = None
+            if not delta and (offset is None or offset > size):
+                with sftp.open(part, "wb"):
+                    pass
+                offset = 0
+    except PermissionError:
+        return jsonify({"error": "Permission denied"}), 403
+    except FileNotFoundError:
+        return jsonify({"error": f"Not found: {posixpath.dirname(path)}"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    with connections_lock:
+        upload = next((u for u in conn["uploads"].values() if u["part"] == part), None)
+        if delta or not upload or upload["size"] != size or upload["hashed"] != offset:
+            if upload:
+                conn["uploads"].pop(upload["id"], None)
+            # Only a fresh upload can be hashed in full as it streams through
+            upload = {
+                "id": uuid.uuid4().hex[:12],
+                "path": path,
+                "part": part,
+                "size": size,
+                "sha": hashlib.sha256() if offset == 0 and not delta else None,
+                "hashed": offset,
+                "delta": bool(delta),
+                "lock": threading.Lock(),
+            }
+            conn["uploads"][upload["id"]] = upload
+    result = {"upload_id": upload["id"], "offset": offset, "chunk_size": UPLOAD_CHUNK_SIZE}
+    if delta:
+        result["delta"] = delta
+    return jsonify(result)
+
+
+@app.route("/api/upload/chunk", methods=["POST"])
+def upload_chunk():
+    """Write the raw request body at ?offset= of an upload.
+
+    The body streams straight into the remote file without being buffered
+    here. Returns the confirmed size of the remote data, which is where the
+    next chunk (or a retry) should start.
+    """
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    upload = ssh_state["uploads"].get(request.args.get("upload_id", ""))
+    if not upload:
+        return jsonify({"error": "Unknown upload"}), 404
+    offset = int(request.args.get("offset", 0))
+    if not upload["lock"].acquire(blocking=False):
+        return jsonify({"error": "A chunk is already being written"}), 409
+
+    try:
+        with sftp_session() as sftp:
+            current = sftp.stat(upload["part"]).st_size
+            if offset > current:
+                return jsonify({"error": "Offset is past the data received", "offset": current}), 409
+            sha = upload["sha"] if offset == upload["hashed"] else None
+            written, error = 0, None
+            try:
+                with sftp.open(upload["part"], "r+b") as f:
+                    f.seek(offset)
+                    f.set_pipelined(True)
+                    while True:
+                        chunk = request.stream.read(UPLOAD_CHUNK)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        written += len(chunk)
+                        if sha:
+                            sha.update(chunk)
+            except Exception as e:
+                error = e
+            confirmed = sftp.stat(upload["part"]).st_size
+        if sha is None or confirmed != offset + written:
+            upload["sha"] = None
+        upload["hashed"] = confirmed
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        upload["lock"].release()
+    if error:
+        return jsonify({"error": str(error), "offset": confirmed}), 400
+    return jsonify({"offset": confirmed})
+
+
+@app.route("/api/upload/commit", methods=["POST"])
+def upload_commit():
+    """Verify a finished upload on the remote and move it into place.
+
+    The remote file's sha256 must match the one the client sends, or else
+    the digest of the bytes streamed through here. A resumed upload has no
+    such digest, so without the client's the commit fails and the data
+    stays for a retry.
+    """
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    conn = ssh_state._get_current_object()
+    upload = conn["uploads"].get(data.get("upload_id", ""))
+    if not upload:
+        return jsonify({"error": "Unknown upload"}), 404
+
+    try:
+        with sftp_session() as sftp:
+            received = sftp.stat(upload["part"]).st_size
+            if upload["delta"] and received > upload["size"]:
+                # Seeded from a longer file
+                sftp.truncate(upload["part"], upload["size"])
+                received = upload["size"]
+            if received != upload["size"]:
+                return jsonify({"error": "Upload incomplete", "offset": received}), 409
+            expected = (data.get("sha256") or "").lower() or (
+                upload["sha"].hexdigest() if upload["sha"] else None
+            )
+            if not expected:
+                return jsonify({"error": "sha256 is required to verify a resumed upload"}), 400
+            actual = remote_sha256(conn, upload["part"]) or sftp_sha256(sftp, upload["part"])
+            if expected != actual:
+                sftp.remove(upload["part"])
+                conn["uploads"].pop(upload["id"], None)
+                return jsonify({"error": "Checksum mismatch; upload discarded"}), 409
+            try:
+                sftp.posix_rename(upload["part"], upload["path"])
+            except IOError:
+                try:
+                    sftp.remove(upload["path"])
+                except FileNotFoundError:
+                    pass
+                sftp.rename(upload["part"], upload["path"])
+        conn["uploads"].pop(upload["id"], None)
+        listing_cache().invalidate(posixpath.dirname(upload["path"]))
+        return jsonify({
+            "status": "ok",
+            "path": upload["path"],
+            "sha256": actual,
+        })
+    except PermissionError:
+        return jsonify({"error": "Permission denied"}), 403
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/upload/abort", methods=["POST"])
+def upload_abort():
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    upload = ssh_state["uploads"].pop(request.json.get("upload_id", ""), None)
+    if not upload:
+        return jsonify({"error": "Unknown upload"}), 404
+    try:
+        with sftp_session() as sftp:
+            sftp.remove(upload["part"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "ok"})
+
+
 @app.route("/api/save-file", methods=["POST"])
 def save_file():
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     data = request.json
@@ -749,10 +2685,18 @@ def save_file():
     if not path:
         return jsonify({"error": "path is required"}), 400
 
+    data = content.encode("utf-8")
     try:
-        with ssh_state["sftp"].open(path, "w") as f:
-            f.write(content)
-        return jsonify({"status": "ok"})
+        with sftp_session() as sftp:
+            sent = try_delta_update(ssh_state._get_current_object(), sftp, path, data)
+            if sent is None:
+                with sftp.open(path, "w") as f:
+                    f.write(data)
+        listing_cache().invalidate(posixpath.dirname(path))
+        result = {"status": "ok"}
+        if sent is not None:
+            result["delta_sent"] = sent
+        return jsonify(result)
     except PermissionError:
         return jsonify({"error": "Permission denied"}), 403
     except Exception as e:
@@ -771,67 +2715,271 @@ def search_files():
     if not path or not query:
         return jsonify({"error": "path and query are required"}), 400
 
+    index = filename_index_for(ssh_state._get_current_object(), path)
+    if index:
+        results, total = index.search(
+            query,
+            under=path,
+            limit=int(data.get("limit", 200)),
+            fuzzy=data.get("fuzzy", True),
+            order=data.get("order", "depth"),
+        )
+        return jsonify({
+            "results": results,
+            "total": total,
+            "indexed_at": index.built_at,
+        })
+
+    # The query is a plain substring, not a glob
+    found = helper_call({"op": "find", "path": path, "pattern": f"*{glob.escape(query)}*"})
+    if found:
+        try:
+            hits = helper_result(found[0])
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+        results = [
+            {
+                "name": posixpath.basename(p),
+                "path": p,
+                "parent": posixpath.dirname(p),
+                "is_dir": is_dir,
+                "size": size,
+            }
+            for p, is_dir, size in hits
+        ]
+        return jsonify({"results": results})
+
     try:
         quoted_path = shlex.quote(path)
         # Escape special find characters
         safe_query = query.replace("\\", "\\\\").replace("'", "'\\''")
+        find = f"find {quoted_path} -maxdepth 5 -iname '*{safe_query}*'"
+        # The first line says whether find has GNU -printf; BSD/macOS find
+        # doesn't, and its hits are stat'ed here instead
         cmd = (
-            f"find {quoted_path} -maxdepth 5 -iname '*{safe_query}*' "
-            f"2>/dev/null | head -200"
+            f"if find {quoted_path} -maxdepth 0 -printf '' >/dev/null 2>&1; then echo P; "
+            f"{find} -printf '%y\\t%s\\t%T@\\t%p\\n' 2>/dev/null | head -200; "
+            f"else echo N; {find} 2>/dev/null | head -200; fi"
         )
         _, stdout, stderr = ssh_state["client"].exec_command(cmd, timeout=10)
-        output = stdout.read().decode("utf-8", errors="replace").strip()
+        marker, _, output = stdout.read().decode("utf-8", errors="replace").partition("\n")
+
+        if marker == "P":
+            results = [
+                search_hit(line.split("\t"))
+                for line in output.split("\n")
+                if line.count("\t") >= 3
+            ]
+            return jsonify({"results": results})
 
         results = []
-        if output:
-            for line in output.split("\n"):
-                line = line.strip()
-                if not line:
-                    continue
-                name = posixpath.basename(line)
-                parent = posixpath.dirname(line)
-                try:
-                    s = ssh_state["sftp"].stat(line)
-                    is_dir = stat.S_ISDIR(s.st_mode)
-                    size = s.st_size if s.st_size else 0
-                except Exception:
-                    is_dir = False
-                    size = 0
+        lines = [line.strip() for line in output.split("\n") if line.strip()]
+        if lines:
+            with sftp_session() as sftp:
+                stats = batch_stat(sftp, lines)
+            for line, s in zip(lines, stats):
                 results.append({
-                    "name": name,
+                    "name": posixpath.basename(line),
                     "path": line,
-                    "parent": parent,
-                    "is_dir": is_dir,
-                    "size": size,
+                    "parent": posixpath.dirname(line),
+                    "is_dir": bool(s and s.st_mode and stat.S_ISDIR(s.st_mode)),
+                    "size": (s.st_size or 0) if s else 0,
+                    "modified": (s.st_mtime or 0) if s else 0,
                 })
-
         return jsonify({"results": results})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
-@app.route("/api/download", methods=["POST"])
-def download_file():
-    if not ssh_state["sftp"]:
-        return jsonify({"error": "Not connected"}), 400
+# Bytes requested from SFTP per prefetch window while streaming a download.
+# Reads inside a window are pipelined; memory per download stays bounded
+# by one window however slow the browser is.
+DOWNLOAD_WINDOW = 8 * 1024 * 1024
 
-    path = request.json.get("path", "")
-    if not path:
-        return jsonify({"error": "path is required"}), 400
 
+def stream_remote_file(f, start, end):
+    """Yield bytes [start, end) of an open SFTP file."""
+    step = paramiko.SFTPFile.MAX_REQUEST_SIZE
+    pos = start
+    while pos < end:
+        stop = min(pos + DOWNLOAD_WINDOW, end)
+        chunks = [(off, min(step, stop - off)) for off in range(pos, stop, step)]
+        for data in f.readv(chunks):
+            if not data:
+                return
+            yield data
+        pos = stop
+
+
+def release_remote_file(pool, sftp, f):
     try:
-        with ssh_state["sftp"].open(path, "rb") as f:
-            data = f.read()
-        buf = io.BytesIO(data)
-        filename = posixpath.basename(path)
-        return send_file(buf, as_attachment=True, download_name=filename)
-    except PermissionError:
-        return jsonify({"error": "Permission denied"}), 403
-    except FileNotFoundError:
-        return jsonify({"error": f"Not found: {path}"}), 404
+        f.close()
+    except Exception:
+        pass
+    pool.release(sftp)
+
+
+@app.route("/api/download", methods=["GET", "POST"])
+def download_file():
+    """Stream a remote file to the browser.
+
+    A GET with ?path=...&connection_id=... can be handed to the browser's
+    own download manager; Range and If-Range requests let it resume.
+    """
+    if not ssh_state["sftp_pool"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    path = request.args.get("path") or (request.get_json(silent=True) or {}).get("path", "")
+    if not path:
+        return jsonify({"error": "path is required"}), 400
+
+    pool = ssh_state["sftp_pool"]
+    sftp = pool.acquire()
+    try:
+        attrs = sftp.stat(path)
+        if stat.S_ISDIR(attrs.st_mode or 0):
+            raise IsADirectoryError(path)
+        f = sftp.open(path, "rb")
     except Exception as e:
+        pool.release(sftp)
+        if isinstance(e, PermissionError):
+            return jsonify({"error": "Permission denied"}), 403
+        if isinstance(e, FileNotFoundError):
+            return jsonify({"error": f"Not found: {path}"}), 404
+        if isinstance(e, IsADirectoryError):
+            return jsonify({"error": f"Is a directory: {path}"}), 400
         return jsonify({"error": str(e)}), 400
 
+    size = attrs.st_size or 0
+    etag = f"{size:x}-{int(attrs.st_mtime or 0):x}"
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{etag}"'}
+    if attrs.st_mtime:
+        headers["Last-Modified"] = http_date(attrs.st_mtime)
+
+    if request.if_none_match.contains(etag):
+        release_remote_file(pool, sftp, f)
+        return Response(status=304, headers=headers)
+
+    start, end, status = 0, size, 200
+    # A Range only applies if the file is still the one the client started:
+    # If-Range carries either the ETag or the Last-Modified date it was given.
+    # Anything else that doesn't match gets the whole file.
+    if_range = request.if_range
+    if if_range.etag:
+        unchanged = if_range.etag == etag
+    elif if_range.date:
+        unchanged = bool(attrs.st_mtime) and int(if_range.date.timestamp()) == int(attrs.st_mtime)
+    else:
+        unchanged = "If-Range" not in request.headers
+    if request.range and unchanged:
+        span = request.range.range_for_length(size)
+        if span is None:
+            release_remote_file(pool, sftp, f)
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+        start, end = span
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    filename = posixpath.basename(path)
+    response = Response(
+        stream_remote_file(f, start, end),
+        status=status,
+        headers=headers,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    )
+    response.content_length = end - start
+    response.headers.set("Content-Disposition", "attachment", filename=filename)
+    # Runs however the response ends: finished, aborted or never iterated (HEAD)
+    response.call_on_close(lambda: release_remote_file(pool, sftp, f))
+    return response
+
+
+# Archive formats for folder downloads by the marker byte the remote script
+# prints first: (extension, mimetype). "N" means the folder doesn't exist.
+ARCHIVE_FORMATS = {
+    "Z": (".tar.zst", "application/zstd"),
+    "G": (".tar.gz", "application/gzip"),
+    "T": (".tar", "application/x-tar"),
+}
+
+
+def archive_command(path, exclude, compress):
+    """Shell script streaming path as a tarball, prefixed by a format marker."""
+    parent, name = posixpath.split(posixpath.normpath(path))
+    tar = " ".join(
+        ["tar -cf -"]
+        + [f"--exclude={shlex.quote(p)}" for p in exclude]
+        + ["--", shlex.quote(name or "."), "2>/dev/null"]
+    )
+    script = (
+        f"cd {shlex.quote(parent or '/')} 2>/dev/null && test -e {shlex.quote(name or '.')} "
+        "|| { printf N; exit 1; }; "
+    )
+    if compress == "none":
+        return script + f"printf T; exec {tar}"
+    if compress != "gzip":
+        script += f"if command -v zstd >/dev/null 2>&1; then printf Z; {tar} | zstd -q -c -T0; exit; fi; "
+    return script + f"if command -v gzip >/dev/null 2>&1; then printf G; {tar} | gzip -c -1; else printf T; exec {tar}; fi"
+
+
+@app.route("/api/download-folder", methods=["GET"])
+def download_folder():
+    """Stream a remote folder as a tarball, compressed on the remote.
+
+    Uses zstd when the server has it, else gzip (?compress=gzip|none to
+    choose); ?exclude= may repeat. With socket_id and download_id,
+    download_progress events report the bytes sent so far.
+    """
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    path = request.args.get("path", "")
+    if not path:
+        return jsonify({"error": "path is required"}), 400
+    exclude = [p for p in request.args.getlist("exclude") if p]
+    compress = request.args.get("compress", "zstd")
+    sid = request.args.get("socket_id")
+    download_id = request.args.get("download_id")
+
+    channel = ssh_state["client"].get_transport().open_session()
+    channel.exec_command(archive_command(path, exclude, compress))
+    marker = channel.recv(1).decode("ascii", errors="replace")
+    if marker not in ARCHIVE_FORMATS:
+        channel.close()
+        if marker == "N":
+            return jsonify({"error": f"Not found: {path}"}), 404
+        return jsonify({"error": f"Cannot archive {path}"}), 400
+    extension, mimetype = ARCHIVE_FORMATS[marker]
+
+    def progress(sent, **extra):
+        if sid:
+            socketio.emit(
+                "download_progress",
+                dict(download_id=download_id, path=path, sent=sent, **extra),
+                to=sid,
+            )
+
+    def generate():
+        sent, last = 0, time.monotonic()
+        while True:
+            data = channel.recv(1 << 20)
+            if not data:
+                break
+            sent += len(data)
+            yield data
+            if time.monotonic() - last >= 0.5:
+                last = time.monotonic()
+                progress(sent)
+        progress(sent, done=True)
+
+    response = Response(generate(), mimetype=mimetype)
+    filename = (posixpath.basename(posixpath.normpath(path)) or "root") + extension
+    response.headers.set("Content-Disposition", "attachment", filename=filename)
+    # Closing the channel early (client gave up) stops tar on the remote
+    response.call_on_close(channel.close)
+    return response
+
 
 @app.route("/api/git-info", methods=["POST"])
 def git_info():
@@ -842,6 +2990,13 @@ def git_info():
     if not path:
         return jsonify({"error": "path is required"}), 400
 
+    found = helper_call({"op": "git_info", "path": path})
+    if found:
+        try:
+            return jsonify(helper_result(found[0]))
+        except Exception:
+            return jsonify({})
+
     quoted = shlex.quote(path)
 
     result = {}
@@ -889,6 +3044,14 @@ def git_authors():
     if not path:
         return jsonify({"error": "path is required"}), 400
 
+    names = request.json.get("names", [])
+    found = helper_call({"op": "git_authors", "path": path, "names": names})
+    if found:
+        try:
+            return jsonify({"authors": helper_result(found[0])})
+        except Exception:
+            return jsonify({"authors": {}})
+
     quoted = shlex.quote(path)
 
     # Check if this directory is inside a git repo
@@ -900,7 +3063,6 @@ def git_authors():
 
     # Get author for each file using the same approach as single-file git-info
     # (git log --diff-filter=A --follow per file, batched in one SSH command)
-    names = request.json.get("names", [])
     if not names:
         return jsonify({"authors": {}})
 
@@ -927,22 +3089,19 @@ def git_authors():
 @app.route("/api/check-modified", methods=["POST"])
 def check_modified():
     """Check which directories have been modified since given mtimes."""
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
-    paths = request.json.get("paths", [])
-    changed = []
-    for item in paths:
-        p = item.get("path", "")
-        old_mtime = item.get("mtime", 0)
-        if not p:
-            continue
-        try:
-            s = ssh_state["sftp"].stat(p)
-            if s.st_mtime and s.st_mtime > old_mtime:
-                changed.append(p)
-        except Exception:
-            pass
+    items = [item for item in request.json.get("paths", []) if item.get("path")]
+    try:
+        with sftp_session() as sftp:
+            stats = batch_stat(sftp, [item["path"] for item in items])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    changed = [
+        item["path"] for item, s in zip(items, stats)
+        if s and s.st_mtime and s.st_mtime > item.get("mtime", 0)
+    ]
     return jsonify({"changed": changed})
 
 
@@ -973,6 +3132,13 @@ def run_command():
         exit_code = stdout.channel.recv_exit_status()
         out = stdout.read().decode("utf-8", errors="replace")
         err = stderr.read().decode("utf-8", errors="replace")
+        # The command may have touched anything it was given
+        cache = listing_cache()
+        if cwd:
+            cache.invalidate(cwd)
+        for p in paths:
+            cache.invalidate(posixpath.dirname(p))
+            cache.invalidate_tree(p)
         return jsonify({"stdout": out, "stderr": err, "exit_code": exit_code})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -981,7 +3147,7 @@ def run_command():
 @app.route("/api/diff", methods=["POST"])
 def diff_files():
     """Compare two remote files."""
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     path_a = request.json.get("path_a", "")
@@ -991,10 +3157,11 @@ def diff_files():
 
     max_size = 1024 * 1024  # 1MB
     try:
-        with ssh_state["sftp"].open(path_a, "r") as f:
-            content_a = f.read(max_size).decode("utf-8", errors="replace")
-        with ssh_state["sftp"].open(path_b, "r") as f:
-            content_b = f.read(max_size).decode("utf-8", errors="replace")
+        with sftp_session() as sftp:
+            with sftp.open(path_a, "r") as f:
+                content_a = f.read(max_size).decode("utf-8", errors="replace")
+            with sftp.open(path_b, "r") as f:
+                content_b = f.read(max_size).decode("utf-8", errors="replace")
 
         import difflib
         diff = list(difflib.unified_diff(
@@ -1017,7 +3184,7 @@ def diff_files():
 @app.route("/api/batch-rename", methods=["POST"])
 def batch_rename():
     """Rename multiple files at once."""
-    if not ssh_state["sftp"]:
+    if not ssh_state["sftp_pool"]:
         return jsonify({"error": "Not connected"}), 400
 
     renames = request.json.get("renames", [])
@@ -1025,19 +3192,31 @@ def batch_rename():
         return jsonify({"error": "renames is required"}), 400
 
     results = []
-    for item in renames:
-        src = item.get("src", "")
-        dest = item.get("dest", "")
-        if not src or not dest:
-            continue
-        try:
-            ssh_state["sftp"].rename(src, dest)
-            results.append({"src": src, "dest": dest, "status": "ok"})
-        except Exception as e:
-            results.append({"src": src, "dest": dest, "status": "error", "error": str(e)})
+    with sftp_session() as sftp:
+        for item in renames:
+            src = item.get("src", "")
+            dest = item.get("dest", "")
+            if not src or not dest:
+                continue
+            try:
+                sftp.rename(src, dest)
+                cache = listing_cache()
+                cache.invalidate(posixpath.dirname(src), posixpath.dirname(dest))
+                cache.invalidate_tree(src)
+                results.append({"src": src, "dest": dest, "status": "ok"})
+            except Exception as e:
+                results.append({"src": src, "dest": dest, "status": "error", "error": str(e)})
     return jsonify({"results": results})
 
 
+@app.route("/api/cache-stats")
+def cache_stats():
+    """Hit/miss counters for the active connection's server-side caches."""
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+    return jsonify({"listings": listing_cache().stats()})
+
+
 @app.route("/api/ssh-keys")
 def list_ssh_keys():
     """List SSH keys on the local machine."""
@@ -1134,13 +3313,35 @@ def generate_ssh_key():
 
 def run_ssh_command(cmd):
     """Run a command on the remote server and return (stdout, stderr)."""
+    return run_ssh_commands([cmd])[0]
+
+
+def run_ssh_commands(cmds):
+    """Run several commands, returning a (stdout, stderr) pair for each.
+
+    With the remote helper they all go out in one round trip; otherwise
+    each one gets its own exec channel.
+    """
     if not ssh_state["client"]:
-        return None, "Not connected"
-    try:
-        _, stdout, stderr = ssh_state["client"].exec_command(cmd)
-        return stdout.read().decode().strip(), stderr.read().decode().strip()
-    except Exception as e:
-        return None, str(e)
+        return [(None, "Not connected")] * len(cmds)
+    found = helper_call(*({"op": "sh", "cmd": c} for c in cmds))
+    if found:
+        results = []
+        for r in found:
+            try:
+                out = helper_result(r)
+                results.append((out["stdout"].strip(), out["stderr"].strip()))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+    results = []
+    for cmd in cmds:
+        try:
+            _, stdout, stderr = ssh_state["client"].exec_command(cmd)
+            results.append((stdout.read().decode().strip(), stderr.read().decode().strip()))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
 
 
 @app.route("/api/tmux/status")
@@ -1260,211 +3461,2259 @@ def tmux_select_window():
     if not ssh_state["client"]:
         return jsonify({"error": "Not connected"}), 400
 
-    data = request.json
-    index = data.get("index", 0)
-    _, err = run_ssh_command(f"tmux select-window -t :{index} 2>/dev/null")
-    if err and "no server" in err.lower():
-        return jsonify({"error": err}), 400
-    return jsonify({"status": "ok"})
+    data = request.json
+    index = data.get("index", 0)
+    _, err = run_ssh_command(f"tmux select-window -t :{index} 2>/dev/null")
+    if err and "no server" in err.lower():
+        return jsonify({"error": err}), 400
+    return jsonify({"status": "ok"})
+
+
+@app.route("/api/tmux/rename-window", methods=["POST"])
+def tmux_rename_window():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    index = data.get("index", 0)
+    name = shlex.quote(data.get("name", ""))
+    _, err = run_ssh_command(f"tmux rename-window -t :{index} {name} 2>/dev/null")
+    if err and "no server" in err.lower():
+        return jsonify({"error": err}), 400
+    return jsonify({"status": "ok"})
+
+
+@app.route("/api/tmux/kill-window", methods=["POST"])
+def tmux_kill_window():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    index = data.get("index", 0)
+    _, err = run_ssh_command(f"tmux kill-window -t :{index} 2>/dev/null")
+    if err and "no server" in err.lower():
+        return jsonify({"error": err}), 400
+    return jsonify({"status": "ok"})
+
+
+@app.route("/api/tmux/split-pane", methods=["POST"])
+def tmux_split_pane():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    direction = data.get("direction", "h")
+    flag = "-h" if direction == "h" else "-v"
+    _, err = run_ssh_command(f"tmux split-window {flag} 2>/dev/null")
+    if err and "no server" in err.lower():
+        return jsonify({"error": err}), 400
+    return jsonify({"status": "ok"})
+
+
+# ── Package Manager ────────────────────────────────────────────────
+
+
+@app.route("/api/packages/detect")
+def packages_detect():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    (has_uv, _), (has_pip, _), (python_ver, _), (active_venv, _) = run_ssh_commands([
+        "which uv 2>/dev/null",
+        "which pip 2>/dev/null || which pip3 2>/dev/null",
+        "python3 --version 2>/dev/null || python --version 2>/dev/null",
+        "echo $VIRTUAL_ENV",
+    ])
+
+    # Find nearby venvs in home dir
+    nearby_venvs = []
+    home = ssh_state.get("home_dir", "")
+    if home:
+        out, _ = run_ssh_command(
+            f"ls -d {shlex.quote(home)}/.venv {shlex.quote(home)}/venv "
+            f"{shlex.quote(home)}/*/venv {shlex.quote(home)}/*/.venv 2>/dev/null"
+        )
+        if out:
+            nearby_venvs = [p for p in out.split("\n") if p.strip()]
+
+    return jsonify({
+        "has_uv": bool(has_uv),
+        "has_pip": bool(has_pip),
+        "python_version": python_ver or None,
+        "active_venv": active_venv if active_venv else None,
+        "nearby_venvs": nearby_venvs,
+    })
+
+
+@app.route("/api/packages/list", methods=["POST"])
+def packages_list():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    venv_path = data.get("venv_path")
+
+    # Build the pip command, preferring uv
+    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+
+    if venv_path:
+        venv_quoted = shlex.quote(venv_path)
+        if has_uv:
+            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip list --format=json 2>/dev/null"
+        else:
+            cmd = f"{venv_quoted}/bin/pip list --format=json 2>/dev/null"
+    else:
+        if has_uv:
+            cmd = "uv pip list --format=json 2>/dev/null"
+        else:
+            cmd = "pip list --format=json 2>/dev/null || pip3 list --format=json 2>/dev/null"
+
+    out, err = run_ssh_command(cmd)
+    if out:
+        try:
+            packages = json.loads(out)
+            return jsonify({"packages": packages})
+        except json.JSONDecodeError:
+            return jsonify({"packages": [], "error": "Failed to parse package list"})
+    return jsonify({"packages": [], "error": err or "No output"})
+
+
+@app.route("/api/packages/install", methods=["POST"])
+def packages_install():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    package = data.get("package", "").strip()
+    venv_path = data.get("venv_path")
+
+    if not package:
+        return jsonify({"error": "Package name is required"}), 400
+
+    # Sanitize package name
+    pkg_quoted = shlex.quote(package)
+    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+
+    if venv_path:
+        venv_quoted = shlex.quote(venv_path)
+        if has_uv:
+            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip install {pkg_quoted} 2>&1"
+        else:
+            cmd = f"{venv_quoted}/bin/pip install {pkg_quoted} 2>&1"
+    else:
+        if has_uv:
+            cmd = f"uv pip install {pkg_quoted} 2>&1"
+        else:
+            cmd = f"pip install {pkg_quoted} 2>&1 || pip3 install {pkg_quoted} 2>&1"
+
+    out, _ = run_ssh_command(cmd)
+    if out and ("error" in out.lower() or "not found" in out.lower()):
+        return jsonify({"error": out}), 400
+    return jsonify({"status": "ok", "output": out})
+
+
+@app.route("/api/packages/uninstall", methods=["POST"])
+def packages_uninstall():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    package = data.get("package", "").strip()
+    venv_path = data.get("venv_path")
+
+    if not package:
+        return jsonify({"error": "Package name is required"}), 400
+
+    pkg_quoted = shlex.quote(package)
+    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+
+    if venv_path:
+        venv_quoted = shlex.quote(venv_path)
+        if has_uv:
+            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip uninstall {pkg_quoted} 2>&1"
+        else:
+            cmd = f"{venv_quoted}/bin/pip uninstall -y {pkg_quoted} 2>&1"
+    else:
+        if has_uv:
+            cmd = f"uv pip uninstall {pkg_quoted} 2>&1"
+        else:
+            cmd = f"pip uninstall -y {pkg_quoted} 2>&1 || pip3 uninstall -y {pkg_quoted} 2>&1"
+
+    out, _ = run_ssh_command(cmd)
+    return jsonify({"status": "ok", "output": out})
+
+
+@app.route("/api/packages/create-venv", methods=["POST"])
+def packages_create_venv():
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", "").strip()
+
+    if not path:
+        return jsonify({"error": "Path is required"}), 400
+
+    path_quoted = shlex.quote(path)
+    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+
+    if has_uv:
+        cmd = f"uv venv {path_quoted} 2>&1"
+    else:
+        cmd = f"python3 -m venv {path_quoted} 2>&1 || python -m venv {path_quoted} 2>&1"
+
+    out, _ = run_ssh_command(cmd)
+    if out and "error" in out.lower():
+        return jsonify({"error": out}), 400
+    return jsonify({"status": "ok", "output": out})
+
+
+# ── Background Jobs ────────────────────────────────────────────────
+
+jobs = {}
+jobs_lock = threading.Lock()
+# Ids a client may pick for the jobs it starts
+JOB_ID_RE = re.compile(r"[\w-]{1,32}")
+
+
+class Job:
+    """A cancellable background task reporting to one browser socket.
+
+    Events go to the socket that started the job, tagged with its id.
+    Cancelling closes the channels the job attached, which stops the remote
+    side too.
+    """
+
+    def __init__(self, kind, conn, sid, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.conn = conn
+        self.sid = sid
+        self.cancelled = threading.Event()
+        self._channels = []
+
+    def emit(self, event, payload):
+        if self.sid:
+            socketio.emit(event, dict(payload, job_id=self.id), to=self.sid)
+
+    def attach(self, channel):
+        self._channels.append(channel)
+        if self.cancelled.is_set():
+            channel.close()
+
+    def cancel(self):
+        self.cancelled.set()
+        for channel in self._channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+
+def start_job(kind, conn, sid, target, *args, job_id=None):
+    """Run target(job, *args) in a thread, then emit job_done or job_error.
+
+    A client can pass its own job_id so it can match events that arrive
+    before the acknowledgement; an unusable one is replaced.
+    """
+    with jobs_lock:
+        if not isinstance(job_id, str) or not JOB_ID_RE.fullmatch(job_id) or job_id in jobs:
+            job_id = None
+        job = Job(kind, conn, sid, job_id)
+        jobs[job.id] = job
+
+    def run():
+        try:
+            target(job, *args)
+            if not job.cancelled.is_set():
+                job.emit("job_done", {"kind": kind})
+        except Exception as e:
+            if not job.cancelled.is_set():
+                job.emit("job_error", {"kind": kind, "error": str(e)})
+        finally:
+            with jobs_lock:
+                jobs.pop(job.id, None)
+
+    threading.Thread(target=run, daemon=True).start()
+    return job
+
+
+def cancel_jobs(sid=None, conn=None):
+    with jobs_lock:
+        found = [
+            job for job in jobs.values()
+            if (sid and job.sid == sid) or (conn is not None and job.conn is conn)
+        ]
+    for job in found:
+        job.cancel()
+
+
+@socketio.on("job_cancel")
+def handle_job_cancel(data):
+    with jobs_lock:
+        job = jobs.get(data.get("job_id", ""))
+    if job and job.sid == request.sid:
+        job.cancel()
+
+
+def run_dir_sizes(job, path, missing):
+    for name, size in compute_dir_sizes(job.conn, path, missing, job):
+        job.emit("dir_size", {"path": path, "name": name, "size": size})
+    if job.cancelled.is_set() or path == "/":
+        return
+    # All children known: the directory's own total is now free
+    size = compose_parent(job.conn, path)
+    if size is not None:
+        parent, name = posixpath.split(path)
+        job.emit("dir_size", {"path": parent, "name": name, "size": size})
+
+
+@socketio.on("dir_sizes_start")
+def handle_dir_sizes_start(data):
+    """Size a column's subdirectories.
+
+    Known sizes come back in the ack; the rest are pushed as dir_size events
+    while a background job runs du on them.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    path = data.get("path", "")
+    names = data.get("names", [])
+    try:
+        sizes, missing = known_dir_sizes(conn, path, names)
+    except Exception as e:
+        return {"error": str(e)}
+    if not missing:
+        return {"sizes": sizes}
+    job = start_job("dir_sizes", conn, request.sid, run_dir_sizes, path, missing)
+    return {"sizes": sizes, "job_id": job.id}
+
+
+# ── Disk Usage ─────────────────────────────────────────────────────
+
+# Printed by find for every path in a remote walk: type, apparent size,
+# mtime and path, NUL-terminated so any file name survives.
+WALK_FORMAT = "%y\\t%s\\t%T@\\t%p\\0"
+
+
+class DiskUsageTree:
+    """Size tree of one remote subtree, built from a streamed find walk.
+
+    Only directories are kept, each with the bytes and file count directly
+    inside it, plus the largest files; memory grows with the number of
+    directories rather than files. Rescans re-read only the directories
+    whose mtime changed, so a file that grows in place is picked up by the
+    next full scan.
+    """
+
+    TOP_FILES = 100
+
+    def __init__(self, root):
+        self.root = root
+        self.dirs = {}
+        self.top = {}
+        # Every file ever dropped from top was at most this big
+        self.top_floor = 0
+        self.scanned_at = None
+        self.job = None
+        self.lock = threading.Lock()
+        self._index = None
+
+    @staticmethod
+    def new_dir(mtime, size):
+        return {"mtime": mtime, "size": size, "bytes": 0, "files": 0}
+
+    def add_file(self, dirs, top, path, size):
+        """Count a file in; returns the largest size it pushed out of top."""
+        parent = dirs.get(posixpath.dirname(path))
+        if parent:
+            parent["bytes"] += size
+            parent["files"] += 1
+        top[path] = size
+        if len(top) <= 4 * self.TOP_FILES:
+            return 0
+        ranked = sorted(top.items(), key=lambda item: -item[1])
+        top.clear()
+        top.update(ranked[:2 * self.TOP_FILES])
+        return ranked[2 * self.TOP_FILES][1]
+
+    def top_complete(self, top, floor):
+        """Whether top surely holds the TOP_FILES largest files."""
+        if not floor:
+            return True
+        sizes = sorted(top.values(), reverse=True)
+        return len(sizes) >= self.TOP_FILES and sizes[self.TOP_FILES - 1] >= floor
+
+    def replace(self, dirs, top, floor):
+        with self.lock:
+            self.dirs, self.top, self.top_floor = dirs, top, floor
+            self.scanned_at = time.time()
+            self._index = None
+
+    def _totals(self):
+        """Recursive totals and child lists, rebuilt after each scan."""
+        if self._index is None:
+            totals = {p: [d["size"] + d["bytes"], d["files"], 0] for p, d in self.dirs.items()}
+            children = {}
+            for p in sorted(self.dirs, key=lambda p: -p.count("/")):
+                parent = posixpath.dirname(p)
+                if p != self.root and parent in totals:
+                    t, pt = totals[p], totals[parent]
+                    pt[0] += t[0]
+                    pt[1] += t[1]
+                    pt[2] += t[2] + 1
+                    children.setdefault(parent, []).append(p)
+            self._index = (totals, children)
+        return self._index
+
+    def summary(self, path, depth=1, limit=50):
+        with self.lock:
+            totals, children = self._totals()
+            if path not in totals:
+                return None
+            return self._node(path, totals, children, depth, limit)
+
+    def _node(self, path, totals, children, depth, limit):
+        size, files, dirs = totals[path]
+        node = {
+            "name": posixpath.basename(path) or "/",
+            "path": path,
+            "size": size,
+            "files": files,
+            "dirs": dirs,
+            "own_bytes": self.dirs[path]["bytes"],
+        }
+        if depth > 0:
+            kids = sorted(children.get(path, []), key=lambda p: -totals[p][0])
+            node["children"] = [
+                self._node(k, totals, children, depth - 1, limit) for k in kids[:limit]
+            ]
+            node["more"] = max(0, len(kids) - limit)
+        return node
+
+    def largest(self, limit=50):
+        with self.lock:
+            files = sorted(self.top.items(), key=lambda item: -item[1])[:limit]
+            dirs = sorted(self.dirs.items(), key=lambda item: -item[1]["bytes"])[:limit]
+            return {
+                "files": [{"path": p, "size": size} for p, size in files],
+                "dirs": [
+                    {"path": p, "size": d["bytes"], "files": d["files"]} for p, d in dirs
+                ],
+            }
+
+
+def walk_remote(job, cmd, on_record, stdin=None):
+    """Run a find command and feed its NUL-terminated records to on_record."""
+    channel = job.conn["client"].get_transport().open_session()
+    job.attach(channel)
+    channel.exec_command(cmd)
+    if stdin is not None:
+        channel.sendall(stdin)
+        channel.shutdown_write()
+    buf = b""
+    while True:
+        data = channel.recv(1 << 20)
+        if not data:
+            break
+        buf += data
+        *records, buf = buf.split(b"\0")
+        for record in records:
+            fields = record.decode("utf-8", errors="replace").split("\t")
+            if len(fields) >= 2:
+                on_record(fields)
+    channel.close()
+
+
+def scan_disk_usage(job, tree, full):
+    """Walk tree.root (or only its changed directories) and update the tree."""
+    root = tree.root
+    progress = {"root": root, "dirs": 0, "files": 0, "bytes": 0}
+    last_emit = [0]
+
+    def report(force=False):
+        now = time.monotonic()
+        if force or now - last_emit[0] > 0.5:
+            last_emit[0] = now
+            job.emit("disk_usage_progress", progress)
+
+    floor = [0]
+
+    def on_file(fields):
+        if len(fields) < 4:
+            return
+        size, path = int(fields[1]), "\t".join(fields[3:])
+        floor[0] = max(floor[0], tree.add_file(dirs, top, path, size))
+        progress["files"] += 1
+        progress["bytes"] += size
+        report()
+
+    if full or not tree.dirs:
+        dirs, top = {}, {}
+
+        def on_entry(fields):
+            if len(fields) < 4:
+                return
+            kind, size, mtime, path = fields[0], int(fields[1]), fields[2], "\t".join(fields[3:])
+            if kind == "d":
+                dirs[path] = tree.new_dir(int(float(mtime)), size)
+                progress["dirs"] += 1
+            else:
+                floor[0] = max(floor[0], tree.add_file(dirs, top, path, size))
+                progress["files"] += 1
+                progress["bytes"] += size
+            report()
+
+        cmd = f"find {shlex.quote(root)} -xdev -printf '{WALK_FORMAT}' 2>/dev/null"
+        walk_remote(job, cmd, on_entry)
+    else:
+        # Walk directories only, then re-read the files of those whose
+        # mtime moved (entries were added, removed or renamed)
+        with tree.lock:
+            old = tree.dirs
+            top = dict(tree.top)
+            floor[0] = tree.top_floor
+        current = {}
+
+        def on_dir(fields):
+            if len(fields) < 3:
+                return
+            mtime, size, path = fields[0], int(fields[1]), "\t".join(fields[2:])
+            current[path] = (int(float(mtime)), size)
+            progress["dirs"] += 1
+            report()
+
+        cmd = f"find {shlex.quote(root)} -xdev -type d -printf '%T@\\t%s\\t%p\\0' 2>/dev/null"
+        walk_remote(job, cmd, on_dir)
+        if job.cancelled.is_set():
+            return
+        dirs, changed = {}, []
+        for path, (mtime, size) in current.items():
+            before = old.get(path)
+            if before and before["mtime"] == mtime:
+                dirs[path] = dict(before, size=size)
+            else:
+                dirs[path] = tree.new_dir(mtime, size)
+                changed.append(path)
+        stale = set(changed) | (set(old) - set(current))
+        top = {p: size for p, size in top.items() if posixpath.dirname(p) not in stale}
+        if changed:
+            script = (
+                'exec find "$@" -mindepth 1 -maxdepth 1 ! -type d '
+                f"-printf '{WALK_FORMAT}' 2>/dev/null"
+            )
+            walk_remote(
+                job, f"xargs -0 sh -c {shlex.quote(script)} _", on_file,
+                stdin=b"\0".join(p.encode() for p in changed),
+            )
+        progress["changed_dirs"] = len(changed)
+        if not job.cancelled.is_set() and not tree.top_complete(top, floor[0]):
+            # Removed files left room for ones dropped from top in earlier
+            # scans, which only a walk of every file can find again
+            top, floor[0] = {}, 0
+
+            def on_top(fields):
+                if len(fields) >= 4:
+                    floor[0] = max(floor[0], tree.add_file({}, top, "\t".join(fields[3:]), int(fields[1])))
+
+            cmd = f"find {shlex.quote(root)} -xdev ! -type d -printf '{WALK_FORMAT}' 2>/dev/null"
+            walk_remote(job, cmd, on_top)
+    if job.cancelled.is_set():
+        return
+    tree.replace(dirs, top, floor[0])
+    report(force=True)
+
+
+def run_disk_usage_scan(job, tree, full):
+    try:
+        scan_disk_usage(job, tree, full)
+    finally:
+        with connections_lock:
+            if tree.job is job:
+                tree.job = None
+
+
+@socketio.on("disk_usage_scan")
+def handle_disk_usage_scan(data):
+    """Start (re)scanning a subtree for the disk-usage view.
+
+    The first scan of a root walks everything; later ones only re-read
+    changed directories unless "full" is set. Progress is pushed as
+    disk_usage_progress events, then job_done; the client may pick the
+    job_id.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    root = posixpath.normpath(data.get("root") or conn["home_dir"])
+    with connections_lock:
+        tree = conn["disk_usage"].setdefault(root, DiskUsageTree(root))
+        if tree.job:
+            tree.job.cancel()
+        tree.job = start_job(
+            "disk_usage", conn, request.sid, run_disk_usage_scan, tree,
+            bool(data.get("full")), job_id=data.get("job_id"),
+        )
+    return {"job_id": tree.job.id, "root": root}
+
+
+@app.route("/api/disk-usage", methods=["POST"])
+def disk_usage_tree():
+    """Sizes inside one directory of a scanned subtree, largest first.
+
+    depth > 1 nests grandchildren too, e.g. for a treemap.
+    """
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    root = posixpath.normpath(data.get("root", ""))
+    path = posixpath.normpath(data.get("path") or root)
+    depth = max(1, min(int(data.get("depth", 1)), 4))
+    limit = max(1, int(data.get("limit", 50)))
+
+    tree = ssh_state["disk_usage"].get(root)
+    if not tree or tree.scanned_at is None:
+        return jsonify({"error": "Not scanned"}), 404
+    node = tree.summary(path, depth, limit)
+    if node is None:
+        return jsonify({"error": f"Not found: {path}"}), 404
+    return jsonify({"root": root, "scanned_at": tree.scanned_at, "tree": node})
+
+
+@app.route("/api/disk-usage/top", methods=["POST"])
+def disk_usage_top():
+    """Largest files and the directories holding the most bytes directly."""
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    root = posixpath.normpath(data.get("root", ""))
+    tree = ssh_state["disk_usage"].get(root)
+    if not tree or tree.scanned_at is None:
+        return jsonify({"error": "Not scanned"}), 404
+    result = tree.largest(max(1, min(int(data.get("limit", 50)), tree.TOP_FILES)))
+    result.update(root=root, scanned_at=tree.scanned_at)
+    return jsonify(result)
+
+
+# ── Filename Index ─────────────────────────────────────────────────
+
+# Indexes older than this are refreshed in the background on the next search
+SEARCH_INDEX_MAX_AGE = 30
+
+
+class FilenameIndex:
+    """Names under one remote root, for instant substring and fuzzy search.
+
+    Each directory keeps its entries packed as newline-joined name blobs
+    plus arrays of sizes and mtimes, so a query is one `in` test per
+    directory and only matching directories are unpacked. Refreshes walk
+    directories only and re-read those whose mtime changed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.dirs = {}
+        self.built_at = None
+        self.job = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def pack(mtime, entries):
+        names = "\n".join(e[0] for e in entries)
+        return (
+            mtime,
+            names,
+            names.lower(),
+            "".join(e[1] for e in entries),
+            array("q", (e[2] for e in entries)),
+            array("d", (e[3] for e in entries)),
+        )
+
+    def replace(self, dirs):
+        with self.lock:
+            self.dirs = dirs
+            self.built_at = time.time()
+
+    def status(self):
+        with self.lock:
+            return {
+                "root": self.root,
+                "ready": self.built_at is not None,
+                "building": bool(self.job and not self.job.cancelled.is_set()
+                                 and self.job.id in jobs),
+                "built_at": self.built_at,
+                "dirs": len(self.dirs),
+                "entries": sum(len(rec[3]) for rec in self.dirs.values()),
+            }
+
+    def covers(self, path):
+        root = self.root.rstrip("/") + "/"
+        return self.built_at is not None and (path == self.root or path.startswith(root))
+
+    def search(self, query, under=None, limit=200, fuzzy=True, order="depth"):
+        """Best matches for query, tiered exact > prefix > substring > fuzzy.
+
+        Within a tier, shallower paths come first (order="depth") or newer
+        ones (order="recent").
+        """
+        q = query.lower()
+        under = (under or self.root).rstrip("/") + "/"
+        subseq = re.compile("[^\n]*?".join(map(re.escape, q))) if fuzzy else None
+        hits = []
+        with self.lock:
+            dirs = self.dirs
+        for parent, rec in dirs.items():
+            if not (parent + "/").startswith(under):
+                continue
+            lower = rec[2]
+            exact = q in lower
+            if not exact and not (subseq and subseq.search(lower)):
+                continue
+            depth = parent.count("/")
+            for i, name in enumerate(lower.split("\n")):
+                if q in name:
+                    tier = 0 if name == q else 1 if name.startswith(q) else 2
+                    spread = 0
+                else:
+                    m = subseq.search(name) if subseq else None
+                    if not m:
+                        continue
+                    tier, spread = 3, m.end() - m.start() - len(q)
+                rank = depth if order == "depth" else -rec[5][i]
+                hits.append((tier, spread, rank, parent, i))
+        best = heapq.nsmallest(limit, hits)
+        results = []
+        for tier, _, _, parent, i in best:
+            rec = dirs[parent]
+            name = rec[1].split("\n")[i]
+            results.append({
+                "name": name,
+                "path": posixpath.join(parent, name),
+                "parent": parent,
+                "is_dir": rec[3][i] == "d",
+                "size": rec[4][i],
+                "modified": rec[5][i],
+                "fuzzy": tier == 3,
+            })
+        return results, len(hits)
+
+
+def build_filename_index(job, index, full):
+    """Walk index.root (or just its changed directories) and swap in the result."""
+    root = index.root
+    progress = {"root": root, "dirs": 0, "entries": 0}
+    last_emit = [0]
+
+    def report(force=False):
+        now = time.monotonic()
+        if force or now - last_emit[0] > 0.5:
+            last_emit[0] = now
+            job.emit("search_index_progress", progress)
+
+    entries = {}
+
+    def on_entry(fields):
+        kind, size, mtime, path = fields[0], int(fields[1]), float(fields[2]), "\t".join(fields[3:])
+        if path != root:
+            entries.setdefault(posixpath.dirname(path), []).append(
+                (posixpath.basename(path), kind, size, mtime)
+            )
+            progress["entries"] += 1
+        if kind == "d":
+            mtimes[path] = mtime
+            progress["dirs"] += 1
+        report()
+
+    if full or not index.dirs:
+        mtimes = {}
+        cmd = f"find {shlex.quote(root)} -xdev -printf '{WALK_FORMAT}' 2>/dev/null"
+        walk_remote(job, cmd, on_entry)
+        if job.cancelled.is_set():
+            return
+        dirs = {p: index.pack(m, entries.get(p, ())) for p, m in mtimes.items()}
+    else:
+        with index.lock:
+            old = index.dirs
+        current = {}
+
+        def on_dir(fields):
+            current["\t".join(fields[1:])] = float(fields[0])
+            progress["dirs"] += 1
+            report()
+
+        cmd = f"find {shlex.quote(root)} -xdev -type d -printf '%T@\\t%p\\0' 2>/dev/null"
+        walk_remote(job, cmd, on_dir)
+        changed = [p for p, m in current.items() if p not in old or old[p][0] != m]
+        if changed and not job.cancelled.is_set():
+            mtimes = {}
+            script = (
+                'exec find "$@" -mindepth 1 -maxdepth 1 '
+                f"-printf '{WALK_FORMAT}' 2>/dev/null"
+            )
+            walk_remote(
+                job, f"xargs -0 sh -c {shlex.quote(script)} _", on_entry,
+                stdin=b"\0".join(p.encode() for p in changed),
+            )
+        if job.cancelled.is_set():
+            return
+        stale = set(changed)
+        dirs = {
+            p: index.pack(m, entries.get(p, ())) if p in stale else old[p]
+            for p, m in current.items()
+        }
+        progress["changed_dirs"] = len(changed)
+    index.replace(dirs)
+    report(force=True)
+
+
+def refresh_filename_index(conn, index, sid=None, full=False):
+    """Start a build of index unless one is already running."""
+    with connections_lock:
+        if index.job and index.job.id in jobs:
+            if not full:
+                return index.job
+            index.job.cancel()
+        index.job = start_job(
+            "search_index", conn, sid, build_filename_index, index, full
+        )
+        return index.job
+
+
+def filename_index_for(conn, path):
+    """The ready index covering path, refreshed in the background if old."""
+    for index in list(conn["search_indexes"].values()):
+        if index.covers(path):
+            if time.time() - index.built_at > SEARCH_INDEX_MAX_AGE:
+                refresh_filename_index(conn, index)
+            return index
+    return None
+
+
+@app.route("/api/search-index", methods=["POST"])
+def search_index():
+    """Turn the filename index for a folder on or off, or report its status.
+
+    {"path": ..., "enabled": true} starts building it; later searches under
+    that folder are answered from memory once it is ready.
+    """
+    if not ssh_state["client"]:
+        return jsonify({"error": "Not connected"}), 400
+
+    data = request.json
+    path = data.get("path", "")
+    if not path:
+        return jsonify({"error": "path is required"}), 400
+    root = posixpath.normpath(path)
+    conn = ssh_state._get_current_object()
+    indexes = conn["search_indexes"]
+
+    enabled = data.get("enabled")
+    if enabled is False:
+        index = indexes.pop(root, None)
+        if index and index.job:
+            index.job.cancel()
+        return jsonify({"root": root, "enabled": False})
+    index = indexes.get(root)
+    if index is None and enabled:
+        index = indexes.setdefault(root, FilenameIndex(root))
+        refresh_filename_index(conn, index)
+    elif index is not None and data.get("rebuild"):
+        refresh_filename_index(conn, index, full=True)
+    if index is None:
+        return jsonify({"root": root, "enabled": False})
+    return jsonify(dict(index.status(), enabled=True))
+
+
+# ── Streaming Search ───────────────────────────────────────────────
+
+SEARCH_PAGE_SIZE = 200
+# A paused search is dropped if the client hasn't asked for more by then
+SEARCH_PAGE_TIMEOUT = 300
+
+search_jobs = {}  # sid -> {"job": Job, "more": Event} for the search in flight
+
+
+def search_hit(fields):
+    """Result dict from one find -printf record (type, size, mtime, path)."""
+    path = "\t".join(fields[3:])
+    return {
+        "name": posixpath.basename(path),
+        "path": path,
+        "parent": posixpath.dirname(path),
+        "is_dir": fields[0] == "d",
+        "size": int(fields[1]),
+        "modified": float(fields[2]),
+    }
+
+
+def stream_records(job, cmd, sep=b"\0"):
+    """Yield a remote command's output records as they arrive.
+
+    None is yielded whenever the command goes quiet for a moment, so the
+    caller can flush what it has batched. Closing the generator closes the
+    channel and stops the command.
+    """
+    channel = job.conn["client"].get_transport().open_session()
+    job.attach(channel)
+    channel.settimeout(0.2)
+    channel.exec_command(cmd)
+    buf = b""
+    try:
+        while True:
+            try:
+                data = channel.recv(1 << 16)
+            except TimeoutError:
+                yield None
+                continue
+            if not data:
+                break
+            buf += data
+            *records, buf = buf.split(sep)
+            for record in records:
+                yield record.decode("utf-8", errors="replace")
+    finally:
+        channel.close()
+
+
+def find_matches(job, path, query):
+    """Yield find's hits as they arrive, and None whenever find goes quiet."""
+    cmd = (
+        f"find {shlex.quote(path)} -mindepth 1 -iname {shlex.quote(f'*{query}*')} "
+        f"-printf '{WALK_FORMAT}' 2>/dev/null"
+    )
+    for record in stream_records(job, cmd):
+        if record is None:
+            yield None
+            continue
+        fields = record.split("\t")
+        if len(fields) >= 4:
+            yield search_hit(fields)
+
+
+def stream_search(job, path, query, page_size, more):
+    """Push hits as search_results events, pausing after each page.
+
+    While paused the remote find blocks on the SSH window; search_more
+    resumes it. An index covering path answers from memory instead.
+    """
+    index = filename_index_for(job.conn, path)
+    if index:
+        hits = iter(index.search(query, under=path, limit=50 * page_size)[0])
+    else:
+        hits = find_matches(job, path, query)
+    batch, count, last_flush = [], 0, time.monotonic()
+
+    def flush(state=None):
+        job.emit("search_results", {"results": batch, "count": count, "state": state})
+        batch.clear()
+
+    for hit in hits:
+        if job.cancelled.is_set():
+            return
+        if hit is not None:
+            batch.append(hit)
+            count += 1
+        if batch and (len(batch) >= 50 or time.monotonic() - last_flush > 0.1):
+            flush()
+            last_flush = time.monotonic()
+        if hit is not None and count % page_size == 0:
+            flush("more")
+            more.clear()
+            deadline = time.monotonic() + SEARCH_PAGE_TIMEOUT
+            while not more.wait(0.5):
+                if job.cancelled.is_set() or time.monotonic() > deadline:
+                    return
+    flush("done")
+
+
+@socketio.on("search_start")
+def handle_search_start(data):
+    """Start a streamed search, cancelling this socket's previous one.
+
+    Hits arrive as search_results events; a page ending with state "more"
+    waits for search_more before the walk continues. The client may pick
+    the job_id.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    path = data.get("path", "")
+    query = data.get("query", "")
+    if not path or not query:
+        return {"error": "path and query are required"}
+    page_size = max(1, int(data.get("page_size", SEARCH_PAGE_SIZE)))
+
+    sid = request.sid
+    previous = search_jobs.pop(sid, None)
+    if previous:
+        previous["job"].cancel()
+    more = threading.Event()
+    job = start_job(
+        "search", conn, sid, stream_search, path, query, page_size, more,
+        job_id=data.get("job_id"),
+    )
+    search_jobs[sid] = {"job": job, "more": more}
+    return {"job_id": job.id}
+
+
+@socketio.on("search_more")
+def handle_search_more(data):
+    current = search_jobs.get(request.sid)
+    if current and current["job"].id == data.get("job_id"):
+        current["more"].set()
+
+
+# ── Content Search ─────────────────────────────────────────────────
+
+GREP_LIMIT = 1000
+GREP_MAX_LIMIT = 10000
+GREP_SNIPPET = 300  # max characters of a matching line sent to the client
+
+grep_jobs = {}  # sid -> running content search
+
+
+def grep_command(path, pattern, regex, case_sensitive, include, exclude, max_size):
+    """Shell script running rg --json, or find | xargs grep -n without rg.
+
+    The first output line names the tool so the reader knows the format.
+    """
+    q = shlex.quote
+    rg = ["rg", "--json", "--no-messages", "-s" if case_sensitive else "-i"]
+    if not regex:
+        rg.append("-F")
+    rg += [f"-g {q(g)}" for g in include]
+    rg += [f"-g {q('!' + g)}" for g in exclude]
+    if max_size:
+        rg.append(f"--max-filesize {int(max_size)}")
+    rg.append(f"-e {q(pattern)} -- {q(path)}")
+
+    find = [f"find {q(path)}"]
+    if exclude:
+        find.append(r"\( " + " -o ".join(f"-name {q(g)}" for g in exclude) + r" \) -prune -o")
+    find.append("-type f")
+    if max_size:
+        find.append(f"! -size +{int(max_size)}c")
+    if include:
+        find.append(r"\( " + " -o ".join(f"-name {q(g)}" for g in include) + r" \)")
+    find.append("-print0 2>/dev/null")
+    grep = ["xargs -0 -r grep -nIH --null", "-F" if not regex else "-E"]
+    if not case_sensitive:
+        grep.append("-i")
+    grep.append(f"-e {q(pattern)} --")
+
+    return (
+        "if command -v rg >/dev/null 2>&1; then echo rg; exec "
+        + " ".join(rg)
+        + "; else echo grep; "
+        + " ".join(find) + " | " + " ".join(grep)
+        + " 2>/dev/null; fi"
+    )
+
 
+def grep_snippet(text, column):
+    text = text.rstrip("\r\n")
+    if len(text) <= GREP_SNIPPET:
+        return text
+    start = max(0, min((column or 1) - 1 - GREP_SNIPPET // 3, len(text) - GREP_SNIPPET))
+    return text[start:start + GREP_SNIPPET]
 
-@app.route("/api/tmux/rename-window", methods=["POST"])
-def tmux_rename_window():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
 
-    data = request.json
-    index = data.get("index", 0)
-    name = shlex.quote(data.get("name", ""))
-    _, err = run_ssh_command(f"tmux rename-window -t :{index} {name} 2>/dev/null")
-    if err and "no server" in err.lower():
-        return jsonify({"error": err}), 400
-    return jsonify({"status": "ok"})
+def parse_rg(record):
+    msg = json.loads(record)
+    if msg.get("type") != "match":
+        return None
+    data = msg["data"]
 
+    def text(field):
+        if "text" in field:
+            return field["text"]
+        return base64.b64decode(field["bytes"]).decode("utf-8", errors="replace")
 
-@app.route("/api/tmux/kill-window", methods=["POST"])
-def tmux_kill_window():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
+    line = text(data["lines"])
+    subs = data.get("submatches") or []
+    # rg reports byte offsets; convert to a character column
+    column = (
+        len(line.encode()[:subs[0]["start"]].decode("utf-8", errors="replace")) + 1
+        if subs else None
+    )
+    return text(data["path"]), data["line_number"], column, line
 
-    data = request.json
-    index = data.get("index", 0)
-    _, err = run_ssh_command(f"tmux kill-window -t :{index} 2>/dev/null")
-    if err and "no server" in err.lower():
-        return jsonify({"error": err}), 400
-    return jsonify({"status": "ok"})
 
+def parse_grep(record, matcher):
+    path, sep, rest = record.partition("\0")
+    number, sep2, line = rest.partition(":")
+    if not sep or not sep2 or not number.isdigit():
+        return None
+    m = matcher(line)
+    return path, int(number), m + 1 if m is not None else None, line
 
-@app.route("/api/tmux/split-pane", methods=["POST"])
-def tmux_split_pane():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
 
-    data = request.json
-    direction = data.get("direction", "h")
-    flag = "-h" if direction == "h" else "-v"
-    _, err = run_ssh_command(f"tmux split-window {flag} 2>/dev/null")
-    if err and "no server" in err.lower():
-        return jsonify({"error": err}), 400
-    return jsonify({"status": "ok"})
+def run_grep(job, path, pattern, options, limit):
+    """Push matches as grep_results events until the command ends or limit hits."""
+    regex = options["regex"]
+    flags = 0 if options["case_sensitive"] else re.IGNORECASE
+    try:
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+    except re.error:
+        compiled = None
 
+    def matcher(line):
+        m = compiled.search(line) if compiled else None
+        return m.start() if m else None
 
-# ── Package Manager ────────────────────────────────────────────────
+    records = stream_records(job, grep_command(path, pattern, **options), b"\n")
+    tool, batch, count, last_flush = None, [], 0, time.monotonic()
 
+    def flush(state=None):
+        job.emit("grep_results", {"matches": batch, "count": count, "tool": tool, "state": state})
+        batch.clear()
 
-@app.route("/api/packages/detect")
-def packages_detect():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
+    try:
+        for record in records:
+            if job.cancelled.is_set():
+                return
+            if record is not None:
+                if tool is None:
+                    tool = record.strip()
+                    continue
+                try:
+                    hit = parse_rg(record) if tool == "rg" else parse_grep(record, matcher)
+                except (ValueError, KeyError):
+                    hit = None
+                if hit:
+                    file_path, line_number, column, line = hit
+                    batch.append({
+                        "path": file_path,
+                        "line": line_number,
+                        "column": column,
+                        "text": grep_snippet(line, column),
+                    })
+                    count += 1
+            if batch and (len(batch) >= 100 or time.monotonic() - last_flush > 0.1):
+                flush()
+                last_flush = time.monotonic()
+            if count >= limit:
+                flush("capped")
+                return
+    finally:
+        records.close()
+    flush("done")
+
+
+@socketio.on("grep_start")
+def handle_grep_start(data):
+    """Search file contents under a folder, streaming grep_results events.
+
+    Uses rg when the server has it (which skips hidden and git-ignored
+    files) and find + grep -n otherwise. Starting another content search
+    from the same socket cancels this one. The client may pick the job_id.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    path = data.get("path", "")
+    pattern = data.get("pattern", "")
+    if not path or not pattern:
+        return {"error": "path and pattern are required"}
+    options = {
+        "regex": bool(data.get("regex")),
+        "case_sensitive": bool(data.get("case_sensitive")),
+        "include": [g for g in data.get("include", []) if g],
+        "exclude": [g for g in data.get("exclude", []) if g],
+        "max_size": data.get("max_size"),
+    }
+    limit = max(1, min(int(data.get("limit", GREP_LIMIT)), GREP_MAX_LIMIT))
 
-    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
-    has_pip, _ = run_ssh_command("which pip 2>/dev/null || which pip3 2>/dev/null")
-    python_ver, _ = run_ssh_command(
-        "python3 --version 2>/dev/null || python --version 2>/dev/null"
+    sid = request.sid
+    previous = grep_jobs.pop(sid, None)
+    if previous:
+        previous.cancel()
+    job = start_job(
+        "grep", conn, sid, run_grep, path, pattern, options, limit,
+        job_id=data.get("job_id"),
     )
-    active_venv, _ = run_ssh_command("echo $VIRTUAL_ENV")
+    grep_jobs[sid] = job
+    return {"job_id": job.id}
 
-    # Find nearby venvs in home dir
-    nearby_venvs = []
-    home = ssh_state.get("home_dir", "")
-    if home:
-        out, _ = run_ssh_command(
-            f"ls -d {shlex.quote(home)}/.venv {shlex.quote(home)}/venv "
-            f"{shlex.quote(home)}/*/venv {shlex.quote(home)}/*/.venv 2>/dev/null"
-        )
-        if out:
-            nearby_venvs = [p for p in out.split("\n") if p.strip()]
 
-    return jsonify({
-        "has_uv": bool(has_uv),
-        "has_pip": bool(has_pip),
-        "python_version": python_ver or None,
-        "active_venv": active_venv if active_venv else None,
-        "nearby_venvs": nearby_venvs,
-    })
+# ── Folder Sync ────────────────────────────────────────────────────
 
+SYNC_MODES = ("both", "push", "pull")
+# Seconds between checks of the local folder while a sync is watching
+SYNC_WATCH_INTERVAL = 1
+# Checks only stat folders; every this many, walk every file regardless
+SYNC_FULL_RESCAN = 10
 
-@app.route("/api/packages/list", methods=["POST"])
-def packages_list():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
 
-    data = request.json
-    venv_path = data.get("venv_path")
+def local_snapshot(root, dir_mtimes=None):
+    """{relative path: (is_dir, size, mtime)} for a local folder's contents.
 
-    # Build the pip command, preferring uv
-    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+    Symlinks are skipped rather than followed. dir_mtimes, if given, is
+    filled with each folder's mtime as it was before being listed.
+    """
+    entries = {}
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        try:
+            if dir_mtimes is not None:
+                dir_mtimes[rel] = os.stat(os.path.join(root, rel)).st_mtime_ns
+            it = os.scandir(os.path.join(root, rel))
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_symlink():
+                    continue
+                path = f"{rel}/{entry.name}" if rel else entry.name
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    entries[path] = (True, 0, 0)
+                    stack.append(path)
+                elif stat.S_ISREG(st.st_mode):
+                    entries[path] = (False, st.st_size, int(st.st_mtime))
+    return entries
 
-    if venv_path:
-        venv_quoted = shlex.quote(venv_path)
-        if has_uv:
-            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip list --format=json 2>/dev/null"
-        else:
-            cmd = f"{venv_quoted}/bin/pip list --format=json 2>/dev/null"
-    else:
-        if has_uv:
-            cmd = "uv pip list --format=json 2>/dev/null"
-        else:
-            cmd = "pip list --format=json 2>/dev/null || pip3 list --format=json 2>/dev/null"
 
-    out, err = run_ssh_command(cmd)
-    if out:
+def local_dirs_changed(root, dir_mtimes):
+    """Whether any folder recorded by local_snapshot changed or went away."""
+    for rel, mtime in dir_mtimes.items():
         try:
-            packages = json.loads(out)
-            return jsonify({"packages": packages})
-        except json.JSONDecodeError:
-            return jsonify({"packages": [], "error": "Failed to parse package list"})
-    return jsonify({"packages": [], "error": err or "No output"})
-
+            if os.stat(os.path.join(root, rel)).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def remote_snapshot(job, root):
+    """local_snapshot's counterpart for a remote folder, from one find."""
+    entries = {}
+    prefix = root.rstrip("/") + "/"
+
+    def on_record(fields):
+        kind, size, mtime, path = fields[0], fields[1], fields[2], "\t".join(fields[3:])
+        if not path.startswith(prefix):
+            return
+        if kind == "d":
+            entries[path[len(prefix):]] = (True, 0, 0)
+        elif kind == "f":
+            entries[path[len(prefix):]] = (False, int(size), int(float(mtime)))
+
+    walk_remote(
+        job,
+        f"find {shlex.quote(root)} -mindepth 1 \\( -type d -o -type f \\) "
+        f"-printf '{WALK_FORMAT}' 2>/dev/null",
+        on_record,
+    )
+    return entries
 
-@app.route("/api/packages/install", methods=["POST"])
-def packages_install():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
 
-    data = request.json
-    package = data.get("package", "").strip()
-    venv_path = data.get("venv_path")
+def remote_sha256s(conn, root, rels):
+    """{relative path: sha256} for files under a remote root, in one command."""
+    stdin, stdout, _ = conn["client"].exec_command(
+        f"cd {shlex.quote(root)} && xargs -0 sha256sum -z -- 2>/dev/null"
+    )
+    stdin.write("\0".join(rels))
+    stdin.channel.shutdown_write()
+    digests = {}
+    for record in stdout.read().split(b"\0"):
+        digest, _, name = record.decode("utf-8", errors="replace").partition("  ")
+        if name:
+            digests[name] = digest
+    return digests
+
+
+def local_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sync_plan(local, remote, base, mode, delete):
+    """Decide what a sync pass does with each path.
+
+    `base` is both sides' state after the previous pass. In "both" mode a
+    file that changed on one side since then is copied to the other, one
+    that changed on both is a conflict, and one that disappeared from a side
+    is deleted from the other. Without a base (the first pass) nothing is
+    deleted and the newer copy wins. "push" and "pull" make the target match
+    the source, deleting its extras only when `delete` is set.
+
+    Returns (action, rel) pairs; actions are push, pull, mkdir_remote,
+    mkdir_local, delete_remote, delete_local and conflict.
+    """
+    plan = []
+    for rel in sorted(local.keys() | remote.keys()):
+        l, r, b = local.get(rel), remote.get(rel), base.get(rel)
+        if l and r:
+            if l == r or (l[0] and r[0]):
+                continue
+            if l[0] != r[0]:
+                plan.append(("conflict", rel))
+            elif mode != "both":
+                plan.append((mode, rel))
+            elif b is None:
+                plan.append(("push" if l[2] >= r[2] else "pull", rel))
+            elif r == b:
+                plan.append(("push", rel))
+            elif l == b:
+                plan.append(("pull", rel))
+            else:
+                plan.append(("conflict", rel))
+        elif l:
+            if mode == "pull" or (mode == "both" and l == b):
+                if mode == "both" or delete:
+                    plan.append(("delete_local", rel))
+            else:
+                plan.append(("mkdir_remote" if l[0] else "push", rel))
+        else:
+            if mode == "push" or (mode == "both" and r == b):
+                if mode == "both" or delete:
+                    plan.append(("delete_remote", rel))
+            else:
+                plan.append(("mkdir_local" if r[0] else "pull", rel))
+    return plan
+
+
+class FolderSync:
+    """One local folder kept in step with one remote folder.
+
+    The state after the last pass is kept per connection, so a later sync
+    of the same pair can tell deletions from new files.
+    """
+
+    def __init__(self, conn, local_root, remote_root):
+        self.conn = conn
+        self.local_root = local_root
+        self.remote_root = remote_root
+        self.job = None
+        self.base = {}
+        self.local = {}
+        self.remote = {}
+
+    def run_pass(self, job, local, remote, mode, use_hash, delete):
+        """Carry out one sync pass and return its summary."""
+        plan = sync_plan(local, remote, self.base, mode, delete)
+        if use_hash:
+            plan = self._drop_identical(job, plan, local, remote)
+        summary = {"pushed": 0, "pulled": 0, "deleted": 0, "conflicts": [], "errors": []}
+        transfers = [(action, rel) for action, rel in plan if action in ("push", "pull")]
+        progress = {"phase": "transfer", "done": 0, "total": len(transfers), "name": None}
+        last_emit = [0]
+
+        def report(name, force=False):
+            progress["done"] += name is not None
+            progress["name"] = name
+            now = time.monotonic()
+            if force or now - last_emit[0] > 0.5:
+                last_emit[0] = now
+                job.emit("sync_progress", progress)
+
+        with sftp_session(self.conn) as sftp:
+            for action, rel in plan:
+                if action == "mkdir_remote":
+                    try:
+                        sftp.mkdir(posixpath.join(self.remote_root, rel))
+                    except IOError:
+                        if not self._remote_isdir(sftp, rel):
+                            raise
+                    remote[rel] = local[rel]
+                elif action == "mkdir_local":
+                    os.makedirs(os.path.join(self.local_root, rel), exist_ok=True)
+                    local[rel] = remote[rel]
+                elif action == "conflict":
+                    summary["conflicts"].append(rel)
+
+        def transfer(item):
+            """Copy one file; failures are reported and retried next pass."""
+            action, rel = item
+            if job.cancelled.is_set():
+                return None
+            try:
+                if action == "push":
+                    self._push(rel, local[rel])
+                    remote[rel] = local[rel]
+                else:
+                    self._pull(rel, remote[rel])
+                    local[rel] = remote[rel]
+            except Exception as e:
+                summary["errors"].append(f"{rel}: {e}")
+                return None
+            report(rel)
+            return action
+
+        report(None, force=True)
+        with ThreadPoolExecutor(max_workers=self.conn["sftp_pool"].size) as pool:
+            for action in pool.map(transfer, transfers):
+                if action:
+                    summary["pushed" if action == "push" else "pulled"] += 1
+        if job.cancelled.is_set():
+            return summary
+        report(None, force=True)
+
+        # Children of a deleted directory go with it
+        gone = None
+        for action, rel in plan:
+            if action not in ("delete_local", "delete_remote"):
+                continue
+            if gone and rel.startswith(gone):
+                (local if action == "delete_local" else remote).pop(rel, None)
+                continue
+            if action == "delete_local":
+                self._delete_local(rel, local.pop(rel)[0])
+            else:
+                self._delete_remote(rel, remote.pop(rel)[0])
+            summary["deleted"] += 1
+            gone = rel + "/"
+
+        self.base = {rel: entry for rel, entry in local.items() if remote.get(rel) == entry}
+        self.local, self.remote = local, remote
+        return summary
+
+    def _drop_identical(self, job, plan, local, remote):
+        """Turn copies of same-size files with equal sha256 into mtime fixes."""
+        same_size = [
+            rel for action, rel in plan
+            if action in ("push", "pull") and rel in local and rel in remote
+            and local[rel][1] == remote[rel][1]
+        ]
+        if not same_size:
+            return plan
+        job.emit("sync_progress", {"phase": "hash", "done": 0, "total": len(same_size), "name": None})
+        digests = remote_sha256s(self.conn, self.remote_root, same_size)
+        identical = set()
+        for rel in same_size:
+            if digests.get(rel) == local_sha256(os.path.join(self.local_root, rel)):
+                identical.add(rel)
+        if identical:
+            with sftp_session(self.conn) as sftp:
+                for rel in identical:
+                    mtime = local[rel][2]
+                    sftp.utime(posixpath.join(self.remote_root, rel), (mtime, mtime))
+                    remote[rel] = local[rel]
+        return [(action, rel) for action, rel in plan if rel not in identical]
+
+    def _remote_isdir(self, sftp, rel):
+        try:
+            return stat.S_ISDIR(sftp.stat(posixpath.join(self.remote_root, rel)).st_mode)
+        except IOError:
+            return False
+
+    def _push(self, rel, entry):
+        src = os.path.join(self.local_root, rel)
+        dst = posixpath.join(self.remote_root, rel)
+        with sftp_session(self.conn) as sftp, open(src, "rb") as f:
+            sent = None
+            if entry[1] >= DELTA_MIN_SIZE:
+                with stream_buffer(f) as data:
+                    sent = try_delta_update(self.conn, sftp, dst, data)
+            if sent is None:
+                f.seek(0)
+                put_stream(sftp, f, dst)
+            sftp.utime(dst, (entry[2], entry[2]))
+
+    def _pull(self, rel, entry):
+        src = posixpath.join(self.remote_root, rel)
+        dst = os.path.join(self.local_root, rel)
+        tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.sshgui-part")
+        with sftp_session(self.conn) as sftp, sftp.open(src, "rb") as rf, open(tmp, "wb") as f:
+            attrs = rf.stat()
+            for chunk in stream_remote_file(rf, 0, entry[1]):
+                f.write(chunk)
+        os.chmod(tmp, stat.S_IMODE(attrs.st_mode))
+        os.utime(tmp, (entry[2], entry[2]))
+        os.replace(tmp, dst)
+
+    def _delete_local(self, rel, is_dir):
+        path = os.path.join(self.local_root, rel)
+        if is_dir:
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
 
-    if not package:
-        return jsonify({"error": "Package name is required"}), 400
+    def _delete_remote(self, rel, is_dir):
+        path = posixpath.join(self.remote_root, rel)
+        if is_dir:
+            _, stdout, _ = self.conn["client"].exec_command(f"rm -rf -- {shlex.quote(path)}")
+            stdout.channel.recv_exit_status()
+        else:
+            with sftp_session(self.conn) as sftp:
+                try:
+                    sftp.remove(path)
+                except FileNotFoundError:
+                    pass
 
-    # Sanitize package name
-    pkg_quoted = shlex.quote(package)
-    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
 
-    if venv_path:
-        venv_quoted = shlex.quote(venv_path)
-        if has_uv:
-            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip install {pkg_quoted} 2>&1"
-        else:
-            cmd = f"{venv_quoted}/bin/pip install {pkg_quoted} 2>&1"
-    else:
-        if has_uv:
-            cmd = f"uv pip install {pkg_quoted} 2>&1"
-        else:
-            cmd = f"pip install {pkg_quoted} 2>&1 || pip3 install {pkg_quoted} 2>&1"
+def run_sync(job, sync, mode, use_hash, delete, watch):
+    """Sync both folders, then with `watch` push local changes until cancelled.
+
+    While watching, only the local folder is rescanned: the remote side is
+    taken to be as the last pass left it. Each check stats just the local
+    folders, whose mtimes move when entries are added, removed or renamed;
+    files edited in place are caught by a full walk every SYNC_FULL_RESCAN
+    checks.
+    """
+    job.emit("sync_progress", {"phase": "scan", "done": 0, "total": 0, "name": None})
+    _, stdout, _ = job.conn["client"].exec_command(f"mkdir -p -- {shlex.quote(sync.remote_root)}")
+    stdout.channel.recv_exit_status()
+    remote = remote_snapshot(job, sync.remote_root)
+    if job.cancelled.is_set():
+        return
+    dir_mtimes = {}
+    local = local_snapshot(sync.local_root, dir_mtimes)
+    summary = sync.run_pass(job, local, remote, mode, use_hash, delete)
+    job.emit("sync_pass", summary)
+    checks = 0
+    while watch and not job.cancelled.wait(SYNC_WATCH_INTERVAL):
+        checks += 1
+        if checks % SYNC_FULL_RESCAN and not local_dirs_changed(sync.local_root, dir_mtimes):
+            continue
+        dir_mtimes = {}
+        local = local_snapshot(sync.local_root, dir_mtimes)
+        if local == sync.local:
+            continue
+        summary = sync.run_pass(
+            job, local, dict(sync.remote), "push" if mode == "push" else "both", False, delete,
+        )
+        job.emit("sync_pass", summary)
 
-    out, _ = run_ssh_command(cmd)
-    if out and ("error" in out.lower() or "not found" in out.lower()):
-        return jsonify({"error": out}), 400
-    return jsonify({"status": "ok", "output": out})
 
+@socketio.on("sync_start")
+def handle_sync_start(data):
+    """Sync a local folder with a remote one as a background job.
 
-@app.route("/api/packages/uninstall", methods=["POST"])
-def packages_uninstall():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
+    mode "both" (the default) carries changes and deletions each way;
+    "push" and "pull" copy one way and delete extras only with "delete".
+    "hash" compares same-size files by sha256 instead of trusting mtimes.
+    With "watch" the job keeps pushing local changes until job_cancel.
+    Progress comes as sync_progress events and a sync_pass summary per pass.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    local_root = os.path.abspath(os.path.expanduser(data.get("local", "")))
+    remote_root = posixpath.normpath(data.get("remote", ""))
+    mode = data.get("mode", "both")
+    if not data.get("local") or not data.get("remote"):
+        return {"error": "local and remote are required"}
+    if not os.path.isdir(local_root):
+        return {"error": f"Not a local folder: {local_root}"}
+    if mode not in SYNC_MODES:
+        return {"error": f"Unknown mode: {mode}"}
+    if mode == "pull" and data.get("watch"):
+        return {"error": "watch needs mode both or push"}
+
+    with connections_lock:
+        sync = conn["syncs"].get((local_root, remote_root))
+        if not sync:
+            sync = conn["syncs"][(local_root, remote_root)] = FolderSync(conn, local_root, remote_root)
+        if sync.job:
+            sync.job.cancel()
+        sync.job = start_job(
+            "sync", conn, request.sid, run_sync, sync, mode,
+            bool(data.get("hash")), bool(data.get("delete")), bool(data.get("watch")),
+            job_id=data.get("job_id"),
+        )
+    return {"job_id": sync.job.id, "local": local_root, "remote": remote_root}
 
-    data = request.json
-    package = data.get("package", "").strip()
-    venv_path = data.get("venv_path")
 
-    if not package:
-        return jsonify({"error": "Package name is required"}), 400
+# ── Host-to-Host Transfer ──────────────────────────────────────────
 
-    pkg_quoted = shlex.quote(package)
-    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+# Chunks read from the source but not yet written to the destination;
+# bounds the relay's memory while reads and writes overlap.
+RELAY_QUEUE_CHUNKS = 64
+# Seconds the source host may take to reach the destination before a
+# direct transfer gives up and the relay takes over
+DIRECT_CONNECT_TIMEOUT = 10
+LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "::1")
+# A line of rsync --info=progress2: "  1,234,567  12%  3.45MB/s  0:00:10"
+RSYNC_PROGRESS = re.compile(r"([\d,]+)\s+(\d+)%")
 
-    if venv_path:
-        venv_quoted = shlex.quote(venv_path)
-        if has_uv:
-            cmd = f"VIRTUAL_ENV={venv_quoted} uv pip uninstall {pkg_quoted} 2>&1"
-        else:
-            cmd = f"{venv_quoted}/bin/pip uninstall -y {pkg_quoted} 2>&1"
-    else:
-        if has_uv:
-            cmd = f"uv pip uninstall {pkg_quoted} 2>&1"
-        else:
-            cmd = f"pip uninstall -y {pkg_quoted} 2>&1 || pip3 uninstall -y {pkg_quoted} 2>&1"
 
-    out, _ = run_ssh_command(cmd)
-    return jsonify({"status": "ok", "output": out})
+def relay(job, chunks, write, on_progress):
+    """Write chunks as a second thread produces them, at most
+    RELAY_QUEUE_CHUNKS ahead, so the source and destination round trips
+    overlap. Returns the bytes written."""
+    pending = queue.Queue(maxsize=RELAY_QUEUE_CHUNKS)
+    stop = threading.Event()
+    failure = []
 
+    def produce():
+        try:
+            for chunk in chunks:
+                while not stop.is_set():
+                    try:
+                        pending.put(chunk, timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+        except Exception as e:
+            failure.append(e)
+        finally:
+            pending.put(None)
 
-@app.route("/api/packages/create-venv", methods=["POST"])
-def packages_create_venv():
-    if not ssh_state["client"]:
-        return jsonify({"error": "Not connected"}), 400
+    reader = threading.Thread(target=produce, daemon=True)
+    reader.start()
+    sent = 0
+    try:
+        while not job.cancelled.is_set():
+            chunk = pending.get()
+            if chunk is None:
+                break
+            write(chunk)
+            sent += len(chunk)
+            on_progress(sent)
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while reader.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    if failure:
+        raise failure[0]
+    return sent
+
+
+def channel_chunks(channel):
+    """Yield a channel's stdout until EOF."""
+    while True:
+        data = channel.recv(1 << 16)
+        if not data:
+            return
+        yield data
+
+
+def channel_error(channel, default):
+    """The first stderr line of a finished command, or default."""
+    err = channel.makefile_stderr("rb").read().decode("utf-8", errors="replace").strip()
+    return err.splitlines()[0] if err else default
+
+
+def relay_file(job, src, path, dst, target, st, on_progress):
+    """Copy one file between connections with pipelined SFTP on both ends."""
+    with sftp_session(src) as ssftp, sftp_session(dst) as dsftp:
+        with ssftp.open(path, "rb") as rf, dsftp.open(target, "wb") as wf:
+            wf.set_pipelined(True)
+            sent = relay(job, stream_remote_file(rf, 0, st.st_size), wf.write, on_progress)
+        if job.cancelled.is_set():
+            dsftp.remove(target)
+            return
+        if sent != st.st_size or dsftp.stat(target).st_size != st.st_size:
+            raise IOError(f"size mismatch writing {target}")
+        dsftp.chmod(target, stat.S_IMODE(st.st_mode))
+        dsftp.utime(target, (st.st_atime, st.st_mtime))
+
+
+def relay_tree(job, src, path, dst, dest_dir, on_progress):
+    """Copy a folder between connections as one tar stream.
+
+    On cancel, a folder the copy created is removed again; one that was
+    already there (the copy merging into it) is left as it is.
+    """
+    parent, name = posixpath.split(path.rstrip("/"))
+    target = shlex.quote(posixpath.join(dest_dir, name))
+    reader = src["client"].get_transport().open_session()
+    writer = dst["client"].get_transport().open_session()
+    job.attach(reader)
+    job.attach(writer)
+    try:
+        reader.exec_command(f"tar -cf - -C {shlex.quote(parent or '/')} -- {shlex.quote(name)}")
+        # The first line names the pid tar will run as, and whether the
+        # folder was already there
+        writer.exec_command(
+            f"test -e {target} && echo $$ merge || echo $$; "
+            f"exec tar -xf - --no-same-owner -C {shlex.quote(dest_dir)}"
+        )
+        line = b""
+        while not line.endswith(b"\n"):
+            data = writer.recv(64)
+            if not data:
+                break
+            line += data
+        started = line.split()
+        try:
+            relay(job, channel_chunks(reader), writer.sendall, on_progress)
+        except OSError:
+            # A tar that quit early (e.g. missing dest_dir) closes the channel
+            if job.cancelled.is_set():
+                pass
+            elif writer.exit_status_ready():
+                raise IOError(channel_error(writer, f"tar failed writing {dest_dir}"))
+            else:
+                raise
+        if job.cancelled.is_set():
+            if len(started) == 1:
+                remove_partial_tree(dst, started[0].decode(), target)
+            return
+        writer.shutdown_write()
+        if reader.recv_exit_status() != 0:
+            raise IOError(channel_error(reader, f"tar failed reading {path}"))
+        if writer.recv_exit_status() != 0:
+            raise IOError(channel_error(writer, f"tar failed writing {dest_dir}"))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def remove_partial_tree(conn, pid, target):
+    """Stop a cancelled tar extraction, then delete what it wrote."""
+    pid = shlex.quote(pid)
+    _, stdout, _ = conn["client"].exec_command(
+        f"kill {pid} 2>/dev/null; while kill -0 {pid} 2>/dev/null; do sleep 0.1; done; "
+        f"rm -rf -- {target}"
+    )
+    stdout.channel.recv_exit_status()
+
+
+def direct_transfer(job, src, path, dst, dest_dir, on_progress):
+    """Have the source host send straight to the destination with rsync,
+    or scp when rsync is missing, so no data passes through here.
+
+    Logins are non-interactive: the source must already be able to reach
+    the destination with its own keys or agent. Returns the tool used, or
+    None when that failed and the relay should be used instead.
+    """
+    username, hostname, port = dst["login"]
+    if dst["jump_chain"] or hostname in LOOPBACK_HOSTS:
+        return None
+    options = f"-o BatchMode=yes -o ConnectTimeout={DIRECT_CONNECT_TIMEOUT}"
+    target = f"{username}@{hostname}:{dest_dir.rstrip('/')}/"
+    src_q, target_q = shlex.quote(path.rstrip("/")), shlex.quote(target)
+    ssh = shlex.quote(f"ssh {options} -p {port}")
+    channel = src["client"].get_transport().open_session()
+    job.attach(channel)
+    try:
+        channel.exec_command(
+            "if command -v rsync >/dev/null 2>&1; then echo rsync; "
+            f"exec rsync -a -s --info=progress2 -e {ssh} -- {src_q} {target_q}; fi; "
+            f"echo scp; exec scp -rp {options} -P {port} -- {src_q} {target_q}"
+        )
+        tool, buf = None, b""
+        for data in channel_chunks(channel):
+            buf += data
+            *records, buf = re.split(rb"[\r\n]", buf)
+            for record in records:
+                text = record.decode("utf-8", errors="replace").strip()
+                if tool is None:
+                    tool = text
+                    continue
+                m = RSYNC_PROGRESS.match(text)
+                if m:
+                    on_progress(int(m.group(1).replace(",", "")), tool)
+        if job.cancelled.is_set():
+            return tool
+        return tool if channel.recv_exit_status() == 0 else None
+    finally:
+        channel.close()
+
+
+def run_transfer(job, dst, path, dest_dir, direct):
+    src = job.conn
+    with sftp_session(src) as sftp:
+        st = sftp.stat(path)
+    is_dir = stat.S_ISDIR(st.st_mode)
+    progress = {
+        "path": path, "dest_dir": dest_dir, "sent": 0,
+        "size": None if is_dir else st.st_size, "method": "relay",
+    }
+    last_emit = [0]
+
+    def on_progress(sent, method="relay"):
+        progress["sent"], progress["method"] = sent, method
+        now = time.monotonic()
+        if now - last_emit[0] >= UPLOAD_PROGRESS_INTERVAL:
+            last_emit[0] = now
+            job.emit("transfer_progress", progress)
+
+    job.emit("transfer_progress", progress)
+    method = direct and direct_transfer(job, src, path, dst, dest_dir, on_progress)
+    if not method and not job.cancelled.is_set():
+        if is_dir:
+            relay_tree(job, src, path, dst, dest_dir, on_progress)
+        else:
+            target = posixpath.join(dest_dir, posixpath.basename(path))
+            relay_file(job, src, path, dst, target, st, on_progress)
+    dst["listing_cache"].invalidate(dest_dir)
+    if not job.cancelled.is_set():
+        job.emit("transfer_progress", dict(progress, method=method or "relay", done=True))
+
+
+@socketio.on("transfer_start")
+def handle_transfer_start(data):
+    """Copy a file or folder from one connection into a folder on another.
+
+    Bytes are relayed through this server with pipelined reads and writes.
+    With "direct", the source host first tries rsync/scp straight to the
+    destination. Progress comes as transfer_progress events, then job_done.
+    """
+    src = resolve_connection(data.get("source_connection_id"))
+    dst = resolve_connection(data.get("dest_connection_id"))
+    if not src or not src["client"] or not dst or not dst["client"]:
+        return {"error": "Not connected"}
+    path = data.get("path", "")
+    dest_dir = data.get("dest_dir", "")
+    if not path or not dest_dir:
+        return {"error": "path and dest_dir are required"}
+    if src is dst:
+        return {"error": "Source and destination are the same connection"}
+    job = start_job(
+        "transfer", src, request.sid, run_transfer, dst,
+        posixpath.normpath(path), posixpath.normpath(dest_dir), bool(data.get("direct")),
+        job_id=data.get("job_id"),
+    )
+    return {"job_id": job.id}
+
+
+# ── Server-Side Copy ───────────────────────────────────────────────
+
+# Bytes per SFTP copy-data request, so a big copy reports progress and
+# can be cancelled between requests
+COPY_DATA_CHUNK = 64 * 1024 * 1024
+
+
+def free_copy_name(names, basename, is_dir, keep=False):
+    """A name for a copy of basename that isn't one of names.
+
+    With keep, basename itself when it is free; otherwise "name copy.ext",
+    then "name copy 2.ext" and so on, as Finder names duplicates.
+    """
+    if keep and basename not in names:
+        return basename
+    name, ext = (basename, "") if is_dir else posixpath.splitext(basename)
+    candidate = f"{name} copy{ext}"
+    counter = 2
+    while candidate in names:
+        candidate = f"{name} copy {counter}{ext}"
+        counter += 1
+    return candidate
+
+
+def copy_data(job, sftp, path, dest, st, on_progress):
+    """Copy a file within the server with the SFTP copy-data extension
+    (OpenSSH 9.0+), so no data crosses the network.
+
+    Returns False when the server doesn't support it; that is remembered
+    for the connection.
+    """
+    conn = job.conn
+    if conn["copy_data"] is False:
+        return False
+    done = 0
+    with sftp.open(path, "rb") as rf, sftp.open(dest, "wb") as wf:
+        while done < st.st_size and not job.cancelled.is_set():
+            n = min(COPY_DATA_CHUNK, st.st_size - done)
+            try:
+                sftp._request(
+                    CMD_EXTENDED, "copy-data",
+                    rf.handle, int64(done), int64(n), wf.handle, int64(done),
+                )
+            except IOError as e:
+                if done or e.errno is not None:
+                    raise
+                if "unsupported" in str(e).lower():
+                    conn["copy_data"] = False
+                break
+            conn["copy_data"] = True
+            done += n
+            on_progress(done)
+    if done < st.st_size and not job.cancelled.is_set():
+        sftp.remove(dest)
+        return False
+    return True
+
+
+def copy_command(path, dest, is_dir):
+    """Shell copying path to dest with the best progress-reporting tool.
+
+    Prints its pid and the tool used, then progress: rsync's progress2
+    lines, or pv's percentages. Plain cp reports none.
+    """
+    src, dst = shlex.quote(path), shlex.quote(dest)
+    if is_dir:
+        rsync_src = shlex.quote(path.rstrip("/") + "/")
+        pv = (
+            f"mkdir -- {dst} && {{ tar -cf - -C {src} . | "
+            f"pv -n -s \"$(du -sk -- {src} | cut -f1)K\" | tar -xf - -C {dst}; }} 2>&1"
+        )
+    else:
+        rsync_src = src
+        pv = f"pv -n -- {src} 2>&1 >{dst}"
+    return (
+        "echo $$; "
+        "if command -v rsync >/dev/null 2>&1; then echo rsync; "
+        f"exec rsync -a --info=progress2 --no-inc-recursive -- {rsync_src} {dst} 2>&1; fi; "
+        f"if command -v pv >/dev/null 2>&1; then echo pv; {pv}; exit; fi; "
+        f"echo cp; exec cp -Rp -- {src} {dst} 2>&1"
+    )
 
-    data = request.json
-    path = data.get("path", "").strip()
 
+def run_copy_command(job, path, dest, is_dir, on_progress):
+    """Copy with copy_command; on cancel, kill it. Returns the tool used."""
+    client = job.conn["client"]
+    channel = client.get_transport().open_session()
+    job.attach(channel)
+    pid = tool = None
+    errors = []
+    try:
+        channel.exec_command(copy_command(path, dest, is_dir))
+        buf = b""
+        for data in channel_chunks(channel):
+            buf += data
+            *records, buf = re.split(rb"[\r\n]", buf)
+            for record in records:
+                text = record.decode("utf-8", errors="replace").strip()
+                if not text:
+                    continue
+                if pid is None:
+                    pid = text
+                    continue
+                if tool is None:
+                    tool = text
+                    continue
+                m = RSYNC_PROGRESS.match(text) if tool == "rsync" else None
+                if m:
+                    on_progress(int(m.group(1).replace(",", "")), int(m.group(2)), tool)
+                elif tool == "pv" and text.isdigit():
+                    on_progress(None, int(text), tool)
+                else:
+                    errors.append(text)
+        status = None if job.cancelled.is_set() else channel.recv_exit_status()
+    finally:
+        channel.close()
+    if job.cancelled.is_set():
+        # Closing the channel doesn't stop a copy that prints nothing
+        if pid and pid.isdigit():
+            _, stdout, _ = client.exec_command(f"pkill -P {pid}; kill {pid}")
+            stdout.channel.recv_exit_status()
+        return tool
+    if status != 0:
+        raise IOError(errors[0] if errors else f"{tool or 'copy'} failed")
+    return tool
+
+
+def run_copy(job, path, dest, st):
+    conn = job.conn
+    is_dir = stat.S_ISDIR(st.st_mode)
+    progress = {
+        "path": path, "dest": dest, "sent": 0,
+        "size": None if is_dir else st.st_size, "pct": 0, "method": None,
+    }
+    last_emit = [0]
+
+    def on_progress(sent, pct=None, method="copy-data"):
+        if sent is not None:
+            progress["sent"] = sent
+        if pct is None and progress["size"]:
+            pct = round(sent * 100 / progress["size"])
+        progress["pct"], progress["method"] = pct, method
+        now = time.monotonic()
+        if now - last_emit[0] >= UPLOAD_PROGRESS_INTERVAL:
+            last_emit[0] = now
+            job.emit("copy_progress", progress)
+
+    job.emit("copy_progress", progress)
+    method = None
+    try:
+        if not is_dir:
+            with sftp_session(conn) as sftp:
+                if copy_data(job, sftp, path, dest, st, on_progress):
+                    method = "copy-data"
+        if not method and not job.cancelled.is_set():
+            method = run_copy_command(job, path, dest, is_dir, on_progress)
+        if not is_dir and not job.cancelled.is_set():
+            # As cp -p would; copy-data and pv leave a fresh mode and mtime
+            with sftp_session(conn) as sftp:
+                sftp.chmod(dest, stat.S_IMODE(st.st_mode))
+                sftp.utime(dest, (st.st_atime, st.st_mtime))
+    finally:
+        if job.cancelled.is_set():
+            _, stdout, _ = conn["client"].exec_command(f"rm -rf -- {shlex.quote(dest)}")
+            stdout.channel.recv_exit_status()
+        conn["listing_cache"].invalidate(posixpath.dirname(dest))
+    if not job.cancelled.is_set():
+        job.emit("copy_progress", dict(progress, pct=100, method=method, done=True))
+
+
+def plan_copy(conn, path, dest_dir=None):
+    """Stat path and pick a free name for its copy, as (path, dest, st).
+
+    Raises ValueError with a message for the user.
+    """
+    path = posixpath.normpath(path)
+    parent, basename = posixpath.split(path)
+    dest_dir = posixpath.normpath(dest_dir or parent)
+    if dest_dir == path or dest_dir.startswith(path.rstrip("/") + "/"):
+        raise ValueError("Cannot copy a folder into itself")
+    try:
+        with sftp_session(conn) as sftp:
+            st = sftp.stat(path)
+            try:
+                names = set(sftp.listdir(dest_dir))
+            except FileNotFoundError:
+                raise ValueError(f"Not found: {dest_dir}")
+    except FileNotFoundError:
+        raise ValueError(f"Not found: {path}")
+    except PermissionError:
+        raise ValueError("Permission denied")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e))
+    name = free_copy_name(names, basename, stat.S_ISDIR(st.st_mode), keep=dest_dir != parent)
+    return path, posixpath.join(dest_dir, name), st
+
+
+@socketio.on("copy_start")
+def handle_copy_start(data):
+    """Copy a file or folder on the server as a background job.
+
+    With dest_dir (paste) the copy keeps its name there unless that is
+    taken; without, it is duplicated beside the original as "name copy".
+    Either way the free name comes from one listing of the target folder.
+    Progress comes as copy_progress events, then job_done; job_cancel
+    stops the copy and removes what it wrote.
+    """
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return {"error": "Not connected"}
+    path = data.get("path", "")
     if not path:
-        return jsonify({"error": "Path is required"}), 400
-
-    path_quoted = shlex.quote(path)
-    has_uv, _ = run_ssh_command("which uv 2>/dev/null")
+        return {"error": "path is required"}
+    try:
+        path, dest, st = plan_copy(conn, path, data.get("dest_dir"))
+    except ValueError as e:
+        return {"error": str(e)}
+    job = start_job(
+        "copy", conn, request.sid, run_copy, path, dest, st, job_id=data.get("job_id"),
+    )
+    return {"job_id": job.id, "new_path": dest}
+
+
+# ── Change Notifications ───────────────────────────────────────────
+
+# The fallback scanner polls this often right after a change and backs off
+# to WATCH_MAX_INTERVAL while the watched directories stay quiet.
+WATCH_MIN_INTERVAL = 0.5
+WATCH_MAX_INTERVAL = 10
+WATCH_EVENTS = "create,delete,move,attrib,close_write"
+
+
+class RemoteWatcher:
+    """Pushes change events for the directories open in the browser.
+
+    One per connection, shared by every socket viewing it. Runs
+    `inotifywait -m` on the remote when it is installed; otherwise stats
+    the watched directories in one batch on an interval that backs off
+    while nothing changes. `on_change(path, sids)` is called with the
+    sockets watching each changed directory.
+    """
+
+    def __init__(self, conn, on_change):
+        self.conn = conn
+        self.on_change = on_change
+        self.mode = "inotify"
+        self._subs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._channel = None
+        self._closed = False
+        self._thread = None
+
+    def watch(self, sid, paths):
+        """Replace the directories one socket is watching."""
+        with self._lock:
+            if paths:
+                self._subs[sid] = set(paths)
+            else:
+                self._subs.pop(sid, None)
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                return
+        self._restart()
+
+    def unwatch(self, sid):
+        self.watch(sid, [])
+
+    def paths(self):
+        with self._lock:
+            return sorted(set().union(*self._subs.values()))
+
+    def close(self):
+        self._closed = True
+        self._restart()
+
+    def _restart(self):
+        self._wake.set()
+        channel = self._channel
+        if channel:
+            try:
+                channel.close()
+            except Exception:
+                pass
 
-    if has_uv:
-        cmd = f"uv venv {path_quoted} 2>&1"
-    else:
-        cmd = f"python3 -m venv {path_quoted} 2>&1 || python -m venv {path_quoted} 2>&1"
+    def _notify(self, path):
+        cache = self.conn.get("listing_cache")
+        if cache:
+            cache.invalidate(path)
+        with self._lock:
+            sids = [sid for sid, paths in self._subs.items() if path in paths]
+        if sids:
+            self.on_change(path, sids)
+
+    def _run(self):
+        mtimes = {}
+        interval = WATCH_MIN_INTERVAL
+        # Paths that made inotifywait exit (deleted or renamed away); left
+        # out until the watch set changes
+        skip = set()
+        while not self._closed:
+            self._wake.clear()
+            paths = self.paths()
+            if not paths:
+                self._wake.wait()
+                skip.clear()
+                continue
+            if self.mode == "inotify":
+                live = [p for p in paths if p not in skip]
+                if not live:
+                    self._wake.wait()
+                    skip.clear()
+                    continue
+                result = self._follow_inotify(live)
+                if result == "missing":
+                    self.mode = "scan"
+                elif result == "restart":
+                    skip.clear()
+                    interval = WATCH_MIN_INTERVAL
+                else:
+                    gone = self._missing(live)
+                    for path in gone:
+                        self._notify(path)
+                    skip |= gone
+                    if not gone:
+                        # Exited for some other reason: retry, backing off
+                        self._wake.wait(interval)
+                        interval = min(interval * 2, WATCH_MAX_INTERVAL)
+                continue
+            changed = self._scan(paths, mtimes)
+            interval = WATCH_MIN_INTERVAL if changed else min(interval * 1.5, WATCH_MAX_INTERVAL)
+            self._wake.wait(interval)
+
+    def _follow_inotify(self, paths):
+        """Report inotify events until the watch set changes.
+
+        Returns "restart" when the watch set changed, "missing" when
+        inotifywait isn't installed (the watcher then falls back to
+        scanning for good), or "exited" when it quit on its own, e.g.
+        because a watched directory went away.
+        """
+        cmd = "exec inotifywait -m -q -e {} --format %w -- {}".format(
+            WATCH_EVENTS, " ".join(shlex.quote(p) for p in paths)
+        )
+        try:
+            channel = self.conn["client"].get_transport().open_session()
+            # A pty makes sshd hang up inotifywait when the channel closes;
+            # otherwise it would linger until its next event
+            channel.get_pty(width=1000)
+            channel.exec_command(cmd)
+        except Exception:
+            return "exited"
+        self._channel = channel
+        if self._wake.is_set():
+            channel.close()
+        channel.settimeout(0.1)
+        buf = b""
+        head = b""
+        pending = set()
+        while True:
+            try:
+                data = channel.recv(65536)
+            except TimeoutError:
+                data = None
+            if data:
+                head = (head + data)[:1024]
+                buf += data
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    path = line.decode("utf-8", errors="replace").rstrip("\r/") or "/"
+                    pending.add(path)
+                continue
+            # Quiet for a moment (or closed): report what has accumulated
+            for path in pending:
+                self._notify(path)
+            pending.clear()
+            if data is None:
+                continue
+            self._channel = None
+            if self._wake.is_set():
+                channel.close()
+                return "restart"
+            # The exit status can trail the EOF slightly
+            channel.status_event.wait(1)
+            status = channel.exit_status
+            channel.close()
+            if status == 127 or b"not found" in head:
+                return "missing"
+            return "exited"
+
+    def _missing(self, paths):
+        """The watched directories that no longer exist."""
+        try:
+            with sftp_session(self.conn) as sftp:
+                stats = batch_stat(sftp, paths)
+        except Exception:
+            return set()
+        return {path for path, s in zip(paths, stats) if s is None}
 
-    out, _ = run_ssh_command(cmd)
-    if out and "error" in out.lower():
-        return jsonify({"error": out}), 400
-    return jsonify({"status": "ok", "output": out})
+    def _scan(self, paths, mtimes):
+        try:
+            with sftp_session(self.conn) as sftp:
+                stats = batch_stat(sftp, paths)
+        except Exception:
+            return False
+        changed = False
+        for path, s in zip(paths, stats):
+            mtime = s.st_mtime if s else None
+            if path in mtimes and mtimes[path] != mtime:
+                self._notify(path)
+                changed = True
+            mtimes[path] = mtime
+        for path in set(mtimes) - set(paths):
+            del mtimes[path]
+        return changed
+
+
+def notify_dir_changed(path, sids):
+    for sid in sids:
+        socketio.emit("dir_changed", {"path": path}, to=sid)
+
+
+@socketio.on("watch_dirs")
+def handle_watch_dirs(data):
+    """Set the directories this socket gets dir_changed events for."""
+    conn = resolve_connection(data.get("connection_id"))
+    if not conn or not conn["client"]:
+        return
+    with connections_lock:
+        watcher = conn.get("watcher")
+        if not watcher:
+            watcher = conn["watcher"] = RemoteWatcher(conn, notify_dir_changed)
+    paths = [posixpath.normpath(p) for p in data.get("paths", []) if p]
+    watcher.watch(request.sid, paths)
 
 
 # ── Terminal WebSocket ──────────────────────────────────────────────
@@ -1477,18 +5726,24 @@ def handle_connect():
 
 @socketio.on("disconnect")
 def handle_disconnect():
-    pass
+    terminals.pop(request.sid, None)
+    search_jobs.pop(request.sid, None)
+    grep_jobs.pop(request.sid, None)
+    cancel_jobs(sid=request.sid)
+    for conn in list(connections.values()):
+        if conn.get("watcher"):
+            conn["watcher"].unwatch(request.sid)
 
 
 @socketio.on("terminal_start")
 def handle_terminal_start(data):
-    conn_id = data.get("connection_id")
-    conn = connections.get(conn_id) if conn_id else (list(connections.values())[-1] if connections else None)
+    conn = resolve_connection(data.get("connection_id"))
     if not conn or not conn["client"]:
         emit("terminal_output", {"data": "\r\nNot connected to SSH server.\r\n"})
         return
 
     sid = request.sid
+    terminals[sid] = conn
 
     try:
         channel = conn["client"].invoke_shell(
@@ -1529,8 +5784,7 @@ def handle_terminal_start(data):
 @socketio.on("terminal_switch")
 def handle_terminal_switch(data):
     """Switch terminal between plain shell and tmux session."""
-    conn_id = data.get("connection_id")
-    conn = connections.get(conn_id) if conn_id else (list(connections.values())[-1] if connections else None)
+    conn = resolve_connection(data.get("connection_id"))
     if not conn or not conn["client"]:
         return
 
@@ -1543,6 +5797,7 @@ def handle_terminal_switch(data):
             pass
 
     sid = request.sid
+    terminals[sid] = conn
     tmux_session = data.get("tmux_session")
     tmux_window = data.get("tmux_window")
 
@@ -1595,7 +5850,7 @@ def handle_terminal_switch(data):
 
 @socketio.on("terminal_input")
 def handle_terminal_input(data):
-    channel = ssh_state.get("channel")
+    channel = terminals.get(request.sid, {}).get("channel")
     if channel and not channel.closed:
         try:
             channel.send(data["data"])
@@ -1605,7 +5860,7 @@ def handle_terminal_input(data):
 
 @socketio.on("terminal_resize")
 def handle_terminal_resize(data):
-    channel = ssh_state.get("channel")
+    channel = terminals.get(request.sid, {}).get("channel")
     if channel and not channel.closed:
         try:
             channel.resize_pty(
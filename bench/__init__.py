@@ -0,0 +1,10 @@
+"""Benchmarks for the file API, run against a local stand-in SSH server.
+
+Run them from the repository root, e.g.
+
+    python -m bench.pool
+
+Each script starts its own server (see bench.server) on a free port and
+talks to the app through Flask's test client, so nothing else needs to be
+running. Most take --rtt to simulate a slower link.
+"""
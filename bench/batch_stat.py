@@ -0,0 +1,64 @@
+"""Stat-ing the targets of a folder of symlinks, one request at a time vs. batch_stat.
+
+    python -m bench.batch_stat [--links N] [--rtt MS]
+
+Also times a full /api/ls of that folder, which resolves every symlink
+with one batch. The remote helper is turned off so listings go over SFTP.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import app
+from bench.server import BenchServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--rtt", type=float, default=20, help="simulated round trip in ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir, BenchServer(rtt=args.rtt / 1000) as server:
+        targets = os.path.join(workdir, "targets")
+        links = os.path.join(workdir, "links")
+        os.mkdir(targets)
+        os.mkdir(links)
+        # Half the links point at folders, which the listing must report
+        for i in range(args.links):
+            target = os.path.join(targets, f"t{i:05}")
+            if i % 2:
+                os.mkdir(target)
+            else:
+                open(target, "w").close()
+            os.symlink(f"../targets/t{i:05}", os.path.join(links, f"l{i:05}"))
+        paths = [os.path.join(links, f"l{i:05}") for i in range(args.links)]
+
+        client = app.app.test_client()
+        conn_id = server.connect(client, helper=False)
+        conn = app.resolve_connection(conn_id)
+        print(f"{args.links} symlinks, {args.rtt:g} ms RTT")
+        with app.sftp_session(conn) as sftp:
+            start = time.perf_counter()
+            one_by_one = [sftp.stat(p) for p in paths]
+            sequential = time.perf_counter() - start
+            start = time.perf_counter()
+            batched = app.batch_stat(sftp, paths)
+            batch = time.perf_counter() - start
+        if [s.st_mode for s in one_by_one] != [s.st_mode for s in batched]:
+            raise SystemExit("batch_stat results differ from one-by-one stats")
+        print(f"  one at a time  {sequential * 1000:8.1f} ms")
+        print(f"  batch_stat     {batch * 1000:8.1f} ms  ({sequential / batch:.0f}x faster)")
+
+        conn["listing_cache"].invalidate(links)
+        start = time.perf_counter()
+        resp = client.post("/api/ls", json={"path": links}, headers={"X-Connection-Id": conn_id})
+        listing = time.perf_counter() - start
+        dirs = sum(e["is_dir"] for e in resp.get_json()["entries"])
+        print(f"  /api/ls        {listing * 1000:8.1f} ms  ({dirs} links resolved to folders)")
+        client.post("/api/disconnect", headers={"X-Connection-Id": conn_id})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Interleaved /api/ls calls across several connections, checking none cross over.
+
+    python -m bench.connections [--hosts N] [--threads N] [--calls N] [--rtt MS]
+
+Every stand-in server shows its own tree at the same path, with a marker
+file naming the server, so a listing answered over the wrong connection
+is caught. Runs the same calls from one thread and then from many, and
+exits with status 1 if any listing came from the wrong host.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+import app
+from bench.server import BenchServer
+
+
+def run_calls(conn_ids, threads, calls):
+    """Spread `calls` listings over `threads` threads; returns (seconds, crossovers)."""
+    crossovers = []
+    per_thread = calls // threads
+
+    def worker(seed):
+        client = app.app.test_client()
+        pick = random.Random(seed)
+        for _ in range(per_thread):
+            host = pick.randrange(len(conn_ids))
+            conn_id = conn_ids[host]
+            app.resolve_connection(conn_id)["listing_cache"].invalidate("/data")
+            resp = client.post("/api/ls", json={"path": "/data"}, headers={"X-Connection-Id": conn_id})
+            names = {e["name"] for e in resp.get_json().get("entries", [])}
+            if f"host-{host}" not in names:
+                crossovers.append((host, sorted(n for n in names if n.startswith("host-"))))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - start, crossovers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--rtt", type=float, default=10, help="simulated round trip in ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir, ExitStack() as stack:
+        client = app.app.test_client()
+        conn_ids = []
+        for host in range(args.hosts):
+            root = os.path.join(workdir, f"root{host}")
+            os.makedirs(os.path.join(root, "data"))
+            for name in [f"host-{host}"] + [f"file{i:03}" for i in range(50)]:
+                open(os.path.join(root, "data", name), "w").close()
+            server = stack.enter_context(BenchServer(root=root, rtt=args.rtt / 1000))
+            conn_ids.append(server.connect(client, helper=False))
+
+        print(f"{args.hosts} hosts, {args.calls} listings, {args.rtt:g} ms RTT")
+        failed = False
+        for threads in (1, args.threads):
+            seconds, crossovers = run_calls(conn_ids, threads, args.calls)
+            done = args.calls // threads * threads
+            print(
+                f"  {threads:3} thread(s): {done / seconds:7.1f} listings/s, "
+                f"{len(crossovers)} from the wrong host"
+            )
+            for host, markers in crossovers[:5]:
+                print(f"    asked host {host}, got {markers}")
+            failed = failed or bool(crossovers)
+        for conn_id in conn_ids:
+            client.post("/api/disconnect", headers={"X-Connection-Id": conn_id})
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
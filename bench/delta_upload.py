@@ -0,0 +1,122 @@
+"""Check that re-uploading a large file in chunks sends only what changed.
+
+    python -m bench.delta_upload [--file-mb N] [--changes N] [--rtt MS]
+
+Uploads a file through /api/upload/init, /chunk and /commit, changes a
+few scattered bytes and appends a tail, then uploads it again the way the
+browser does: comparing each block's sha256 with the remote's and sending
+only the blocks that differ. Exits with status 1 if more than those
+blocks were sent or the remote file doesn't match.
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import app
+from bench.server import BenchServer
+
+
+def chunked_upload(client, headers, path, data, delta):
+    """Upload `data` like the browser's chunked uploader; returns bytes sent."""
+    init = client.post(
+        "/api/upload/init", json={"path": path, "size": len(data), "delta": delta}, headers=headers
+    ).get_json()
+    chunk_size = init["chunk_size"]
+    runs = []
+    if init.get("delta"):
+        block, hashes = init["delta"]["block"], init["delta"]["hashes"]
+        run = None
+        for offset in range(0, len(data), block):
+            index = offset // block
+            same = (
+                index < len(hashes)
+                and hashlib.sha256(data[offset:offset + block]).hexdigest() == hashes[index]
+            )
+            if same or (run is not None and offset - run >= chunk_size):
+                if run is not None:
+                    runs.append((run, offset))
+                run = None
+            if not same and run is None:
+                run = offset
+        if run is not None:
+            runs.append((run, len(data)))
+    else:
+        runs = [
+            (start, min(start + chunk_size, len(data)))
+            for start in range(init["offset"], len(data), chunk_size)
+        ]
+    sent = 0
+    for start, end in runs:
+        resp = client.post(
+            f"/api/upload/chunk?upload_id={init['upload_id']}&offset={start}",
+            data=data[start:end], headers=headers,
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(resp.get_json())
+        sent += end - start
+    resp = client.post(
+        "/api/upload/commit",
+        json={"upload_id": init["upload_id"], "sha256": hashlib.sha256(data).hexdigest()},
+        headers=headers,
+    )
+    if resp.status_code != 200:
+        raise RuntimeError(resp.get_json())
+    return sent, bool(init.get("delta"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file-mb", type=int, default=96)
+    parser.add_argument("--changes", type=int, default=5, help="scattered bytes to change")
+    parser.add_argument("--append-kb", type=int, default=100)
+    parser.add_argument("--rtt", type=float, default=20, help="simulated round trip in ms")
+    args = parser.parse_args()
+
+    original = os.urandom(args.file_mb * 1024 * 1024)
+    edited = bytearray(original)
+    for offset in random.sample(range(len(edited)), args.changes):
+        edited[offset] ^= 0xFF
+    edited = bytes(edited) + os.urandom(args.append_kb * 1024)
+
+    with tempfile.TemporaryDirectory() as workdir, BenchServer(rtt=args.rtt / 1000) as server:
+        client = app.app.test_client()
+        conn_id = server.connect(client)
+        headers = {"X-Connection-Id": conn_id}
+        path = os.path.join(workdir, "large.bin")
+        print(f"{args.file_mb} MB file, {args.changes} bytes changed, "
+              f"{args.append_kb} KB appended, {args.rtt:g} ms RTT")
+
+        start = time.perf_counter()
+        sent, _ = chunked_upload(client, headers, path, original, delta=True)
+        print(f"  first upload   {sent / 2**20:8.2f} MB sent  {time.perf_counter() - start:6.1f} s")
+
+        start = time.perf_counter()
+        sent, used_delta = chunked_upload(client, headers, path, edited, delta=True)
+        elapsed = time.perf_counter() - start
+        print(f"  re-upload      {sent / 2**20:8.2f} MB sent  {elapsed:6.1f} s")
+        client.post("/api/disconnect", headers=headers)
+
+        block = app.delta_block_size(len(original))
+        # Each change dirties one block; the old short last block is resent
+        # along with the appended tail
+        limit = args.changes * block + args.append_kb * 1024 + block
+        with open(path, "rb") as f:
+            matches = f.read() == edited
+    failures = []
+    if not used_delta:
+        failures.append("the re-upload did not use delta mode")
+    if sent > limit:
+        failures.append(f"sent {sent} bytes, more than the {limit} that changed")
+    if not matches:
+        failures.append("the remote file does not match the upload")
+    for failure in failures:
+        print(f"  FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
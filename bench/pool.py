@@ -0,0 +1,76 @@
+"""/api/ls latency while an /api/upload runs, with and without the SFTP pool.
+
+    python -m bench.pool [--rtt MS] [--upload-mb N] [--entries N]
+
+"unpooled" caps the connection at one SFTP channel, as when every request
+shared a single session, so a listing waits for the upload to finish.
+The remote helper is turned off so listings go over SFTP.
+"""
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import app
+from bench.server import BenchServer
+
+
+def listings_during_upload(server, workdir, pool_size, payload):
+    """Time /api/ls calls for as long as one upload is in flight."""
+    client = app.app.test_client()
+    conn_id = server.connect(client, helper=False)
+    headers = {"X-Connection-Id": conn_id}
+    conn = app.resolve_connection(conn_id)
+    conn["sftp_pool"].size = pool_size
+    listing = os.path.join(workdir, "listing")
+
+    def upload():
+        form = {"dest_dir": workdir, "files": (io.BytesIO(payload), "upload.bin")}
+        app.app.test_client().post("/api/upload", data=form, headers=headers)
+
+    uploader = threading.Thread(target=upload)
+    started = time.perf_counter()
+    uploader.start()
+    # Give the upload time to check out its channel
+    time.sleep(0.2)
+    times = []
+    while uploader.is_alive():
+        conn["listing_cache"].invalidate(listing)
+        start = time.perf_counter()
+        resp = client.post("/api/ls", json={"path": listing}, headers=headers)
+        times.append(time.perf_counter() - start)
+        if resp.status_code != 200:
+            raise RuntimeError(resp.get_json())
+    uploader.join()
+    upload_time = time.perf_counter() - started
+    client.post("/api/disconnect", headers=headers)
+    return times, upload_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt", type=float, default=20, help="simulated round trip in ms")
+    parser.add_argument("--upload-mb", type=int, default=64)
+    parser.add_argument("--entries", type=int, default=200, help="files in the listed folder")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.upload_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as workdir, BenchServer(rtt=args.rtt / 1000) as server:
+        os.mkdir(os.path.join(workdir, "listing"))
+        for i in range(args.entries):
+            open(os.path.join(workdir, "listing", f"file{i:05}"), "w").close()
+        print(f"{args.upload_mb} MB upload, {args.entries}-entry listing, {args.rtt:g} ms RTT")
+        for label, pool_size in (("unpooled", 1), ("pooled", app.SFTP_POOL_SIZE)):
+            times, upload_time = listings_during_upload(server, workdir, pool_size, payload)
+            ms = [t * 1000 for t in times]
+            print(
+                f"  {label:<9} {len(ms):4} listings during a {upload_time:.1f} s upload: "
+                f"median {statistics.median(ms):7.1f} ms, max {max(ms):7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
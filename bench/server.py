@@ -0,0 +1,312 @@
+"""A local stand-in SSH server for the benchmarks.
+
+Serves SFTP over the local filesystem, and runs exec requests through
+bash, on a free port of 127.0.0.1. Any username and password are accepted.
+With rtt, clients reach it through a proxy that holds every packet back
+for half the round trip in each direction; with root, SFTP paths are
+resolved under that directory (as if chrooted) and exec is refused, so
+several servers can show different trees at the same paths.
+"""
+import functools
+import os
+import posixpath
+import queue
+import socket
+import subprocess
+import threading
+import time
+
+import paramiko
+from paramiko import SFTP_OK, SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface
+
+
+@functools.lru_cache(maxsize=None)
+def host_key():
+    return paramiko.RSAKey.generate(2048)
+
+
+def _status(fn, *args):
+    try:
+        fn(*args)
+    except OSError as e:
+        return SFTPServer.convert_errno(e.errno)
+    return SFTP_OK
+
+
+def _attrs(fn, path):
+    try:
+        return SFTPAttributes.from_stat(fn(path))
+    except OSError as e:
+        return SFTPServer.convert_errno(e.errno)
+
+
+class _Handle(SFTPHandle):
+    def stat(self):
+        return _attrs(os.fstat, self.readfile.fileno())
+
+    def chattr(self, attr):
+        return SFTP_OK
+
+
+class _LocalSFTP(SFTPServerInterface):
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = server.root
+
+    def _local(self, path):
+        if self.root is None:
+            return path if path.startswith("/") else os.path.join(os.path.expanduser("~"), path)
+        return os.path.join(self.root, posixpath.normpath("/" + path).lstrip("/"))
+
+    def canonicalize(self, path):
+        if self.root is None:
+            return os.path.normpath(self._local(path))
+        return posixpath.normpath("/" + path)
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            out = []
+            for name in os.listdir(local):
+                attr = SFTPAttributes.from_stat(os.lstat(os.path.join(local, name)))
+                attr.filename = name
+                out.append(attr)
+            return out
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        return _attrs(os.stat, self._local(path))
+
+    def lstat(self, path):
+        return _attrs(os.lstat, self._local(path))
+
+    def open(self, path, flags, attr):
+        mode = attr.st_mode if attr is not None and attr.st_mode is not None else 0o644
+        try:
+            fd = os.open(self._local(path), flags, mode & 0o7777)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            fmode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            fmode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            fmode = "rb"
+        handle = _Handle(flags)
+        handle.readfile = handle.writefile = os.fdopen(fd, fmode)
+        return handle
+
+    def remove(self, path):
+        return _status(os.remove, self._local(path))
+
+    def rename(self, oldpath, newpath):
+        return _status(os.rename, self._local(oldpath), self._local(newpath))
+
+    def posix_rename(self, oldpath, newpath):
+        return self.rename(oldpath, newpath)
+
+    def mkdir(self, path, attr):
+        return _status(os.mkdir, self._local(path))
+
+    def rmdir(self, path):
+        return _status(os.rmdir, self._local(path))
+
+    def chattr(self, path, attr):
+        local = self._local(path)
+
+        def apply():
+            if attr._flags & attr.FLAG_PERMISSIONS:
+                os.chmod(local, attr.st_mode)
+            if attr._flags & attr.FLAG_AMTIME:
+                os.utime(local, (attr.st_atime, attr.st_mtime))
+            if attr._flags & attr.FLAG_SIZE:
+                os.truncate(local, attr.st_size)
+
+        return _status(apply)
+
+    def readlink(self, path):
+        try:
+            return os.readlink(self._local(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def symlink(self, target_path, path):
+        return _status(os.symlink, target_path, self._local(path))
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, bench):
+        self.root = bench.root
+        self.exec_commands = bench.exec_commands
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_env_request(self, *args):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        if not self.exec_commands:
+            return False
+        threading.Thread(target=_run, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+def _run(channel, command):
+    proc = subprocess.Popen(
+        ["bash", "-c", command], cwd=os.path.expanduser("~"),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+
+    def feed():
+        try:
+            for data in iter(lambda: channel.recv(65536), b""):
+                proc.stdin.write(data)
+                proc.stdin.flush()
+        except (OSError, EOFError):
+            pass
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+
+    def errors():
+        for data in iter(lambda: proc.stderr.read1(65536), b""):
+            channel.sendall_stderr(data)
+
+    threading.Thread(target=feed, daemon=True).start()
+    stderr = threading.Thread(target=errors, daemon=True)
+    stderr.start()
+    try:
+        for data in iter(lambda: proc.stdout.read1(65536), b""):
+            channel.sendall(data)
+    except OSError:
+        proc.kill()
+    status = proc.wait()
+    stderr.join(5)
+    try:
+        channel.send_exit_status(status)
+        channel.shutdown_write()
+        channel.close()
+    except (OSError, EOFError):
+        pass
+
+
+class BenchServer:
+    """Context manager running one stand-in server; `port` is where to connect."""
+
+    def __init__(self, root=None, rtt=0.0, exec_commands=None):
+        self.root = root
+        self.rtt = rtt
+        self.exec_commands = root is None if exec_commands is None else exec_commands
+        self.port = None
+        self._sockets = []
+        self._transports = []
+
+    def __enter__(self):
+        self.port = self._listen(self._serve_ssh)
+        if self.rtt:
+            target = self.port
+            self.port = self._listen(lambda sock: self._serve_proxy(sock, target))
+        return self
+
+    def __exit__(self, *exc):
+        for transport in self._transports:
+            transport.close()
+        for sock in self._sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def connect(self, client, **options):
+        """Connect the app to this server through a Flask test client.
+
+        Returns the new connection's id; options are passed to /api/connect.
+        """
+        body = {
+            "hostname": "127.0.0.1", "port": self.port,
+            "username": "bench", "password": "bench", **options,
+        }
+        data = client.post("/api/connect", json=body).get_json()
+        if "connection_id" not in data:
+            raise RuntimeError(data.get("error", data))
+        return data["connection_id"]
+
+    def _listen(self, handler):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(64)
+        self._sockets.append(listener)
+
+        def accept():
+            while True:
+                try:
+                    sock, _ = listener.accept()
+                except OSError:
+                    return
+                self._sockets.append(sock)
+                threading.Thread(target=handler, args=(sock,), daemon=True).start()
+
+        threading.Thread(target=accept, daemon=True).start()
+        return listener.getsockname()[1]
+
+    def _serve_ssh(self, sock):
+        transport = paramiko.Transport(sock)
+        self._transports.append(transport)
+        transport.add_server_key(host_key())
+        transport.set_subsystem_handler("sftp", SFTPServer, _LocalSFTP)
+        transport.start_server(server=_Server(self))
+        # Channels are only weakly held by the transport until accepted
+        channels = []
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel:
+                channels = [c for c in channels if not c.closed] + [channel]
+
+    def _serve_proxy(self, sock, target):
+        upstream = socket.create_connection(("127.0.0.1", target))
+        self._sockets.append(upstream)
+        for src, dst in ((sock, upstream), (upstream, sock)):
+            src.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._forward, args=(src, dst), daemon=True).start()
+
+    def _forward(self, src, dst):
+        """Copy src to dst, delivering each read half an RTT later."""
+        pending = queue.Queue()
+
+        def deliver():
+            while True:
+                due, data = pending.get()
+                time.sleep(max(0.0, due - time.monotonic()))
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=deliver, daemon=True).start()
+        while True:
+            try:
+                data = src.recv(65536)
+            except OSError:
+                data = b""
+            pending.put((time.monotonic() + self.rtt / 2, data))
+            if not data:
+                return
@@ -0,0 +1,70 @@
+"""Upload throughput over a slow link: plain sequential writes vs. /api/upload.
+
+    python -m bench.upload [--files N] [--file-mb N] [--rtt MS]
+
+The baseline writes each file in 64 KB chunks, waiting for every write to
+be acknowledged, one file after another on a single SFTP channel.
+/api/upload pipelines its writes and sends several files at once over
+pooled channels.
+"""
+import argparse
+import filecmp
+import io
+import os
+import tempfile
+import time
+
+import app
+from bench.server import BenchServer
+
+BASELINE_CHUNK = 64 * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--file-mb", type=int, default=4)
+    parser.add_argument("--rtt", type=float, default=40, help="simulated round trip in ms")
+    args = parser.parse_args()
+
+    payloads = [os.urandom(args.file_mb * 1024 * 1024) for _ in range(args.files)]
+    total_mb = args.files * args.file_mb
+    with tempfile.TemporaryDirectory() as workdir, BenchServer(rtt=args.rtt / 1000) as server:
+        client = app.app.test_client()
+        conn_id = server.connect(client)
+        headers = {"X-Connection-Id": conn_id}
+        print(f"{args.files} x {args.file_mb} MB, {args.rtt:g} ms RTT")
+
+        baseline_dir = os.path.join(workdir, "baseline")
+        os.mkdir(baseline_dir)
+        start = time.perf_counter()
+        with app.sftp_session(app.resolve_connection(conn_id)) as sftp:
+            for i, payload in enumerate(payloads):
+                with sftp.open(os.path.join(baseline_dir, f"file{i}"), "wb") as f:
+                    for offset in range(0, len(payload), BASELINE_CHUNK):
+                        f.write(payload[offset:offset + BASELINE_CHUNK])
+        baseline = time.perf_counter() - start
+        print(f"  sequential 64 KB writes  {total_mb / baseline:7.1f} MB/s  ({baseline:.1f} s)")
+
+        upload_dir = os.path.join(workdir, "upload")
+        os.mkdir(upload_dir)
+        form = {
+            "dest_dir": upload_dir,
+            "files": [(io.BytesIO(p), f"file{i}") for i, p in enumerate(payloads)],
+        }
+        start = time.perf_counter()
+        resp = client.post("/api/upload", data=form, headers=headers)
+        upload = time.perf_counter() - start
+        if resp.status_code != 200:
+            raise SystemExit(resp.get_json())
+        print(f"  /api/upload              {total_mb / upload:7.1f} MB/s  ({upload:.1f} s)")
+
+        names = [f"file{i}" for i in range(args.files)]
+        _, mismatch, errors = filecmp.cmpfiles(baseline_dir, upload_dir, names, shallow=False)
+        if mismatch or errors:
+            raise SystemExit(f"uploaded files differ: {mismatch + errors}")
+        client.post("/api/disconnect", headers=headers)
+
+
+if __name__ == "__main__":
+    main()
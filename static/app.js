@@ -33,11 +33,25 @@ const state = {
   history: [],
   historyIndex: -1,
   historyPaused: false,
-  search: { active: false, query: "" },
+  search: {
+    active: false,
+    query: "",
+    deep: false,
+    contents: false,
+    jobId: null,
+    results: [],
+  },
   editing: { active: false, path: null, originalContent: null },
   quickLook: { active: false, path: null },
   undoStack: [],
   fileWatcher: null,
+  sizeJobs: new Map(), // column path -> running dir_sizes job id
+  diskUsage: null, // { root, path, jobId } while the analyzer is open
+  uploads: new Map(), // upload id -> { total, sent: Map(name -> bytes) }
+  syncs: new Map(), // sync job id -> { remote, local, watch, passes }
+  transfers: new Map(), // transfer job id -> { name, target }
+  copies: new Map(), // copy job id -> { name, newPath }
+  copiedEntry: null, // { path, connectionId } to paste with Cmd+V
   packagePanel: {
     open: false,
     packages: [],
@@ -51,6 +65,10 @@ const state = {
 let selectGeneration = 0;
 let navAbortController = null;
 
+// Directory columns load this many entries at a time; the rest of a large
+// listing is paged in from the server-side cursor.
+const LS_PAGE_SIZE = 2000;
+
 // ── Cache ───────────────────────────────────────────────────────────
 
 const apiCache = {
@@ -115,6 +133,12 @@ function connHeaders(extra = {}) {
   return headers;
 }
 
+// Socket jobs carry an id the client picks, so events that arrive before
+// the acknowledgement can already be matched to the request.
+function newJobId() {
+  return Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+}
+
 async function cachedPost(url, body, ttlMs, signal) {
   const cached = apiCache.get(url, body);
   if (cached) return cached;
@@ -450,6 +474,7 @@ async function connectToHost(host) {
         username: host.user,
         port: host.port,
         key_file: host.identity_file,
+        listing_limit: LS_PAGE_SIZE,
       }),
     });
 
@@ -492,6 +517,7 @@ async function handleManualConnect(event) {
         password,
         port: parseInt(port),
         key_file: keyFile,
+        listing_limit: LS_PAGE_SIZE,
       }),
     });
 
@@ -575,6 +601,18 @@ function onConnected(data) {
   document.getElementById("connection-info").textContent =
     `${data.username}@${data.host}`;
 
+  // The connect response carries the first $HOME listing, so seed the cache
+  // and let navigateTo render it without another round trip.
+  if (data.listing) {
+    apiCache.set(
+      "/api/ls",
+      { path: data.home_dir, limit: LS_PAGE_SIZE },
+      data.listing,
+      30000,
+    );
+  }
+  if (data.timings) console.debug("connect timings (ms)", data.timings);
+
   showScreen("main");
   seedSidebarIfNew();
   renderSidebar();
@@ -612,6 +650,7 @@ async function handleDisconnect() {
 
   stopTmuxPolling();
   stopFileWatcher();
+  state.sizeJobs.clear();
   closePackageManager();
   apiCache.clear();
   state.undoStack = [];
@@ -697,6 +736,7 @@ function switchToConnection(connId) {
   }
   stopTmuxPolling();
   stopFileWatcher();
+  state.sizeJobs.clear();
   apiCache.clear();
 
   const conn = state.connections.find((c) => c.id === connId);
@@ -745,7 +785,12 @@ async function navigateTo(path) {
   navAbortController = new AbortController();
   const signal = navAbortController.signal;
   try {
-    const data = await cachedPost("/api/ls", { path }, 30000, signal);
+    const data = await cachedPost(
+      "/api/ls",
+      { path, limit: LS_PAGE_SIZE },
+      30000,
+      signal,
+    );
     if (data.error) {
       showNotification(data.error || "Failed to list directory", "error");
       return;
@@ -754,6 +799,8 @@ async function navigateTo(path) {
       {
         path: data.path,
         entries: data.entries,
+        total: data.total,
+        cursor: data.cursor,
         selected: new Set(),
         lastClickedIndex: -1,
         selectionCursor: -1,
@@ -836,7 +883,7 @@ async function selectEntry(colIndex, entry, opts = {}) {
     try {
       const data = await cachedPost(
         "/api/ls",
-        { path: newPath },
+        { path: newPath, limit: LS_PAGE_SIZE },
         30000,
         signal,
       );
@@ -849,6 +896,8 @@ async function selectEntry(colIndex, entry, opts = {}) {
         state.columns.push({
           path: data.path,
           entries: data.entries,
+          total: data.total,
+          cursor: data.cursor,
           selected: new Set(),
           lastClickedIndex: -1,
           selectionCursor: -1,
@@ -980,7 +1029,7 @@ function getVisibleEntries(column) {
   );
 
   // Apply search filter
-  if (state.search.active && state.search.query) {
+  if (state.search.active && state.search.query && !state.search.deep) {
     const q = state.search.query.toLowerCase();
     entries = entries.filter((e) => e.name.toLowerCase().includes(q));
   }
@@ -1490,6 +1539,21 @@ function renderColumns() {
       colEl.appendChild(entryEl);
     });
 
+    // Large directory: offer the next page of the server-side listing
+    if (column.total > column.entries.length) {
+      const moreEl = document.createElement("div");
+      moreEl.className = "column-more";
+      const remaining = column.total - column.entries.length;
+      moreEl.textContent = column.loadingMore
+        ? "Loading..."
+        : `Load ${Math.min(remaining, LS_PAGE_SIZE).toLocaleString()} more (${remaining.toLocaleString()} not shown)`;
+      moreEl.addEventListener("click", (e) => {
+        e.stopPropagation();
+        loadMoreEntries(colIndex);
+      });
+      colEl.appendChild(moreEl);
+    }
+
     // Click on blank space to deselect
     colEl.addEventListener("click", (e) => {
       if (e.target === colEl) {
@@ -1548,6 +1612,52 @@ function renderColumns() {
       col.scrollTop = scrollPositions[i];
     }
   });
+
+  syncWatchedDirs();
+  cancelStaleSizeJobs();
+}
+
+async function loadMoreEntries(colIndex) {
+  const column = state.columns[colIndex];
+  if (!column || column.loadingMore) return;
+  column.loadingMore = true;
+  renderColumns();
+  try {
+    const body = {
+      cursor: column.cursor,
+      offset: column.entries.length,
+      limit: LS_PAGE_SIZE,
+    };
+    let resp = await fetch("/api/ls-window", {
+      method: "POST",
+      headers: connHeaders(),
+      body: JSON.stringify(body),
+    });
+    if (resp.status === 404) {
+      // The server dropped the cursor; list again from the same offset
+      resp = await fetch("/api/ls", {
+        method: "POST",
+        headers: connHeaders(),
+        body: JSON.stringify({ path: column.path, ...body }),
+      });
+    }
+    const data = await resp.json();
+    if (data.error) {
+      showNotification(data.error, "error");
+      return;
+    }
+    if (state.columns[colIndex] !== column) return; // navigated away
+    column.entries = column.entries.concat(data.entries);
+    column.total = data.total;
+    column.cursor = data.cursor;
+    column.sizesLoaded = false;
+    fetchDirSizes(colIndex);
+  } catch (e) {
+    showNotification("Failed to load entries: " + e.message, "error");
+  } finally {
+    column.loadingMore = false;
+    renderColumns();
+  }
 }
 
 function createColumnResizeHandle(colIndex, colEl) {
@@ -1585,6 +1695,15 @@ function createColumnResizeHandle(colIndex, colEl) {
 }
 
 async function handleDrop(e, destDir) {
+  // Entries must be read while the drop event is still being dispatched
+  const droppedEntries = [...(e.dataTransfer.items || [])]
+    .map((item) => item.webkitGetAsEntry && item.webkitGetAsEntry())
+    .filter(Boolean);
+  if (droppedEntries.some((entry) => entry.isDirectory)) {
+    await uploadFolders(droppedEntries, destDir);
+    return;
+  }
+
   // Handle file uploads from OS
   if (e.dataTransfer.files && e.dataTransfer.files.length > 0) {
     const hasPlainText = e.dataTransfer.types.includes("text/plain");
@@ -1651,11 +1770,16 @@ async function refreshColumns() {
       const resp = await fetch("/api/ls", {
         method: "POST",
         headers: connHeaders(),
-        body: JSON.stringify({ path: col.path }),
+        body: JSON.stringify({
+          path: col.path,
+          limit: Math.max(LS_PAGE_SIZE, col.entries ? col.entries.length : 0),
+        }),
       });
       if (resp.ok) {
         const data = await resp.json();
         col.entries = data.entries;
+        col.total = data.total;
+        col.cursor = data.cursor;
         // Remove selected entries that no longer exist
         const names = new Set(data.entries.map((e) => e.name));
         for (const name of col.selected) {
@@ -2146,6 +2270,31 @@ function startTerminalSession() {
     console.error("Socket.io connection error:", err);
   });
 
+  // (Re)register the open directories for push change notifications
+  state.socket.on("connect", () => syncWatchedDirs(true));
+  state.socket.on("dir_changed", handleDirChanged);
+  state.socket.on("dir_size", handleDirSize);
+  state.socket.on("job_done", (data) => forgetSizeJob(data.job_id));
+  state.socket.on("job_error", (data) => forgetSizeJob(data.job_id));
+  state.socket.on("disk_usage_progress", handleDiskUsageProgress);
+  state.socket.on("search_results", handleSearchResults);
+  state.socket.on("grep_results", handleGrepResults);
+  state.socket.on("upload_progress", handleUploadProgress);
+  state.socket.on("download_progress", handleDownloadProgress);
+  state.socket.on("tar_progress", handleTarProgress);
+  state.socket.on("job_done", handleDiskUsageDone);
+  state.socket.on("job_error", handleDiskUsageDone);
+  state.socket.on("sync_progress", handleSyncProgress);
+  state.socket.on("sync_pass", handleSyncPass);
+  state.socket.on("job_done", handleSyncDone);
+  state.socket.on("job_error", handleSyncDone);
+  state.socket.on("transfer_progress", handleTransferProgress);
+  state.socket.on("job_done", handleTransferDone);
+  state.socket.on("job_error", handleTransferDone);
+  state.socket.on("copy_progress", handleCopyProgress);
+  state.socket.on("job_done", handleCopyDone);
+  state.socket.on("job_error", handleCopyDone);
+
   state.socket.on("terminal_output", (data) => {
     if (state.terminal) state.terminal.write(data.data);
   });
@@ -2271,6 +2420,26 @@ async function fetchDirSizes(colIndex) {
 
   column.sizesLoaded = true;
 
+  // Over the socket, known sizes come back at once and the rest stream in
+  // as dir_size events while the server runs du in the background.
+  if (state.socket && state.socket.connected) {
+    cancelSizeJob(column.path);
+    state.socket.emit(
+      "dir_sizes_start",
+      {
+        connection_id: state.connectionId,
+        path: column.path,
+        names: dirNames,
+      },
+      (ack) => {
+        if (!ack || ack.error) return;
+        if (ack.job_id) state.sizeJobs.set(column.path, ack.job_id);
+        applyDirSizes(column.path, ack.sizes);
+      },
+    );
+    return;
+  }
+
   try {
     const data = await cachedPost(
       "/api/dir-sizes",
@@ -2297,6 +2466,52 @@ async function fetchDirSizes(colIndex) {
   }
 }
 
+function applyDirSizes(path, sizes) {
+  let changed = false;
+  for (const column of state.columns) {
+    if (column.path !== path || !column.entries) continue;
+    for (const entry of column.entries) {
+      if (entry.is_dir && sizes[entry.name] !== undefined) {
+        entry.dirSize = sizes[entry.name];
+        changed = true;
+      }
+    }
+  }
+  if (changed && !applyDirSizes.pending) {
+    // Batch a burst of results into one render
+    applyDirSizes.pending = true;
+    requestAnimationFrame(() => {
+      applyDirSizes.pending = false;
+      renderColumns();
+    });
+  }
+}
+
+function handleDirSize(data) {
+  applyDirSizes(data.path, { [data.name]: data.size });
+}
+
+function cancelSizeJob(path) {
+  const jobId = state.sizeJobs.get(path);
+  if (!jobId) return;
+  state.sizeJobs.delete(path);
+  if (state.socket) state.socket.emit("job_cancel", { job_id: jobId });
+}
+
+function forgetSizeJob(jobId) {
+  for (const [path, id] of state.sizeJobs) {
+    if (id === jobId) state.sizeJobs.delete(path);
+  }
+}
+
+// Stop sizing directories whose column has been closed
+function cancelStaleSizeJobs() {
+  const open = new Set(state.columns.map((c) => c.path));
+  for (const path of [...state.sizeJobs.keys()]) {
+    if (!open.has(path)) cancelSizeJob(path);
+  }
+}
+
 // ── Preview ─────────────────────────────────────────────────────────
 
 function togglePreviewWrap() {
@@ -2526,6 +2741,47 @@ function showContextMenu(x, y, colIndex, entry, fullPath) {
         label: "Get Info",
         action: () => showFolderInfo(colIndex, entry, fullPath),
       });
+      items.push({
+        icon: CTX.download,
+        label: "Download as Archive",
+        action: () => downloadFolder(fullPath),
+      });
+      items.push({
+        icon: CTX.copyName,
+        label: "Analyze Disk Usage",
+        action: () => showDiskUsage(fullPath),
+      });
+      if (
+        state.copiedEntry &&
+        state.copiedEntry.connectionId === state.connectionId
+      ) {
+        items.push({
+          icon: CTX.duplicate,
+          label: "Paste Here",
+          action: () => pasteCopiedEntry(fullPath),
+        });
+      }
+      items.push(
+        isWatchingSync(fullPath)
+          ? {
+              icon: CTX.upload,
+              label: "Stop Syncing",
+              action: () => stopFolderSync(fullPath),
+            }
+          : {
+              icon: CTX.upload,
+              label: "Sync with Local Folder...",
+              action: () => startFolderSync(fullPath),
+            },
+      );
+    }
+    for (const conn of state.connections) {
+      if (conn.id === state.connectionId) continue;
+      items.push({
+        icon: CTX.upload,
+        label: `Copy to ${conn.username}@${conn.host}...`,
+        action: () => sendToConnection(fullPath, conn),
+      });
     }
     items.push(
       { separator: true },
@@ -2549,6 +2805,17 @@ function showContextMenu(x, y, colIndex, entry, fullPath) {
         label: "Duplicate",
         action: () => duplicateEntry(colIndex, entry, fullPath),
       },
+      {
+        icon: CTX.duplicate,
+        label: "Copy",
+        action: () => {
+          state.copiedEntry = {
+            path: fullPath,
+            connectionId: state.connectionId,
+          };
+          showNotification(`Copied ${entry.name}`, "success");
+        },
+      },
       {
         icon: CTX.rename,
         label: "Rename",
@@ -2641,17 +2908,24 @@ function handleContextMenuKey(e) {
 }
 
 async function duplicateEntry(colIndex, entry, fullPath) {
+  if (state.socket && state.socket.connected) {
+    copyEntry(fullPath, null);
+    return;
+  }
+  // Without a socket the copy still runs in the background, just without
+  // progress events
   try {
     const resp = await fetch("/api/duplicate", {
       method: "POST",
       headers: connHeaders(),
-      body: JSON.stringify({ path: fullPath, is_dir: entry.is_dir }),
+      body: JSON.stringify({ path: fullPath }),
     });
     const data = await resp.json();
     if (data.error) {
       showNotification(data.error, "error");
     } else {
-      showNotification("Duplicated " + entry.name, "success");
+      const newName = data.new_path.split("/").pop();
+      showNotification(`Duplicating ${entry.name} to ${newName}`, "success");
     }
   } catch (e) {
     showNotification("Duplicate failed: " + e.message, "error");
@@ -2716,28 +2990,40 @@ async function confirmDeleteMulti(colIndex) {
   await refreshColumns();
 }
 
-async function downloadFile(path) {
-  try {
-    const resp = await fetch("/api/download", {
-      method: "POST",
-      headers: connHeaders(),
-      body: JSON.stringify({ path }),
-    });
-    if (!resp.ok) {
-      const err = await resp.json();
-      showNotification(err.error || "Download failed", "error");
-      return;
-    }
-    const blob = await resp.blob();
-    const url = URL.createObjectURL(blob);
-    const a = document.createElement("a");
-    a.href = url;
-    a.download = path.split("/").pop();
-    a.click();
-    URL.revokeObjectURL(url);
-  } catch (e) {
-    showNotification("Download failed: " + e.message, "error");
+// Hand a GET URL to the browser so its download manager streams the file
+// and can resume it with Range requests
+function downloadFile(path) {
+  const params = new URLSearchParams({ path });
+  if (state.connectionId) params.set("connection_id", state.connectionId);
+  const a = document.createElement("a");
+  a.href = "/api/download?" + params;
+  a.download = path.split("/").pop();
+  a.click();
+}
+
+// The server tars (and zstd/gzip-compresses) the folder on the remote and
+// streams the archive as it is produced; progress arrives over the socket
+function downloadFolder(path) {
+  const params = new URLSearchParams({ path });
+  if (state.connectionId) params.set("connection_id", state.connectionId);
+  if (state.socket && state.socket.connected) {
+    params.set("socket_id", state.socket.id);
+    params.set("download_id", Math.random().toString(36).slice(2));
   }
+  const a = document.createElement("a");
+  a.href = "/api/download-folder?" + params;
+  a.click();
+}
+
+function handleDownloadProgress(data) {
+  const name = data.path.replace(/\/+$/, "").split("/").pop() || "/";
+  if (data.done) {
+    const el = document.getElementById("upload-progress");
+    if (el) el.style.display = "none";
+    showNotification(`Archived ${name} (${formatSize(data.sent)})`, "success");
+    return;
+  }
+  showUploadProgress(`Archiving ${name}... ${formatSize(data.sent)} sent`, 0);
 }
 
 // ── Clipboard ────────────────────────────────────────────────────────
@@ -2871,6 +3157,7 @@ function toggleSearchBar() {
   state.search.active = !state.search.active;
   if (!state.search.active) {
     state.search.query = "";
+    stopDeepSearch();
     renderColumns();
   }
   renderSearchBar();
@@ -2893,7 +3180,9 @@ function renderSearchBar() {
     <svg width="14" height="14" viewBox="0 0 16 16" fill="currentColor" opacity="0.5">
       <path d="M11.742 10.344a6.5 6.5 0 1 0-1.397 1.398h-.001q.044.06.098.115l3.85 3.85a1 1 0 0 0 1.415-1.414l-3.85-3.85a1 1 0 0 0-.115-.1zM12 6.5a5.5 5.5 0 1 1-11 0 5.5 5.5 0 0 1 11 0"/>
     </svg>
-    <input id="search-input" type="text" placeholder="Filter files..." value="${escapeAttr(state.search.query)}" />
+    <input id="search-input" type="text" placeholder="${searchPlaceholder()}" value="${escapeAttr(state.search.query)}" />
+    <button class="btn btn-secondary btn-sm search-deep${state.search.deep ? " active" : ""}" title="Search all subfolders">Subfolders</button>
+    <button class="btn btn-secondary btn-sm search-contents${state.search.contents ? " active" : ""}" title="Search inside files (rg or grep)">Contents</button>
     <button class="btn btn-icon search-close" onclick="toggleSearchBar()" title="Close (Esc)">
       ${CTX.xmark}
     </button>
@@ -2901,7 +3190,28 @@ function renderSearchBar() {
   const input = bar.querySelector("#search-input");
   input.addEventListener("input", (e) => {
     state.search.query = e.target.value;
+    if (state.search.deep) {
+      clearTimeout(renderSearchBar.timer);
+      renderSearchBar.timer = setTimeout(startDeepSearch, 150);
+    } else {
+      renderColumns();
+    }
+  });
+  bar.querySelector(".search-deep").addEventListener("click", () => {
+    state.search.deep = !state.search.deep;
+    if (!state.search.deep) state.search.contents = false;
+    if (state.search.deep) startDeepSearch();
+    else stopDeepSearch();
+    renderColumns();
+    renderSearchBar();
+  });
+  bar.querySelector(".search-contents").addEventListener("click", () => {
+    state.search.contents = !state.search.contents;
+    if (state.search.contents) state.search.deep = true;
+    if (state.search.deep) startDeepSearch();
+    else stopDeepSearch();
     renderColumns();
+    renderSearchBar();
   });
   input.addEventListener("keydown", (e) => {
     if (e.key === "Escape") {
@@ -2912,18 +3222,191 @@ function renderSearchBar() {
     e.stopPropagation();
   });
   input.focus();
+  renderSearchResults();
 }
 
-// ── File Upload ──────────────────────────────────────────────────────
+function searchPlaceholder() {
+  if (state.search.contents) return "Search file contents...";
+  return state.search.deep ? "Search subfolders..." : "Filter files...";
+}
 
-function handleFileUpload(files, destDir) {
-  const formData = new FormData();
-  formData.append("dest_dir", destDir);
-  for (const file of files) {
-    formData.append("files", file);
+// Subfolder search streams hits from a remote find (or rg/grep for
+// contents); each keystroke replaces the search in flight, which cancels
+// it on the server.
+function startDeepSearch() {
+  const search = state.search;
+  const column = state.columns[state.columns.length - 1];
+  if (!search.query || !column || !column.path) {
+    stopDeepSearch();
+    return;
+  }
+  if (search.jobId && state.socket) {
+    state.socket.emit("job_cancel", { job_id: search.jobId });
+  }
+  search.results = [];
+  search.jobId = null;
+  search.more = false;
+  search.capped = false;
+  if (!state.socket || !state.socket.connected) {
+    showNotification("Subfolder search needs a live connection", "error");
+    return;
+  }
+  const query = search.query;
+  const contents = search.contents;
+  const jobId = newJobId();
+  const [event, payload] = contents
+    ? ["grep_start", { pattern: query }]
+    : ["search_start", { query }];
+  search.jobId = jobId;
+  state.socket.emit(
+    event,
+    {
+      connection_id: state.connectionId,
+      path: column.path,
+      job_id: jobId,
+      ...payload,
+    },
+    (ack) => {
+      // Finished already, or replaced by a newer search
+      if (search.jobId !== jobId) {
+        if (ack && ack.job_id) {
+          state.socket.emit("job_cancel", { job_id: ack.job_id });
+        }
+        return;
+      }
+      if (!ack || ack.error) {
+        search.jobId = null;
+        showNotification(ack ? ack.error : "Search failed", "error");
+        renderSearchResults();
+        return;
+      }
+      search.jobId = ack.job_id;
+    },
+  );
+  renderSearchResults();
+}
+
+function stopDeepSearch() {
+  const search = state.search;
+  if (search.jobId && state.socket) {
+    state.socket.emit("job_cancel", { job_id: search.jobId });
+  }
+  search.jobId = null;
+  search.results = [];
+  search.more = false;
+  renderSearchResults();
+}
+
+function handleSearchResults(data) {
+  const search = state.search;
+  if (data.job_id !== search.jobId) return;
+  search.results.push(...data.results);
+  search.more = data.state === "more";
+  if (data.state === "done") search.jobId = null;
+  scheduleSearchResultsRender();
+}
+
+function handleGrepResults(data) {
+  const search = state.search;
+  if (data.job_id !== search.jobId) return;
+  for (const m of data.matches) {
+    const slash = m.path.lastIndexOf("/");
+    search.results.push({
+      ...m,
+      name: m.path.slice(slash + 1),
+      parent: m.path.slice(0, slash) || "/",
+      is_dir: false,
+    });
+  }
+  search.capped = data.state === "capped";
+  if (data.state) search.jobId = null;
+  scheduleSearchResultsRender();
+}
+
+function scheduleSearchResultsRender() {
+  if (!scheduleSearchResultsRender.pending) {
+    scheduleSearchResultsRender.pending = true;
+    requestAnimationFrame(() => {
+      scheduleSearchResultsRender.pending = false;
+      renderSearchResults();
+    });
+  }
+}
+
+function renderSearchResults() {
+  let list = document.getElementById("search-results");
+  const search = state.search;
+  if (!search.active || !search.deep || !search.query) {
+    if (list) list.remove();
+    return;
+  }
+  const bar = document.getElementById("search-bar");
+  if (!bar) return;
+  if (!list) {
+    list = document.createElement("div");
+    list.id = "search-results";
+    list.className = "search-results";
+    bar.appendChild(list);
+  }
+  const rows = search.results.map((r, i) =>
+    r.line
+      ? `<div class="search-result" data-index="${i}" title="${escapeAttr(r.path)}">` +
+        `<span class="search-result-name">${escapeHtml(r.name)}:${r.line}</span>` +
+        `<span class="search-result-path search-result-text">${escapeHtml(r.text)}</span></div>`
+      : `<div class="search-result" data-index="${i}" title="${escapeAttr(r.path)}">` +
+        `<span class="search-result-name">${escapeHtml(r.name)}${r.is_dir ? "/" : ""}</span>` +
+        `<span class="search-result-path">${escapeHtml(r.parent)}</span>` +
+        `<span class="search-result-size">${r.is_dir ? "" : formatSize(r.size)}</span></div>`,
+  );
+  if (search.capped && !search.jobId) {
+    rows.push(`<div class="search-result search-pending">Showing the first ${search.results.length} matches</div>`);
+  }
+  if (search.more) {
+    rows.push(`<div class="column-more search-more">Show more results</div>`);
+  } else if (search.jobId) {
+    rows.push(`<div class="search-result search-pending">Searching…</div>`);
+  } else if (!search.results.length) {
+    rows.push(`<div class="search-result search-pending">No matches</div>`);
   }
+  list.innerHTML = rows.join("");
+  list.querySelectorAll(".search-result[data-index]").forEach((row) => {
+    row.onclick = () => revealSearchHit(search.results[Number(row.dataset.index)]);
+  });
+  const more = list.querySelector(".search-more");
+  if (more) {
+    more.onclick = () => {
+      search.more = false;
+      state.socket.emit("search_more", { job_id: search.jobId });
+      renderSearchResults();
+    };
+  }
+}
+
+async function revealSearchHit(hit) {
+  toggleSearchBar();
+  if (hit.is_dir) {
+    navigateTo(hit.path);
+    return;
+  }
+  await navigateTo(hit.parent);
+  const column = state.columns[0];
+  const entry = column && column.entries.find((e) => e.name === hit.name);
+  if (entry) selectEntry(0, entry);
+}
+
+// ── File Upload ──────────────────────────────────────────────────────
+
+// Files at least this big are sent in chunks that resume after a failure
+const CHUNKED_UPLOAD_MIN = 64 * 1024 * 1024;
+
+async function handleFileUpload(files, destDir) {
+  const large = [...files].filter((f) => f.size >= CHUNKED_UPLOAD_MIN);
+  const small = [...files].filter((f) => f.size < CHUNKED_UPLOAD_MIN);
+  if (large.length) await uploadLargeFiles(large, destDir);
+  if (small.length) await uploadFiles(small, destDir);
+}
 
-  // Create progress bar
+function showUploadProgress(text, pct, onClick) {
   let progressEl = document.getElementById("upload-progress");
   if (!progressEl) {
     progressEl = document.createElement("div");
@@ -2932,9 +3415,293 @@ function handleFileUpload(files, destDir) {
     document.body.appendChild(progressEl);
   }
   progressEl.innerHTML = `
-    <div class="upload-progress-text">Uploading ${files.length} file(s)...</div>
+    <div class="upload-progress-text"></div>
     <div class="upload-progress-track"><div class="upload-progress-bar" id="upload-bar"></div></div>`;
+  progressEl.querySelector(".upload-progress-text").textContent = text;
+  document.getElementById("upload-bar").style.width = pct + "%";
+  progressEl.onclick = onClick || null;
+  progressEl.style.cursor = onClick ? "pointer" : "";
   progressEl.style.display = "flex";
+  return progressEl;
+}
+
+async function uploadLargeFiles(files, destDir) {
+  const total = files.reduce((sum, f) => sum + f.size, 0);
+  let done = 0;
+  const progressEl = showUploadProgress(`Uploading ${files.length} large file(s)...`, 0);
+  const uploaded = [];
+  for (const file of files) {
+    try {
+      await uploadFileChunked(file, destDir, (offset) => {
+        const pct = Math.round(((done + offset) / total) * 100);
+        showUploadProgress(`Uploading ${file.name}... ${pct}%`, pct);
+      });
+      uploaded.push(file.name);
+    } catch (e) {
+      showNotification(`${file.name}: ${e.message}`, "error");
+    }
+    done += file.size;
+  }
+  progressEl.style.display = "none";
+  if (uploaded.length) {
+    showNotification(`Uploaded ${uploaded.length} file(s)`, "success");
+  }
+  await refreshColumns();
+}
+
+// Incremental SHA-256 for checksumming large uploads as they are read;
+// crypto.subtle only digests whole buffers, and only on https.
+const SHA256_K = new Int32Array([
+  0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1,
+  0x923f82a4, 0xab1c5ed5, 0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
+  0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174, 0xe49b69c1, 0xefbe4786,
+  0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+  0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147,
+  0x06ca6351, 0x14292967, 0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
+  0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85, 0xa2bfe8a1, 0xa81a664b,
+  0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+  0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a,
+  0x5b9cca4f, 0x682e6ff3, 0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
+  0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+]);
+
+class Sha256 {
+  constructor() {
+    this.h = new Int32Array([
+      0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c,
+      0x1f83d9ab, 0x5be0cd19,
+    ]);
+    this.w = new Int32Array(64);
+    this.block = new Uint8Array(64);
+    this.blockLen = 0;
+    this.length = 0;
+  }
+
+  update(bytes) {
+    this.length += bytes.length;
+    let i = 0;
+    if (this.blockLen) {
+      i = Math.min(64 - this.blockLen, bytes.length);
+      this.block.set(bytes.subarray(0, i), this.blockLen);
+      this.blockLen += i;
+      if (this.blockLen < 64) return this;
+      this.compress(this.block, 0);
+      this.blockLen = 0;
+    }
+    for (; i + 64 <= bytes.length; i += 64) this.compress(bytes, i);
+    this.block.set(bytes.subarray(i));
+    this.blockLen = bytes.length - i;
+    return this;
+  }
+
+  compress(bytes, at) {
+    const w = this.w;
+    for (let t = 0; t < 16; t++) {
+      const j = at + t * 4;
+      w[t] =
+        (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+    }
+    for (let t = 16; t < 64; t++) {
+      const x = w[t - 15];
+      const y = w[t - 2];
+      const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+      const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+      w[t] = (w[t - 16] + s0 + w[t - 7] + s1) | 0;
+    }
+    const H = this.h;
+    let a = H[0];
+    let b = H[1];
+    let c = H[2];
+    let d = H[3];
+    let e = H[4];
+    let f = H[5];
+    let g = H[6];
+    let h = H[7];
+    for (let t = 0; t < 64; t++) {
+      const s1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+      const t1 = (h + s1 + ((e & f) ^ (~e & g)) + SHA256_K[t] + w[t]) | 0;
+      const s0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+      const t2 = (s0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+      h = g;
+      g = f;
+      f = e;
+      e = (d + t1) | 0;
+      d = c;
+      c = b;
+      b = a;
+      a = (t1 + t2) | 0;
+    }
+    H[0] = (H[0] + a) | 0;
+    H[1] = (H[1] + b) | 0;
+    H[2] = (H[2] + c) | 0;
+    H[3] = (H[3] + d) | 0;
+    H[4] = (H[4] + e) | 0;
+    H[5] = (H[5] + f) | 0;
+    H[6] = (H[6] + g) | 0;
+    H[7] = (H[7] + h) | 0;
+  }
+
+  hexdigest() {
+    const bits = this.length * 8;
+    const pad = new Uint8Array((this.blockLen < 56 ? 56 : 120) - this.blockLen + 8);
+    pad[0] = 0x80;
+    const view = new DataView(pad.buffer);
+    view.setUint32(pad.length - 8, Math.floor(bits / 2 ** 32));
+    view.setUint32(pad.length - 4, bits >>> 0);
+    this.update(pad);
+    return [...this.h]
+      .map((n) => (n >>> 0).toString(16).padStart(8, "0"))
+      .join("");
+  }
+}
+
+const UPLOAD_HASH_CHUNK = 4 * 1024 * 1024;
+
+async function fileSha256(file) {
+  const sha = new Sha256();
+  for (let offset = 0; offset < file.size; offset += UPLOAD_HASH_CHUNK) {
+    const slice = file.slice(offset, offset + UPLOAD_HASH_CHUNK);
+    sha.update(new Uint8Array(await slice.arrayBuffer()));
+  }
+  return sha.hexdigest();
+}
+
+async function blockSha256(bytes) {
+  if (!window.crypto || !crypto.subtle) return new Sha256().update(bytes).hexdigest();
+  const digest = new Uint8Array(await crypto.subtle.digest("SHA-256", bytes));
+  return [...digest].map((b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+// Re-uploading a file the server already has: the upload starts as a copy
+// of the remote file, and only blocks whose sha256 differs from the
+// remote's are sent, grouped into runs. Returns the upload to commit.
+async function sendChangedBlocks(file, upload, reinit, onProgress) {
+  const { block } = upload.delta;
+  let hashes = upload.delta.hashes;
+  const send = async (start, end) => {
+    for (let failures = 0; ; ) {
+      try {
+        const resp = await fetch(
+          `/api/upload/chunk?upload_id=${upload.upload_id}&offset=${start}`,
+          {
+            method: "POST",
+            headers: connHeaders({ "Content-Type": "application/octet-stream" }),
+            body: file.slice(start, end),
+          },
+        );
+        const data = await resp.json();
+        if (data.error) throw new Error(data.error);
+        return;
+      } catch (e) {
+        if (++failures > 5) throw e;
+        await new Promise((r) => setTimeout(r, 1000 * failures));
+        upload = await reinit();
+        if (!upload.delta) throw e;
+        hashes = upload.delta.hashes;
+      }
+    }
+  };
+
+  // Read a few MB at a time, in whole blocks
+  const span = Math.max(1, Math.floor(UPLOAD_HASH_CHUNK / block)) * block;
+  let run = null;
+  for (let at = 0; at < file.size; at += span) {
+    const bytes = new Uint8Array(await file.slice(at, at + span).arrayBuffer());
+    for (let i = 0; i < bytes.length; i += block) {
+      const offset = at + i;
+      const end = offset + Math.min(block, bytes.length - i);
+      const index = offset / block;
+      const same =
+        index < hashes.length &&
+        (await blockSha256(bytes.subarray(i, i + block))) === hashes[index];
+      if (same || (run !== null && offset - run >= upload.chunk_size)) {
+        if (run !== null) await send(run, offset);
+        run = null;
+      }
+      if (!same && run === null) run = offset;
+      onProgress(end);
+    }
+  }
+  if (run !== null) await send(run, file.size);
+  return upload;
+}
+
+async function uploadFileChunked(file, destDir, onProgress) {
+  const path = destDir.replace(/\/$/, "") + "/" + file.name;
+  const post = (url, body) =>
+    fetch(url, {
+      method: "POST",
+      headers: connHeaders(),
+      body: JSON.stringify(body),
+    }).then((r) => r.json());
+  const init = async () => {
+    const data = await post("/api/upload/init", {
+      path,
+      size: file.size,
+      delta: true,
+    });
+    if (data.error) throw new Error(data.error);
+    return data;
+  };
+
+  // Checksummed alongside the upload and checked against the remote copy
+  // on commit
+  const digest = fileSha256(file);
+  digest.catch(() => {});
+  let upload = await init();
+  if (upload.delta) {
+    upload = await sendChangedBlocks(file, upload, init, onProgress);
+  }
+  let offset = upload.delta ? file.size : upload.offset;
+  let failures = 0;
+  onProgress(offset);
+  while (offset < file.size) {
+    const end = Math.min(offset + upload.chunk_size, file.size);
+    try {
+      const resp = await fetch(
+        `/api/upload/chunk?upload_id=${upload.upload_id}&offset=${offset}`,
+        {
+          method: "POST",
+          headers: connHeaders({ "Content-Type": "application/octet-stream" }),
+          body: file.slice(offset, end),
+        },
+      );
+      const data = await resp.json();
+      if (data.error) throw new Error(data.error);
+      offset = data.offset;
+      failures = 0;
+    } catch (e) {
+      if (++failures > 5) throw e;
+      await new Promise((r) => setTimeout(r, 1000 * failures));
+      // Pick up from whatever reached the remote before the failure
+      upload = await init();
+      offset = upload.offset;
+    }
+    onProgress(offset);
+  }
+  const result = await post("/api/upload/commit", {
+    upload_id: upload.upload_id,
+    sha256: await digest,
+  });
+  if (result.error) throw new Error(result.error);
+}
+
+function uploadFiles(files, destDir) {
+  const uploadId = Math.random().toString(36).slice(2);
+  const formData = new FormData();
+  formData.append("dest_dir", destDir);
+  formData.append("upload_id", uploadId);
+  if (state.socket && state.socket.connected) {
+    formData.append("socket_id", state.socket.id);
+  }
+  let total = 0;
+  for (const file of files) {
+    formData.append("files", file);
+    total += file.size;
+  }
+  state.uploads.set(uploadId, { total, sent: new Map() });
+
+  const progressEl = showUploadProgress(`Uploading ${files.length} file(s)...`, 0);
 
   return new Promise((resolve) => {
     const xhr = new XMLHttpRequest();
@@ -2948,6 +3715,7 @@ function handleFileUpload(files, destDir) {
       }
     };
     xhr.onload = () => {
+      state.uploads.delete(uploadId);
       progressEl.style.display = "none";
       try {
         const data = JSON.parse(xhr.responseText);
@@ -2963,15 +3731,188 @@ function handleFileUpload(files, destDir) {
       refreshColumns().then(resolve);
     };
     xhr.onerror = () => {
+      state.uploads.delete(uploadId);
       progressEl.style.display = "none";
       showNotification("Upload failed", "error");
       resolve();
     };
     xhr.open("POST", "/api/upload");
+    if (state.connectionId)
+      xhr.setRequestHeader("X-Connection-Id", state.connectionId);
     xhr.send(formData);
   });
 }
 
+// Once the browser has sent everything, the server copies the files to the
+// remote in parallel and reports each one's progress here
+function handleUploadProgress(data) {
+  const upload = state.uploads.get(data.upload_id);
+  const progressEl = document.getElementById("upload-progress");
+  if (!upload || !progressEl) return;
+  upload.sent.set(data.name, data.sent);
+  let sent = 0;
+  for (const bytes of upload.sent.values()) sent += bytes;
+  const pct = upload.total ? Math.round((sent / upload.total) * 100) : 100;
+  const bar = document.getElementById("upload-bar");
+  if (bar) bar.style.width = pct + "%";
+  const text = progressEl.querySelector(".upload-progress-text");
+  if (text) text.textContent = `Copying to server... ${pct}% (${data.name})`;
+}
+
+// ── Folder Upload ────────────────────────────────────────────────────
+
+// Dropped folders are packed into one tar stream in the browser (file data
+// is read lazily from disk by the Blob) and unpacked by tar on the remote,
+// so thousands of small files cost one request instead of one each.
+async function uploadFolders(entries, destDir) {
+  const items = [];
+  showUploadProgress("Reading folder...", 0);
+  try {
+    for (const entry of entries) await collectEntryFiles(entry, "", items);
+  } catch (e) {
+    document.getElementById("upload-progress").style.display = "none";
+    showNotification("Could not read folder: " + e.message, "error");
+    return;
+  }
+  // The browser can't see local permissions: files that already exist keep
+  // their remote mode, new ones get 644 (folders 755)
+  let modes = {};
+  try {
+    const resp = await fetch("/api/upload-tar/modes", {
+      method: "POST",
+      headers: connHeaders(),
+      body: JSON.stringify({
+        dest_dir: destDir,
+        paths: items.map((item) => item.path),
+      }),
+    });
+    const data = await resp.json();
+    if (data.modes) modes = data.modes;
+  } catch {}
+  const blob = buildTarBlob(items, modes);
+  const uploadId = Math.random().toString(36).slice(2);
+  const params = new URLSearchParams({ dest_dir: destDir, upload_id: uploadId });
+  if (state.socket && state.socket.connected) {
+    params.set("socket_id", state.socket.id);
+  }
+  state.uploads.set(uploadId, { entries: items.length });
+  const progressEl = showUploadProgress(`Uploading ${items.length} item(s)...`, 0);
+
+  await new Promise((resolve) => {
+    const xhr = new XMLHttpRequest();
+    xhr.upload.onprogress = (e) => {
+      if (!e.lengthComputable) return;
+      const pct = Math.round((e.loaded / e.total) * 100);
+      showUploadProgress(`Uploading ${items.length} item(s)... ${pct}%`, pct);
+    };
+    xhr.onloadend = () => {
+      state.uploads.delete(uploadId);
+      progressEl.style.display = "none";
+      let data = {};
+      try {
+        data = JSON.parse(xhr.responseText);
+      } catch {}
+      if (data.error || xhr.status !== 200) {
+        showNotification(data.error || "Folder upload failed", "error");
+      } else {
+        showNotification(
+          `Uploaded ${data.extracted} item(s); new files get mode 644, ` +
+            "folders 755, existing ones keep theirs",
+          "success",
+        );
+      }
+      refreshColumns().then(resolve);
+    };
+    xhr.open("POST", "/api/upload-tar?" + params);
+    if (state.connectionId)
+      xhr.setRequestHeader("X-Connection-Id", state.connectionId);
+    xhr.setRequestHeader("Content-Type", "application/x-tar");
+    xhr.send(blob);
+  });
+}
+
+function handleTarProgress(data) {
+  const upload = state.uploads.get(data.upload_id);
+  if (!upload || !data.name) return;
+  const pct = Math.round((data.count / upload.entries) * 100);
+  showUploadProgress(`Extracting ${data.count} / ${upload.entries}: ${data.name}`, pct);
+}
+
+async function collectEntryFiles(entry, prefix, out) {
+  const path = prefix + entry.name;
+  if (entry.isFile) {
+    const file = await new Promise((res, rej) => entry.file(res, rej));
+    out.push({ path, file });
+    return;
+  }
+  out.push({ path, file: null });
+  const reader = entry.createReader();
+  for (;;) {
+    const batch = await new Promise((res, rej) => reader.readEntries(res, rej));
+    if (!batch.length) break;
+    for (const child of batch) await collectEntryFiles(child, path + "/", out);
+  }
+}
+
+function tarHeader(name, size, mtime, mode, type) {
+  const enc = new TextEncoder();
+  const header = new Uint8Array(512);
+  const put = (bytes, offset, length) =>
+    header.set(bytes.subarray(0, length), offset);
+  const octal = (n, offset, length) =>
+    put(enc.encode(n.toString(8).padStart(length - 1, "0")), offset, length - 1);
+  put(enc.encode(name), 0, 100);
+  octal(mode, 100, 8);
+  octal(0, 108, 8);
+  octal(0, 116, 8);
+  if (size < 8 ** 11) {
+    octal(size, 124, 12);
+  } else {
+    // GNU base-256 size for files of 8 GB and up
+    header[124] = 0x80;
+    for (let i = 135, v = size; i > 124; i--, v = Math.floor(v / 256)) {
+      header[i] = v % 256;
+    }
+  }
+  octal(Math.floor(mtime / 1000), 136, 12);
+  header[156] = type.charCodeAt(0);
+  put(enc.encode("ustar  \0"), 257, 8);
+  header.fill(0x20, 148, 156);
+  const sum = header.reduce((a, b) => a + b, 0);
+  put(enc.encode(sum.toString(8).padStart(6, "0") + "\0 "), 148, 8);
+  return header;
+}
+
+// Build a GNU tar archive as a Blob of headers and File references;
+// modes maps paths to the permissions to give them
+function buildTarBlob(items, modes = {}) {
+  const parts = [];
+  const pad = (size) => {
+    const rest = size % 512;
+    if (rest) parts.push(new Uint8Array(512 - rest));
+  };
+  for (const { path, file } of items) {
+    const name = file ? path : path + "/";
+    const nameBytes = new TextEncoder().encode(name);
+    if (nameBytes.length > 100) {
+      // Longer names go in a preceding ././@LongLink entry
+      parts.push(tarHeader("././@LongLink", nameBytes.length + 1, 0, 0, "L"));
+      parts.push(nameBytes, new Uint8Array(1));
+      pad(nameBytes.length + 1);
+    }
+    if (file) {
+      const mode = modes[path] ?? 0o644;
+      parts.push(tarHeader(name, file.size, file.lastModified, mode, "0"));
+      parts.push(file);
+      pad(file.size);
+    } else {
+      parts.push(tarHeader(name, 0, Date.now(), modes[path] ?? 0o755, "5"));
+    }
+  }
+  parts.push(new Uint8Array(1024));
+  return new Blob(parts, { type: "application/x-tar" });
+}
+
 function triggerUpload(destDir) {
   const input = document.getElementById("upload-input");
   input.onchange = () => {
@@ -2983,6 +3924,271 @@ function triggerUpload(destDir) {
   input.click();
 }
 
+// ── Folder Sync ──────────────────────────────────────────────────────
+
+function startFolderSync(remotePath) {
+  const saved = JSON.parse(localStorage.getItem("sshgui-sync-folders") || "{}");
+  const local = prompt(
+    `Local folder to sync with ${remotePath}:`,
+    saved[remotePath] || "",
+  );
+  if (!local || !state.socket) return;
+  saved[remotePath] = local;
+  localStorage.setItem("sshgui-sync-folders", JSON.stringify(saved));
+  const watch = confirm(
+    "Keep watching the local folder and push changes as they happen?",
+  );
+  showUploadProgress(`Syncing ${local}...`, 0);
+  const jobId = newJobId();
+  const sync = { remote: remotePath, local, watch };
+  state.syncs.set(jobId, sync);
+  state.socket.emit(
+    "sync_start",
+    {
+      connection_id: state.connectionId,
+      local,
+      remote: remotePath,
+      watch,
+      job_id: jobId,
+    },
+    (ack) => {
+      if (ack.error) {
+        state.syncs.delete(jobId);
+        document.getElementById("upload-progress").style.display = "none";
+        showNotification(ack.error, "error");
+        return;
+      }
+      sync.local = ack.local;
+      if (ack.job_id !== jobId && state.syncs.delete(jobId)) {
+        state.syncs.set(ack.job_id, sync);
+      }
+    },
+  );
+}
+
+function stopFolderSync(remotePath) {
+  for (const [jobId, sync] of state.syncs) {
+    if (sync.remote !== remotePath) continue;
+    state.socket.emit("job_cancel", { job_id: jobId });
+    state.syncs.delete(jobId);
+    showNotification(`Stopped syncing ${sync.local}`, "success");
+  }
+}
+
+function isWatchingSync(remotePath) {
+  for (const sync of state.syncs.values()) {
+    if (sync.remote === remotePath && sync.watch) return true;
+  }
+  return false;
+}
+
+function handleSyncProgress(data) {
+  const sync = state.syncs.get(data.job_id);
+  if (!sync) return;
+  if (data.phase === "transfer" && data.total) {
+    const pct = Math.round((data.done / data.total) * 100);
+    const name = data.name ? `: ${data.name}` : "";
+    showUploadProgress(`Syncing ${data.done} / ${data.total}${name}`, pct);
+  } else if (!sync.watch || sync.passes === undefined) {
+    const text =
+      data.phase === "hash" ? "Comparing checksums..." : "Comparing folders...";
+    showUploadProgress(text, 0);
+  }
+}
+
+function handleSyncPass(data) {
+  const sync = state.syncs.get(data.job_id);
+  if (!sync) return;
+  const first = sync.passes === undefined;
+  sync.passes = (sync.passes || 0) + 1;
+  const el = document.getElementById("upload-progress");
+  if (el) el.style.display = "none";
+  const changed = data.pushed + data.pulled + data.deleted;
+  if (first || changed) {
+    const parts = [
+      `${data.pushed} sent`,
+      `${data.pulled} received`,
+      `${data.deleted} deleted`,
+    ];
+    const conflicts = data.conflicts;
+    if (conflicts.length) {
+      parts.push(
+        `${conflicts.length} conflict(s): ${conflicts.slice(0, 3).join(", ")}`,
+      );
+    }
+    showNotification(
+      `Synced ${sync.local}: ${parts.join(", ")}`,
+      conflicts.length ? "error" : "success",
+    );
+  }
+  for (const error of data.errors.slice(0, 3)) showNotification(error, "error");
+  if (changed) refreshColumns();
+}
+
+function handleSyncDone(data) {
+  const sync = state.syncs.get(data.job_id);
+  if (!sync) return;
+  state.syncs.delete(data.job_id);
+  if (data.error) {
+    const el = document.getElementById("upload-progress");
+    if (el) el.style.display = "none";
+    showNotification(`Sync failed: ${data.error}`, "error");
+  }
+}
+
+// ── Host-to-Host Transfer ────────────────────────────────────────────
+
+function transferDefaultDir(conn) {
+  const columns = conn.savedState ? conn.savedState.columns : [];
+  for (let i = columns.length - 1; i >= 0; i--) {
+    if (columns[i].path) return columns[i].path;
+  }
+  return conn.homeDir || "/";
+}
+
+function sendToConnection(path, conn) {
+  const target = `${conn.username}@${conn.host}`;
+  const destDir = prompt(
+    `Copy to which folder on ${target}?`,
+    transferDefaultDir(conn),
+  );
+  if (!destDir || !state.socket) return;
+  const direct = confirm(
+    `Try copying straight from this server to ${target} with rsync/scp? ` +
+      "This needs this server to be able to log in there on its own; " +
+      "otherwise the copy is relayed through this app.",
+  );
+  const name = path.split("/").pop();
+  showUploadProgress(`Copying ${name} to ${target}...`, 0);
+  const jobId = newJobId();
+  const transfer = { name, target };
+  state.transfers.set(jobId, transfer);
+  state.socket.emit(
+    "transfer_start",
+    {
+      source_connection_id: state.connectionId,
+      dest_connection_id: conn.id,
+      path,
+      dest_dir: destDir,
+      direct,
+      job_id: jobId,
+    },
+    (ack) => {
+      if (ack.error) {
+        state.transfers.delete(jobId);
+        document.getElementById("upload-progress").style.display = "none";
+        showNotification(ack.error, "error");
+        return;
+      }
+      if (ack.job_id !== jobId && state.transfers.delete(jobId)) {
+        state.transfers.set(ack.job_id, transfer);
+      }
+    },
+  );
+}
+
+function handleTransferProgress(data) {
+  const transfer = state.transfers.get(data.job_id);
+  if (!transfer) return;
+  if (data.done) {
+    const el = document.getElementById("upload-progress");
+    if (el) el.style.display = "none";
+    const how = data.method === "relay" ? "" : ` via ${data.method}`;
+    showNotification(
+      `Copied ${transfer.name} to ${transfer.target}${how}`,
+      "success",
+    );
+    return;
+  }
+  const pct = data.size ? Math.round((data.sent / data.size) * 100) : 0;
+  showUploadProgress(
+    `Copying ${transfer.name} to ${transfer.target}... ${formatSize(data.sent)}`,
+    pct,
+  );
+}
+
+function handleTransferDone(data) {
+  if (!state.transfers.delete(data.job_id) || !data.error) return;
+  const el = document.getElementById("upload-progress");
+  if (el) el.style.display = "none";
+  showNotification(`Copy failed: ${data.error}`, "error");
+}
+
+// ── Server-Side Copy ─────────────────────────────────────────────────
+
+function copyEntry(path, destDir) {
+  const name = path.split("/").pop();
+  if (!state.socket || !state.socket.connected) {
+    showNotification("Not connected", "error");
+    return;
+  }
+  showUploadProgress(`Copying ${name}...`, 0);
+  const jobId = newJobId();
+  const copy = { name };
+  state.copies.set(jobId, copy);
+  state.socket.emit(
+    "copy_start",
+    {
+      connection_id: state.connectionId,
+      path,
+      dest_dir: destDir || null,
+      job_id: jobId,
+    },
+    (ack) => {
+      if (ack.error) {
+        state.copies.delete(jobId);
+        document.getElementById("upload-progress").style.display = "none";
+        showNotification(ack.error, "error");
+        return;
+      }
+      if (ack.job_id !== jobId && state.copies.delete(jobId)) {
+        state.copies.set(ack.job_id, copy);
+      }
+      refreshColumns();
+    },
+  );
+}
+
+function handleCopyProgress(data) {
+  const copy = state.copies.get(data.job_id);
+  if (!copy) return;
+  if (data.done) {
+    const el = document.getElementById("upload-progress");
+    if (el) el.style.display = "none";
+    const newName = data.dest.split("/").pop();
+    showNotification(`Copied ${copy.name} to ${newName}`, "success");
+    refreshColumns();
+    return;
+  }
+  const sent = data.sent ? ` ${formatSize(data.sent)}` : "";
+  showUploadProgress(
+    `Copying ${copy.name}...${sent} (click to cancel)`,
+    data.pct || 0,
+    () => {
+      state.socket.emit("job_cancel", { job_id: data.job_id });
+      state.copies.delete(data.job_id);
+      document.getElementById("upload-progress").style.display = "none";
+      showNotification(`Cancelled copying ${copy.name}`, "success");
+      refreshColumns();
+    },
+  );
+}
+
+function handleCopyDone(data) {
+  if (!state.copies.delete(data.job_id) || !data.error) return;
+  const el = document.getElementById("upload-progress");
+  if (el) el.style.display = "none";
+  showNotification(`Copy failed: ${data.error}`, "error");
+  refreshColumns();
+}
+
+function pasteCopiedEntry(destDir) {
+  const copied = state.copiedEntry;
+  if (!copied || copied.connectionId !== state.connectionId) return false;
+  copyEntry(copied.path, destDir);
+  return true;
+}
+
 // ── Text Editor ──────────────────────────────────────────────────────
 
 function startEditing() {
@@ -3114,6 +4320,19 @@ function setupGlobalShortcuts() {
         return;
       }
 
+      // Cmd+C -- copy the selected entry for pasting into another folder
+      if (e.metaKey && e.key === "c" && !window.getSelection().toString()) {
+        const info = getSelectedEntryInfo();
+        if (info) {
+          state.copiedEntry = {
+            path: info.fullPath,
+            connectionId: state.connectionId,
+          };
+          showNotification(`Copied ${info.entry.name}`, "success");
+        }
+        return;
+      }
+
       // Cmd+D -- duplicate
       if (e.metaKey && e.key === "d") {
         e.preventDefault();
@@ -3192,9 +4411,13 @@ function setupClipboardPaste() {
     if (tag === "INPUT" || tag === "TEXTAREA") return;
     if (document.activeElement?.closest("#terminal-container")) return;
     const files = e.clipboardData?.files;
-    if (!files || files.length === 0) return;
     const col = state.columns[state.focusedColumn];
     if (!col || !col.path) return;
+    if (!files || files.length === 0) {
+      // Nothing from the desktop: paste an entry copied with Cmd+C
+      if (pasteCopiedEntry(col.path)) e.preventDefault();
+      return;
+    }
     e.preventDefault();
     handleFileUpload(files, col.path);
   });
@@ -3212,18 +4435,53 @@ function setDefaultColumnWidth(w) {
 
 // ── File Watcher ─────────────────────────────────────────────────────
 
+// Directory changes are pushed by the server over the socket ("dir_changed")
+// for the columns registered with "watch_dirs". Polling /api/check-modified
+// is only used when the socket.io client failed to load.
 function startFileWatcher() {
   if (state.fileWatcher) return;
-  state.fileWatcher = setInterval(pollFileChanges, 5000);
+  state.fileWatcher = { key: null, poll: null, refresh: null };
+  if (typeof io === "undefined") {
+    state.fileWatcher.poll = setInterval(pollFileChanges, 5000);
+  }
+  syncWatchedDirs();
 }
 
 function stopFileWatcher() {
   if (state.fileWatcher) {
-    clearInterval(state.fileWatcher);
+    clearInterval(state.fileWatcher.poll);
+    clearTimeout(state.fileWatcher.refresh);
     state.fileWatcher = null;
   }
 }
 
+function syncWatchedDirs(force = false) {
+  if (!state.fileWatcher || !state.socket || !state.socket.connected) return;
+  const paths = [
+    ...new Set(
+      state.columns
+        .filter((c) => c.path && !c.fileInfo && !c.filePreview && !c.loading)
+        .map((c) => c.path),
+    ),
+  ];
+  const key = paths.join("\n");
+  if (!force && key === state.fileWatcher.key) return;
+  state.fileWatcher.key = key;
+  state.socket.emit("watch_dirs", {
+    connection_id: state.connectionId,
+    paths,
+  });
+}
+
+function handleDirChanged(data) {
+  if (!state.fileWatcher) return;
+  apiCache.invalidatePath(data.path);
+  apiCache.invalidateUrl("/api/dir-sizes");
+  // Coalesce a burst of events into one refresh
+  clearTimeout(state.fileWatcher.refresh);
+  state.fileWatcher.refresh = setTimeout(refreshColumns, 100);
+}
+
 async function pollFileChanges() {
   if (!state.connected || state.columns.length === 0) return;
   const paths = [];
@@ -3505,6 +4763,190 @@ async function showDiffView(pathA, pathB) {
   }
 }
 
+// ── Disk Usage ───────────────────────────────────────────────────────
+
+function showDiskUsage(root) {
+  if (!state.socket || !state.socket.connected) {
+    showNotification("Disk usage needs a live connection", "error");
+    return;
+  }
+  closeDiskUsage();
+  state.diskUsage = { root, path: root, jobId: null };
+
+  const overlay = document.createElement("div");
+  overlay.id = "du-overlay";
+  overlay.className = "modal-overlay";
+  overlay.innerHTML = `
+    <div class="diff-panel du-panel">
+      <div class="diff-header">
+        <span id="du-title"></span>
+        <span>
+          <button class="btn btn-secondary btn-sm" id="du-rescan">Rescan</button>
+          <button class="btn btn-icon" id="du-close">${CTX.xmark}</button>
+        </span>
+      </div>
+      <div class="du-status" id="du-status"></div>
+      <div class="diff-body">
+        <div class="diff-column" id="du-tree"></div>
+        <div class="diff-column du-top">
+          <div class="diff-col-header">Largest files</div>
+          <div id="du-files"></div>
+        </div>
+      </div>
+    </div>`;
+  overlay.addEventListener("click", (e) => {
+    if (e.target === overlay) closeDiskUsage();
+  });
+  document.body.appendChild(overlay);
+  document.getElementById("du-close").onclick = closeDiskUsage;
+  document.getElementById("du-rescan").onclick = (e) =>
+    startDiskUsageScan(e.shiftKey);
+
+  loadDiskUsage().then((scanned) => {
+    if (!scanned) startDiskUsageScan(true);
+  });
+}
+
+function closeDiskUsage() {
+  const du = state.diskUsage;
+  if (du && du.jobId && state.socket) {
+    state.socket.emit("job_cancel", { job_id: du.jobId });
+  }
+  state.diskUsage = null;
+  const overlay = document.getElementById("du-overlay");
+  if (overlay) overlay.remove();
+}
+
+// Shift+Rescan walks everything again; a plain rescan only re-reads
+// directories whose mtime changed.
+function startDiskUsageScan(full) {
+  const du = state.diskUsage;
+  if (!du || !state.socket) return;
+  setDiskUsageStatus("Scanning…");
+  const jobId = newJobId();
+  du.jobId = jobId;
+  state.socket.emit(
+    "disk_usage_scan",
+    { connection_id: state.connectionId, root: du.root, full, job_id: jobId },
+    (ack) => {
+      if (state.diskUsage !== du) return;
+      if (ack && ack.root) du.root = ack.root;
+      if (du.jobId !== jobId) return;
+      if (!ack || ack.error) {
+        du.jobId = null;
+        setDiskUsageStatus(ack ? ack.error : "Scan failed");
+        return;
+      }
+      du.jobId = ack.job_id;
+    },
+  );
+}
+
+function setDiskUsageStatus(text) {
+  const el = document.getElementById("du-status");
+  if (el) el.textContent = text;
+}
+
+function handleDiskUsageProgress(data) {
+  const du = state.diskUsage;
+  if (!du || data.job_id !== du.jobId) return;
+  setDiskUsageStatus(
+    `Scanning… ${data.dirs.toLocaleString()} folders, ` +
+      `${data.files.toLocaleString()} files, ${formatSize(data.bytes)}`,
+  );
+}
+
+function handleDiskUsageDone(data) {
+  const du = state.diskUsage;
+  if (!du || data.job_id !== du.jobId) return;
+  du.jobId = null;
+  if (data.error) {
+    setDiskUsageStatus("Scan failed: " + data.error);
+    return;
+  }
+  loadDiskUsage();
+}
+
+async function loadDiskUsage() {
+  const du = state.diskUsage;
+  if (!du) return false;
+  const body = JSON.stringify({ root: du.root, path: du.path, limit: 200 });
+  const [treeResp, topResp] = await Promise.all([
+    fetch("/api/disk-usage", { method: "POST", headers: connHeaders(), body }),
+    fetch("/api/disk-usage/top", {
+      method: "POST",
+      headers: connHeaders(),
+      body: JSON.stringify({ root: du.root, limit: 50 }),
+    }),
+  ]);
+  if (state.diskUsage !== du) return true;
+  if (treeResp.status === 404) return false;
+  const data = await treeResp.json();
+  const top = await topResp.json();
+  if (data.error) {
+    setDiskUsageStatus(data.error);
+    return true;
+  }
+  renderDiskUsage(data, top);
+  return true;
+}
+
+function renderDiskUsage(data, top) {
+  const du = state.diskUsage;
+  const node = data.tree;
+  document.getElementById("du-title").textContent =
+    `Disk Usage — ${node.path} (${formatSize(node.size)})`;
+  setDiskUsageStatus(
+    `${node.files.toLocaleString()} files in ${node.dirs.toLocaleString()} folders · ` +
+      `scanned ${new Date(data.scanned_at * 1000).toLocaleTimeString()}`,
+  );
+
+  const rows = [];
+  if (node.path !== du.root) {
+    rows.push(
+      `<div class="du-row du-dir" data-path="${escapeHtml(node.path.replace(/\/[^/]+$/, "") || "/")}">` +
+        `<span class="du-name">..</span></div>`,
+    );
+  }
+  const items = node.children.map((c) => ({ ...c, isDir: true }));
+  if (node.own_bytes) {
+    items.push({ name: "(files)", size: node.own_bytes, isDir: false });
+  }
+  items.sort((a, b) => b.size - a.size);
+  const max = items.length ? items[0].size : 1;
+  for (const item of items) {
+    const pct = node.size ? ((item.size / node.size) * 100).toFixed(1) : "0.0";
+    const attr = item.isDir ? ` data-path="${escapeHtml(item.path)}"` : "";
+    rows.push(
+      `<div class="du-row${item.isDir ? " du-dir" : ""}"${attr}>` +
+        `<span class="du-bar" style="width:${(item.size / max) * 100}%"></span>` +
+        `<span class="du-name">${escapeHtml(item.name)}${item.isDir ? "/" : ""}</span>` +
+        `<span class="du-size">${formatSize(item.size)} · ${pct}%</span></div>`,
+    );
+  }
+  if (node.more) {
+    rows.push(`<div class="du-row du-more">${node.more} more folders</div>`);
+  }
+  const tree = document.getElementById("du-tree");
+  tree.innerHTML = rows.join("");
+  tree.querySelectorAll(".du-dir").forEach((row) => {
+    row.onclick = () => {
+      du.path = row.dataset.path;
+      loadDiskUsage();
+    };
+  });
+
+  const prefix = du.root.endsWith("/") ? du.root : du.root + "/";
+  document.getElementById("du-files").innerHTML = (top.files || [])
+    .map(
+      (f) =>
+        `<div class="du-row" title="${escapeHtml(f.path)}">` +
+        `<span class="du-name">${escapeHtml(f.path.slice(prefix.length))}</span>` +
+        `<span class="du-size">${formatSize(f.size)}</span></div>`,
+    )
+    .join("");
+}
+
 // ── Batch Rename ─────────────────────────────────────────────────────
 
 function showBatchRenameDialog(colIndex) {